@@ -0,0 +1 @@
+"""Benchmarks de Tecnodespegue Optimizer (ejecutables en Linux)."""
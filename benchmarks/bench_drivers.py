@@ -0,0 +1,130 @@
+"""Mide el parseo y el cruce del escaneo de drivers sobre datos sintéticos.
+
+Genera la salida JSON de _SCRIPT_ESCANEO_PARCIAL para N dispositivos (por defecto
+5.000, con un 10 % de dispositivos con problemas, la mitad sin driver
+firmado) y compara el cruce por diccionario con el bucle anidado anterior.
+Después compila un catálogo sintético (por defecto 200.000 entradas) y mide
+cuánto tarda en compararse el escaneo contra él.
+
+Ejecutar: python -m benchmarks.bench_drivers [dispositivos] [repeticiones] [entradas_catalogo]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.drivers import EstadoDriver, _como_lista, _driver_desde_wmi, _marcar_desactualizados, _parsear_escaneo
+from src.utils.catalogo_drivers import CatalogoDrivers, compilar_indice
+
+_CLASES = ["Display", "Net", "MEDIA", "USB", "DiskDrive", "System", "HIDClass", "Bluetooth", "Printer"]
+_FABRICANTES = ["Intel", "NVIDIA", "Realtek", "Microsoft", ""]
+
+
+def generar_escaneo(dispositivos: int) -> str:
+    """Salida JSON sintética con el mismo formato que _SCRIPT_ESCANEO_PARCIAL."""
+    drivers = []
+    for i in range(dispositivos):
+        drivers.append({
+            "DeviceName": f"Dispositivo {i} {_CLASES[i % len(_CLASES)]}",
+            "Manufacturer": _FABRICANTES[i % len(_FABRICANTES)],
+            "DriverVersion": f"10.0.{i % 100}.{i}",
+            "DriverDate": f"20{10 + i % 14:02d}{1 + i % 12:02d}{1 + i % 28:02d}000000.000000+000",
+            "DeviceClass": _CLASES[i % len(_CLASES)],
+            "DeviceID": f"PCI\\VEN_8086&DEV_{i:04X}\\{i:08X}",
+            "InfName": f"oem{i}.inf",
+            "IsSigned": True,
+            "HardWareID": [f"PCI\\VEN_8086&DEV_{i:04X}"],
+        })
+    problemas = []
+    for i in range(0, dispositivos, 10):
+        # La mitad coincide con un driver firmado; la otra mitad no tiene driver
+        instancia = f"PCI\\VEN_8086&DEV_{i:04X}\\{i:08X}" if i % 20 == 0 else f"USB\\VID_{i:04X}\\SIN_DRIVER"
+        problemas.append({
+            "InstanceId": instancia,
+            "FriendlyName": f"Problema {i}",
+            "Class": "USB",
+            "Problem": 28 if i % 30 == 0 else 10,
+            "Status": "Error",
+            "HardwareID": [instancia],
+        })
+    return json.dumps({"Drivers": drivers, "Problemas": problemas})
+
+
+def generar_catalogo(ruta: str, entradas: int, dispositivos: int) -> None:
+    """Catálogo sintético que incluye una de cada tres versiones del escaneo con una versión mayor."""
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("hardware_id\tversion\n")
+        for i in range(entradas):
+            if i < dispositivos:
+                version = f"10.0.{i % 100}.{i + (1 if i % 3 == 0 else 0)}"
+                f.write(f"PCI\\VEN_8086&DEV_{i:04X}\t{version}\n")
+            else:
+                f.write(f"PCI\\VEN_{i % 0xFFFF:04X}&DEV_{i:06X}\t1.0.0.{i % 1000}\n")
+
+
+def parsear_anterior(datos: dict) -> list:
+    """Cruce previo: por cada dispositivo con problemas, recorre todos los drivers."""
+    drivers = [d for d in map(_driver_desde_wmi, _como_lista(datos.get("Drivers"))) if d]
+    for p in _como_lista(datos.get("Problemas")):
+        device_id = p.get("InstanceId") or ""
+        for d in drivers:
+            if d.device_id == device_id:
+                d.estado = EstadoDriver.FALTANTE if p.get("Problem") == 28 else EstadoDriver.PROBLEMA
+                break
+    return drivers
+
+
+def cronometrar(funcion, repeticiones: int) -> float:
+    """Retorna los milisegundos promedio por llamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e3
+
+
+def main():
+    dispositivos = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    repeticiones = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    salida = generar_escaneo(dispositivos)
+    datos = json.loads(salida)
+
+    print(f"Escaneo sintético: {dispositivos:,} dispositivos, "
+          f"{len(datos['Problemas']):,} con problemas, {len(salida):,} caracteres")
+    print(f"  json.loads          {cronometrar(lambda: json.loads(salida), repeticiones):8.1f} ms")
+    print(f"  cruce por dict      {cronometrar(lambda: _parsear_escaneo(datos), repeticiones):8.1f} ms")
+    print(f"  bucle anidado       {cronometrar(lambda: parsear_anterior(datos), repeticiones):8.1f} ms")
+    print(f"  drivers resultantes {len(_parsear_escaneo(datos)):>8,}")
+
+    entradas = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta_catalogo = os.path.join(temporal, "catalogo.tsv")
+        ruta_indice = os.path.join(temporal, "catalogo.idx")
+        generar_catalogo(ruta_catalogo, entradas, dispositivos)
+        inicio = time.perf_counter()
+        compilar_indice(ruta_catalogo, ruta_indice)
+        compilacion = (time.perf_counter() - inicio) * 1e3
+
+        catalogo = CatalogoDrivers(ruta_catalogo, ruta_indice)
+        inicio = time.perf_counter()
+        len(catalogo)
+        apertura = (time.perf_counter() - inicio) * 1e3
+        drivers = _parsear_escaneo(datos)
+        marcados = _marcar_desactualizados(drivers, catalogo)
+
+        print(f"Catálogo sintético: {entradas:,} entradas, {os.path.getsize(ruta_indice):,} bytes de índice")
+        print(f"  compilar índice     {compilacion:8.1f} ms")
+        print(f"  abrir (mmap)        {apertura:8.1f} ms")
+        ids = [d.hardware_id for d in drivers]
+
+        def consultar():
+            return [catalogo.version_mas_reciente(i) for i in ids]
+        print(f"  consultar escaneo   {cronometrar(consultar, repeticiones):8.1f} ms")
+        print(f"  desactualizados     {marcados:>8,}")
+        catalogo.cerrar()
+
+
+if __name__ == "__main__":
+    main()
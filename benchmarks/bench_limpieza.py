@@ -0,0 +1,101 @@
+"""Compara el motor de limpieza con os.scandir frente al recorrido anterior.
+
+Crea un árbol sintético (por defecto 200.000 archivos) en un directorio
+temporal, lo limpia con cada implementación y muestra tiempos y totales.
+
+Ejecutar: python -m benchmarks.bench_limpieza [archivos] [archivos_por_directorio]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.limpieza import _limpiar_arbol
+
+
+def crear_arbol(raiz: str, archivos: int, por_directorio: int) -> int:
+    """Crea archivos pequeños repartidos en dos niveles de directorios."""
+    total = 0
+    directorios = max(1, archivos // por_directorio)
+    for d in range(directorios):
+        directorio = os.path.join(raiz, f"g{d // 50:03d}", f"d{d:05d}")
+        os.makedirs(directorio, exist_ok=True)
+        for a in range(por_directorio):
+            if total >= archivos:
+                return total
+            with open(os.path.join(directorio, f"{a:05d}.tmp"), "wb") as f:
+                f.write(b"x" * (a % 512))
+            total += 1
+    return total
+
+
+def limpiar_anterior(ruta: str) -> tuple[int, int]:
+    """Recorrido previo: os.walk + os.path.getsize + shutil.rmtree.
+
+    Los subdirectorios se borran con rmtree antes de recorrerlos, así que
+    sus archivos no se cuentan.
+    """
+    tamano_total = 0
+    archivos_eliminados = 0
+    for root, dirs, files in os.walk(ruta):
+        for archivo in files:
+            archivo_path = os.path.join(root, archivo)
+            try:
+                tamano_total += os.path.getsize(archivo_path)
+                os.remove(archivo_path)
+                archivos_eliminados += 1
+            except OSError:
+                pass
+        for dir in dirs:
+            shutil.rmtree(os.path.join(root, dir), ignore_errors=True)
+    return tamano_total, archivos_eliminados
+
+
+def limpiar_walk_exacto(ruta: str) -> tuple[int, int]:
+    """os.walk de abajo hacia arriba con un stat aparte por archivo (cuenta exacta)."""
+    tamano_total = 0
+    archivos_eliminados = 0
+    for root, dirs, files in os.walk(ruta, topdown=False):
+        for archivo in files:
+            archivo_path = os.path.join(root, archivo)
+            try:
+                tamano_total += os.path.getsize(archivo_path)
+                os.remove(archivo_path)
+                archivos_eliminados += 1
+            except OSError:
+                pass
+        for dir in dirs:
+            try:
+                os.rmdir(os.path.join(root, dir))
+            except OSError:
+                pass
+    return tamano_total, archivos_eliminados
+
+
+def medir(nombre: str, funcion, archivos: int, por_directorio: int):
+    """Crea un árbol nuevo, lo limpia con la función y reporta el resultado."""
+    with tempfile.TemporaryDirectory() as raiz:
+        creados = crear_arbol(raiz, archivos, por_directorio)
+        inicio = time.perf_counter()
+        resultado = funcion(raiz)
+        duracion = time.perf_counter() - inicio
+        restantes = sum(len(f) for _, _, f in os.walk(raiz))
+    print(f"  {nombre:<28} {duracion:8.3f} s  bytes={resultado[0]:>11,}  "
+          f"archivos={resultado[1]:>7,}/{creados:,}  restantes={restantes}")
+
+
+def main():
+    archivos = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    por_directorio = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"Árbol sintético: {archivos:,} archivos, {por_directorio} por directorio")
+    medir("os.walk + getsize + rmtree", limpiar_anterior, archivos, por_directorio)
+    medir("os.walk exacto", limpiar_walk_exacto, archivos, por_directorio)
+    medir("os.scandir (_limpiar_arbol)", _limpiar_arbol, archivos, por_directorio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compara un proceso por comando frente a la sesión persistente.
+
+Usa el host falso de tests/ con un retardo de arranque que simula el coste
+de powershell.exe.
+
+Ejecutar: python -m benchmarks.bench_sesion_powershell [comandos] [retardo]
+"""
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.sesion_powershell import SesionPowerShell
+
+HOST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fake_powershell_host.py")
+
+
+def _un_proceso_por_comando(comandos: int, retardo: float) -> float:
+    """Lanza un host nuevo para cada comando, como hacía ejecutar_powershell."""
+    inicio = time.perf_counter()
+    for _ in range(comandos):
+        sesion = SesionPowerShell([sys.executable, HOST, "--retardo-inicio", str(retardo)])
+        sesion.ejecutar("Write-Output 'ok'")
+        sesion.cerrar()
+    return time.perf_counter() - inicio
+
+
+def _sesion_persistente(comandos: int, retardo: float) -> float:
+    """Envía todos los comandos a un único host."""
+    inicio = time.perf_counter()
+    sesion = SesionPowerShell([sys.executable, HOST, "--retardo-inicio", str(retardo)])
+    for _ in range(comandos):
+        sesion.ejecutar("Write-Output 'ok'")
+    sesion.cerrar()
+    return time.perf_counter() - inicio
+
+
+def main():
+    comandos = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    retardo = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    t_procesos = _un_proceso_por_comando(comandos, retardo)
+    t_sesion = _sesion_persistente(comandos, retardo)
+
+    print(f"Comandos: {comandos}  (arranque simulado: {retardo * 1000:.0f} ms)")
+    print(f"  Un proceso por comando: {t_procesos:8.3f} s")
+    print(f"  Sesión persistente:     {t_sesion:8.3f} s")
+    print(f"  Aceleración:            {t_procesos / max(t_sesion, 1e-9):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
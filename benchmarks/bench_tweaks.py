@@ -0,0 +1,46 @@
+"""Mide el compilador de operaciones y el sistema falso con el catálogo de tweaks.
+
+Compara el lote de scripts por tweak con el script único compilado de todas
+las operaciones, y mide cuánto tarda en interpretarse el catálogo completo.
+
+Ejecutar: python -m benchmarks.bench_tweaks [repeticiones]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.tweaks import TWEAKS_DISPONIBLES
+from src.utils.lote import compilar_lote
+from src.utils.operaciones import SistemaFalso, compilar_operaciones
+
+
+def cronometrar(funcion, repeticiones: int) -> float:
+    """Retorna los microsegundos promedio por llamada."""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    operaciones = [op for t in TWEAKS_DISPONIBLES for op in t.operaciones]
+
+    por_tweak = compilar_lote([(t.id, t.script) for t in TWEAKS_DISPONIBLES])
+    unico = compilar_operaciones(operaciones)
+
+    print(f"Catálogo: {len(TWEAKS_DISPONIBLES)} tweaks, {len(operaciones)} operaciones")
+    print(f"  lote por tweak      {len(por_tweak):>7,} caracteres  New-Item={por_tweak.count('New-Item')}")
+    print(f"  script compilado    {len(unico):>7,} caracteres  New-Item={unico.count('New-Item')}")
+
+    def interpretar():
+        SistemaFalso(servicios={"sysmain": ("Automatic", "Running")}).aplicar(operaciones)
+
+    print(f"  compilar catálogo   {cronometrar(lambda: compilar_operaciones(operaciones), repeticiones):8.1f} µs")
+    print(f"  interpretar catálogo {cronometrar(interpretar, repeticiones):7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ from src.ui.pages.inicio import PaginaInicio
 from src.ui.pages.tweaks import PaginaTweaks
 from src.ui.pages.bloatware import PaginaBloatware
 from src.ui.pages.limpieza import PaginaLimpieza
-from src.ui.pages.servicios import PaginaServicios
+from src.ui.pages.servicios import PaginaServicios, detener_vigilancia
 from src.ui.pages.drivers import PaginaDrivers
 from src.utils.admin import es_administrador, solicitar_admin
 
@@ -318,6 +318,9 @@ class TecnodespegueOptimizer:
             # Actualizar fondo del item
             item.bgcolor = ft.Colors.with_opacity(0.08, color) if is_selected else None
 
+        # La página anterior se descarta: deja de vigilar servicios
+        detener_vigilancia()
+
         # Crear la página según el índice
         nueva_pagina = None
         if index == 0:
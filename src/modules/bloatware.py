@@ -1,5 +1,10 @@
 """Módulo para gestionar y eliminar bloatware de Windows 11."""
-from dataclasses import dataclass
+import fnmatch
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
 from enum import Enum
 from src.utils.admin import ejecutar_powershell
 
@@ -23,6 +28,54 @@ class AppBloat:
     recomendado_eliminar: bool = True
 
 
+@dataclass
+class PaqueteAppx:
+    """Paquete Appx instalado para el usuario actual."""
+    nombre: str
+    nombre_completo: str
+    provisionado: bool = False
+
+
+@dataclass
+class InventarioAppx:
+    """Instantánea de los paquetes Appx instalados."""
+    paquetes: list[PaqueteAppx]
+    fecha: float = field(default_factory=time.time)
+
+
+class ComparadorPatrones:
+    """Compara nombres contra muchos patrones con comodines a la vez.
+
+    Todos los patrones se compilan en una sola expresión regular que
+    descarta en una pasada los nombres que no coinciden con ninguno; solo
+    para los que sí coinciden se resuelve qué patrones concretos aplican.
+    Las comparaciones no distinguen mayúsculas, igual que -like.
+    """
+
+    def __init__(self, patrones: list[str]):
+        self.patrones = list(patrones)
+        traducidos = [fnmatch.translate(p) for p in self.patrones]
+        self._individuales = [re.compile(t, re.IGNORECASE) for t in traducidos]
+        self._combinado = re.compile("|".join(f"(?:{t})" for t in traducidos), re.IGNORECASE)
+
+    def coincide(self, nombre: str) -> bool:
+        """Indica si el nombre coincide con algún patrón."""
+        return self._combinado.match(nombre) is not None
+
+    def coincidencias(self, nombre: str) -> list[str]:
+        """Retorna los patrones que coinciden con el nombre."""
+        if not self.coincide(nombre):
+            return []
+        return [p for p, r in zip(self.patrones, self._individuales) if r.match(nombre)]
+
+    def patrones_presentes(self, nombres: list[str]) -> set[str]:
+        """Retorna los patrones que coinciden con al menos uno de los nombres."""
+        presentes = set()
+        for nombre in nombres:
+            presentes.update(self.coincidencias(nombre))
+        return presentes
+
+
 # Lista de bloatware común en Windows 11
 BLOATWARE_APPS: list[AppBloat] = [
     # MICROSOFT
@@ -80,96 +133,178 @@ BLOATWARE_APPS: list[AppBloat] = [
 
 def obtener_apps_instaladas() -> list[str]:
     """Obtiene la lista de paquetes UWP instalados."""
-    cmd = "Get-AppxPackage | Select-Object -ExpandProperty Name"
+    return [p.nombre for p in obtener_inventario().paquetes]
+
+
+# Inventario compartido: se toma una vez y se reutiliza en todas las consultas
+_INVENTARIO_TTL = 120  # segundos
+_inventario: InventarioAppx | None = None
+_inventario_lock = threading.Lock()
+_comparador_bloatware: ComparadorPatrones | None = None
+
+
+def _tomar_inventario() -> InventarioAppx:
+    """Consulta Get-AppxPackage y los paquetes provisionados en una sola llamada."""
+    cmd = '''
+    $prov = @{}
+    Get-AppxProvisionedPackage -Online -ErrorAction SilentlyContinue | ForEach-Object { $prov[$_.DisplayName] = $true }
+    @(Get-AppxPackage -ErrorAction SilentlyContinue | ForEach-Object {
+        [pscustomobject]@{ N = $_.Name; F = $_.PackageFullName; P = [bool]$prov[$_.Name] }
+    }) | ConvertTo-Json -Compress
+    '''
     exito, salida = ejecutar_powershell(cmd)
-    if exito:
-        return [app.strip() for app in salida.split('\n') if app.strip()]
-    return []
+    paquetes = []
+    if exito and salida and salida.strip() not in ['', '[]', 'null']:
+        try:
+            datos = json.loads(salida)
+            if isinstance(datos, dict):
+                datos = [datos]
+            for d in datos:
+                if d.get('N'):
+                    paquetes.append(PaqueteAppx(d['N'], d.get('F') or '', bool(d.get('P'))))
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return InventarioAppx(paquetes)
+
+
+def obtener_inventario(forzar: bool = False) -> InventarioAppx:
+    """Retorna la instantánea de paquetes instalados, tomándola si hace falta."""
+    global _inventario
+    with _inventario_lock:
+        if forzar or _inventario is None or time.time() - _inventario.fecha > _INVENTARIO_TTL:
+            _inventario = _tomar_inventario()
+        return _inventario
+
+
+def invalidar_inventario():
+    """Descarta la instantánea para que la próxima consulta la renueve."""
+    global _inventario
+    with _inventario_lock:
+        _inventario = None
+
+
+def _obtener_comparador() -> ComparadorPatrones:
+    """Retorna el comparador compilado de todos los patrones de BLOATWARE_APPS."""
+    global _comparador_bloatware
+    if _comparador_bloatware is None:
+        _comparador_bloatware = ComparadorPatrones([app.paquete for app in BLOATWARE_APPS])
+    return _comparador_bloatware
+
+
+def _patrones_instalados(inventario: InventarioAppx | None = None) -> set[str]:
+    """Retorna los patrones de BLOATWARE_APPS presentes en el inventario."""
+    inventario = inventario or obtener_inventario()
+    return _obtener_comparador().patrones_presentes([p.nombre for p in inventario.paquetes])
 
 
 def verificar_app_instalada(paquete: str) -> bool:
     """Verifica si una app está instalada."""
-    # Remover asteriscos para búsqueda
-    paquete_limpio = paquete.replace('*', '')
-    cmd = f'''
-    $app = Get-AppxPackage -Name "*{paquete_limpio}*" -ErrorAction SilentlyContinue | Select-Object -First 1
-    if ($app) {{ Write-Output "FOUND" }} else {{ Write-Output "NOT_FOUND" }}
-    '''
-    exito, salida = ejecutar_powershell(cmd)
-    return exito and "FOUND" in salida
+    # Sin asteriscos, -like "*x*" equivale a buscar la subcadena
+    patron = f"*{paquete.replace('*', '')}*"
+    return bool(ComparadorPatrones([patron]).patrones_presentes(
+        [p.nombre for p in obtener_inventario().paquetes]
+    ))
 
 
-def desinstalar_app(paquete: str) -> tuple[bool, str]:
-    """Desinstala una app UWP."""
-    paquete_limpio = paquete.replace('*', '')
-    cmd = f'''
-    $ErrorActionPreference = 'SilentlyContinue'
+# Script de eliminación masiva: cada lista de paquetes se enumera una sola vez
+_SCRIPT_ELIMINACION_MASIVA = '''
+$ErrorActionPreference = 'SilentlyContinue'
+$patrones = @({patrones})
+
+$usuario = @(Get-AppxPackage)
+$todos = @(Get-AppxPackage -AllUsers)
+$provisionados = @(Get-AppxProvisionedPackage -Online)
 
-    # Intentar remover para el usuario actual primero
-    $apps = Get-AppxPackage -Name "*{paquete_limpio}*"
-    foreach ($app in $apps) {{
+foreach ($patron in $patrones) {{
+    # Remover para el usuario actual primero
+    foreach ($app in ($usuario | Where-Object {{ $_.Name -like $patron }})) {{
         Remove-AppxPackage -Package $app.PackageFullName -ErrorAction SilentlyContinue
     }}
 
-    # Intentar remover para todos los usuarios
-    $appsAll = Get-AppxPackage -AllUsers -Name "*{paquete_limpio}*"
-    foreach ($app in $appsAll) {{
+    # Remover para todos los usuarios
+    foreach ($app in ($todos | Where-Object {{ $_.Name -like $patron }})) {{
         Remove-AppxPackage -Package $app.PackageFullName -AllUsers -ErrorAction SilentlyContinue
     }}
 
     # Remover el paquete provisionado para que no se reinstale
-    $provisioned = Get-AppxProvisionedPackage -Online | Where-Object {{ $_.DisplayName -like "*{paquete_limpio}*" }}
-    foreach ($prov in $provisioned) {{
+    foreach ($prov in ($provisionados | Where-Object {{ $_.DisplayName -like $patron }})) {{
         Remove-AppxProvisionedPackage -Online -PackageName $prov.PackageName -ErrorAction SilentlyContinue
     }}
+}}
 
-    # Verificar si se eliminó
-    $remaining = Get-AppxPackage -Name "*{paquete_limpio}*" -ErrorAction SilentlyContinue
-    if ($remaining) {{
-        Write-Output "PARTIAL"
+# Verificar en una sola pasada qué quedó instalado
+$restantes = @(Get-AppxPackage)
+for ($i = 0; $i -lt $patrones.Count; $i++) {{
+    $patron = $patrones[$i]
+    if ($restantes | Where-Object {{ $_.Name -like $patron }}) {{
+        Write-Output "{marcador} $i PARTIAL"
     }} else {{
-        Write-Output "SUCCESS"
+        Write-Output "{marcador} $i SUCCESS"
     }}
-    '''
-    exito, salida = ejecutar_powershell(cmd)
-    if "SUCCESS" in salida:
-        return True, "Aplicación eliminada correctamente"
-    elif "PARTIAL" in salida:
-        return True, "Aplicación eliminada parcialmente"
-    return exito, salida
+}}
+'''
+
+_MARCADOR_APP = "##APP"
+
+
+def desinstalar_app(paquete: str) -> tuple[bool, str]:
+    """Desinstala una app UWP."""
+    return desinstalar_multiples_apps([paquete])[paquete]
 
 
 def desinstalar_multiples_apps(paquetes: list[str]) -> dict[str, tuple[bool, str]]:
-    """Desinstala múltiples apps y retorna el resultado de cada una."""
+    """
+    Desinstala múltiples apps y retorna el resultado de cada una.
+
+    Las listas de paquetes del usuario, de todos los usuarios y provisionados
+    se enumeran una sola vez para todo el conjunto, y la verificación final
+    también se hace en una sola pasada.
+    """
+    paquetes = list(dict.fromkeys(paquetes))
+    if not paquetes:
+        return {}
+
+    patrones = ", ".join(
+        "'*" + p.replace('*', '').replace("'", "''") + "*'" for p in paquetes
+    )
+    cmd = _SCRIPT_ELIMINACION_MASIVA.format(patrones=patrones, marcador=_MARCADOR_APP)
+    exito, salida = ejecutar_powershell(cmd)
+    invalidar_inventario()
+
+    estados = {}
+    for linea in salida.splitlines():
+        partes = linea.split()
+        if len(partes) == 3 and partes[0] == _MARCADOR_APP and partes[1].isdigit():
+            estados[int(partes[1])] = partes[2]
+
     resultados = {}
-    for paquete in paquetes:
-        resultados[paquete] = desinstalar_app(paquete)
+    for i, paquete in enumerate(paquetes):
+        estado = estados.get(i)
+        if estado == "SUCCESS":
+            resultados[paquete] = (True, "Aplicación eliminada correctamente")
+        elif estado == "PARTIAL":
+            resultados[paquete] = (True, "Aplicación eliminada parcialmente")
+        else:
+            resultados[paquete] = (exito, salida)
     return resultados
 
 
 def obtener_bloatware_instalado() -> list[AppBloat]:
     """Obtiene la lista de bloatware que está instalado."""
-    instalado = []
-    for app in BLOATWARE_APPS:
-        if verificar_app_instalada(app.paquete):
-            instalado.append(app)
-    return instalado
+    instalados = _patrones_instalados()
+    return [app for app in BLOATWARE_APPS if app.paquete in instalados]
 
 
-def eliminar_todo_bloatware_recomendado() -> tuple[int, int]:
-    """Elimina todo el bloatware recomendado. Retorna (exitosos, fallidos)."""
-    exitosos = 0
-    fallidos = 0
+def obtener_paquetes_recomendados() -> list[str]:
+    """Patrones de paquete de todo el bloatware recomendado para eliminar."""
+    return [app.paquete for app in BLOATWARE_APPS if app.recomendado_eliminar]
 
-    for app in BLOATWARE_APPS:
-        if app.recomendado_eliminar:
-            exito, _ = desinstalar_app(app.paquete)
-            if exito:
-                exitosos += 1
-            else:
-                fallidos += 1
 
-    return exitosos, fallidos
+def eliminar_todo_bloatware_recomendado() -> tuple[int, int]:
+    """Elimina todo el bloatware recomendado. Retorna (exitosos, fallidos)."""
+    resultados = desinstalar_multiples_apps(obtener_paquetes_recomendados())
+    exitosos = sum(1 for exito, _ in resultados.values() if exito)
+    return exitosos, len(resultados) - exitosos
 
 
 def obtener_apps_por_categoria(categoria: CategoriaBloat) -> list[AppBloat]:
@@ -179,10 +314,10 @@ def obtener_apps_por_categoria(categoria: CategoriaBloat) -> list[AppBloat]:
 
 def obtener_apps_instaladas_por_categoria(categoria: CategoriaBloat) -> list[AppBloat]:
     """Obtiene las apps instaladas de una categoría específica."""
-    apps_categoria = [app for app in BLOATWARE_APPS if app.categoria == categoria]
-    return [app for app in apps_categoria if verificar_app_instalada(app.paquete)]
+    instalados = _patrones_instalados()
+    return [app for app in BLOATWARE_APPS if app.categoria == categoria and app.paquete in instalados]
 
 
 def obtener_todo_bloatware_instalado() -> list[AppBloat]:
     """Obtiene todo el bloatware que está instalado en el sistema."""
-    return [app for app in BLOATWARE_APPS if verificar_app_instalada(app.paquete)]
+    return obtener_bloatware_instalado()
@@ -1,14 +1,19 @@
 """Módulo para escanear, detectar y actualizar drivers del sistema."""
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Callable, Dict
+from typing import List, Optional, Callable, Dict, Iterator
+import hashlib
+import json
 import re
 import os
+import time
 import tempfile
 import urllib.request
 import zipfile
 import subprocess
-from src.utils.admin import ejecutar_powershell, ejecutar_cmd
+from src.utils.admin import ejecutar_powershell, ejecutar_cmd, iterar_powershell
+from src.utils.catalogo_drivers import CatalogoDrivers, formatear_version, obtener_catalogo, parsear_version
+from src.utils.datos import escribir_json, leer_json
 
 
 class EstadoDriver(Enum):
@@ -48,6 +53,7 @@ class DriverInfo:
     inf_name: str = ""
     necesita_actualizacion: bool = False
     hardware_id: str = ""
+    version_disponible: str = ""  # Del catálogo, si es más nueva que la instalada
 
 
 @dataclass
@@ -62,6 +68,16 @@ class ResultadoEscaneo:
     todos_ok: bool = False
 
 
+@dataclass
+class LoteEscaneo:
+    """Parte de un escaneo en curso (ver escanear_drivers_por_lotes)."""
+    drivers: List[DriverInfo]  # Nuevos, en el orden en que llegaron
+    actualizados: List[DriverInfo] = field(default_factory=list)  # Ya entregados cuyo estado cambió
+    mensaje: str = ""
+    progreso: int = 0
+    resultado: Optional[ResultadoEscaneo] = None  # Solo en el último lote
+
+
 # URLs de drivers de fabricantes conocidos
 DRIVER_SOURCES = {
     "intel": {
@@ -80,231 +96,304 @@ DRIVER_SOURCES = {
 }
 
 
-def _categorizar_driver(nombre: str, clase: str) -> CategoriaDriver:
-    """Determina la categoría del driver basándose en su nombre y clase."""
-    nombre_lower = (nombre or "").lower()
-    clase_lower = (clase or "").lower()
-
-    if any(x in nombre_lower or x in clase_lower for x in ['display', 'graphics', 'gpu', 'nvidia', 'amd', 'intel hd', 'intel uhd', 'intel iris', 'video', 'vga', 'geforce', 'radeon']):
-        return CategoriaDriver.DISPLAY
-    elif any(x in nombre_lower or x in clase_lower for x in ['network', 'ethernet', 'wifi', 'wireless', 'lan', 'net', 'wi-fi', '802.11']):
-        return CategoriaDriver.NETWORK
-    elif any(x in nombre_lower or x in clase_lower for x in ['audio', 'sound', 'realtek', 'speaker', 'headphone', 'microphone']):
-        return CategoriaDriver.AUDIO
-    elif any(x in nombre_lower or x in clase_lower for x in ['usb', 'hub']):
-        return CategoriaDriver.USB
-    elif any(x in nombre_lower or x in clase_lower for x in ['storage', 'disk', 'nvme', 'ssd', 'hdd', 'sata', 'raid', 'ahci']):
-        return CategoriaDriver.STORAGE
-    elif any(x in nombre_lower or x in clase_lower for x in ['bluetooth', 'bt']):
-        return CategoriaDriver.BLUETOOTH
-    elif any(x in nombre_lower or x in clase_lower for x in ['keyboard', 'mouse', 'hid', 'input', 'touchpad', 'trackpad']):
-        return CategoriaDriver.INPUT
-    elif any(x in nombre_lower or x in clase_lower for x in ['print', 'scanner']):
-        return CategoriaDriver.PRINTER
-    elif any(x in nombre_lower or x in clase_lower for x in ['system', 'processor', 'acpi', 'pci', 'smbus', 'management engine']):
-        return CategoriaDriver.SYSTEM
-    else:
-        return CategoriaDriver.OTHER
+# Palabras clave por categoría, en orden de prioridad: gana la primera
+# categoría con alguna palabra en el nombre o en la clase del dispositivo
+_PALABRAS_CATEGORIA = [
+    (CategoriaDriver.DISPLAY, ['display', 'graphics', 'gpu', 'nvidia', 'amd', 'intel hd', 'intel uhd', 'intel iris', 'video', 'vga', 'geforce', 'radeon']),
+    (CategoriaDriver.NETWORK, ['network', 'ethernet', 'wifi', 'wireless', 'lan', 'net', 'wi-fi', '802.11']),
+    (CategoriaDriver.AUDIO, ['audio', 'sound', 'realtek', 'speaker', 'headphone', 'microphone']),
+    (CategoriaDriver.USB, ['usb', 'hub']),
+    (CategoriaDriver.STORAGE, ['storage', 'disk', 'nvme', 'ssd', 'hdd', 'sata', 'raid', 'ahci']),
+    (CategoriaDriver.BLUETOOTH, ['bluetooth', 'bt']),
+    (CategoriaDriver.INPUT, ['keyboard', 'mouse', 'hid', 'input', 'touchpad', 'trackpad']),
+    (CategoriaDriver.PRINTER, ['print', 'scanner']),
+    (CategoriaDriver.SYSTEM, ['system', 'processor', 'acpi', 'pci', 'smbus', 'management engine']),
+]
+
+# Fabricantes por palabra clave, en orden de prioridad
+_PALABRAS_FABRICANTE = [
+    ("Intel", ['intel']),
+    ("NVIDIA", ['nvidia']),
+    ("AMD", ['amd', 'ati']),
+    ("Realtek", ['realtek']),
+    ("Qualcomm", ['qualcomm', 'atheros']),
+    ("Broadcom", ['broadcom']),
+    ("Microsoft", ['microsoft']),
+]
+
+# Vendor id PCI (VEN_xxxx) -> fabricante
+_FABRICANTES_PCI = {
+    '8086': "Intel",
+    '10de': "NVIDIA",
+    '1002': "AMD",
+    '10ec': "Realtek",
+}
 
 
-def _identificar_fabricante(nombre: str, hardware_id: str) -> str:
-    """Identifica el fabricante basándose en el nombre y hardware ID."""
-    texto = f"{nombre} {hardware_id}".lower()
-
-    if 'intel' in texto or 'ven_8086' in texto.replace('&', '_'):
-        return "Intel"
-    elif 'nvidia' in texto or 'ven_10de' in texto.replace('&', '_'):
-        return "NVIDIA"
-    elif 'amd' in texto or 'ati' in texto or 'ven_1002' in texto.replace('&', '_'):
-        return "AMD"
-    elif 'realtek' in texto or 'ven_10ec' in texto.replace('&', '_'):
-        return "Realtek"
-    elif 'qualcomm' in texto or 'atheros' in texto:
-        return "Qualcomm"
-    elif 'broadcom' in texto:
-        return "Broadcom"
-    elif 'microsoft' in texto:
-        return "Microsoft"
-
-    return "Desconocido"
-
-
-def escanear_drivers(callback: Optional[Callable[[str, int], None]] = None) -> ResultadoEscaneo:
+def _regex_trie(palabras: list[str]) -> str:
+    """Alternancia de las palabras factorizada por prefijos comunes.
+
+    En cada posición del texto el motor sigue un solo camino del árbol y, al
+    ser codicioso, coincide con la palabra más larga que empieza ahí.
     """
-    Escanea todos los drivers del sistema.
+    arbol: dict = {}
+    for palabra in palabras:
+        nodo = arbol
+        for caracter in palabra:
+            nodo = nodo.setdefault(caracter, {})
+        nodo[''] = {}
 
-    Args:
-        callback: Función para reportar progreso (mensaje, porcentaje)
+    def emitir(nodo: dict) -> str:
+        ramas = [re.escape(c) + emitir(hijo) for c, hijo in sorted(nodo.items()) if c]
+        if not ramas:
+            return ''
+        cuerpo = ramas[0] if len(ramas) == 1 else '(?:' + '|'.join(ramas) + ')'
+        return f'(?:{cuerpo})?' if '' in nodo else cuerpo
 
-    Returns:
-        ResultadoEscaneo con la lista de drivers encontrados
-    """
-    drivers: List[DriverInfo] = []
+    return emitir(arbol)
 
-    if callback:
-        callback("Obteniendo lista de dispositivos...", 10)
 
-    # Obtener todos los dispositivos con sus drivers
-    comando_drivers = """
-    Get-WmiObject Win32_PnPSignedDriver | Where-Object { $_.DeviceName -ne $null } |
-    Select-Object DeviceName, Manufacturer, DriverVersion, DriverDate, DeviceClass, DeviceID, InfName, IsSigned, HardWareID |
-    ConvertTo-Json -Compress
+class _Clasificador:
+    """
+    Busca todas las palabras clave de una tabla en una sola pasada.
+
+    Las palabras se compilan en una sola expresión dentro de un lookahead,
+    así que se encuentran todas las posiciones donde empieza alguna, aunque
+    se solapen. En cada posición se obtiene la palabra más larga; las más
+    cortas que también coinciden ahí son prefijos suyos, por eso cada
+    palabra lleva precalculada la mejor prioridad entre ella y sus prefijos.
+    Equivale a probar ``palabra in texto`` entrada por entrada.
     """
 
-    exito, salida = ejecutar_powershell(comando_drivers)
+    def __init__(self, tabla: list[tuple[object, list[str]]]):
+        self.valores = [valor for valor, _ in tabla]
+        prioridades: dict[str, int] = {}
+        for indice, (_, palabras) in enumerate(tabla):
+            for palabra in palabras:
+                prioridades.setdefault(palabra, indice)
+        self._prioridad = {
+            palabra: min(p for prefijo, p in prioridades.items() if palabra.startswith(prefijo))
+            for palabra in prioridades
+        }
+        self._patron = re.compile(f"(?=({_regex_trie(list(prioridades))}))")
 
-    if callback:
-        callback("Analizando drivers instalados...", 30)
+    def prioridad(self, texto: str) -> Optional[int]:
+        """Índice de la entrada más prioritaria presente en el texto, o None."""
+        encontradas = self._patron.findall(texto)
+        if not encontradas:
+            return None
+        return min(self._prioridad[palabra] for palabra in encontradas)
 
-    if exito and salida and salida.strip() not in ['', '[]', 'null']:
-        try:
-            import json
-            datos = json.loads(salida)
 
-            if isinstance(datos, dict):
-                datos = [datos]
+_CLASIFICADOR_CATEGORIA = _Clasificador(_PALABRAS_CATEGORIA)
+_CLASIFICADOR_FABRICANTE = _Clasificador(_PALABRAS_FABRICANTE)
 
-            total_drivers = len(datos)
-            for i, d in enumerate(datos):
-                if callback and i % 20 == 0:
-                    progreso = 30 + int((i / max(total_drivers, 1)) * 40)
-                    callback(f"Procesando driver {i+1} de {total_drivers}...", progreso)
-
-                nombre = d.get('DeviceName') or 'Desconocido'
-                if not nombre or nombre == 'Desconocido':
-                    continue  # Saltar dispositivos sin nombre
-
-                fabricante = d.get('Manufacturer') or 'Desconocido'
-                version = d.get('DriverVersion') or 'N/A'
-                fecha_raw = d.get('DriverDate', '')
-                clase = d.get('DeviceClass') or ''
-                device_id = d.get('DeviceID') or ''
-                inf_name = d.get('InfName') or ''
-                hardware_id = d.get('HardWareID') or ''
-
-                # Manejar HardwareID que puede ser lista o string
-                if isinstance(hardware_id, list):
-                    hardware_id = hardware_id[0] if hardware_id else ''
-
-                # Parsear fecha
-                fecha = "N/A"
-                if fecha_raw:
-                    try:
-                        # La fecha puede venir en formato WMI: yyyymmdd000000.000000+000
-                        fecha_str = str(fecha_raw)
-                        if len(fecha_str) >= 8:
-                            match = re.match(r'(\d{4})(\d{2})(\d{2})', fecha_str)
-                            if match:
-                                fecha = f"{match.group(3)}/{match.group(2)}/{match.group(1)}"
-                    except Exception:
-                        pass
-
-                # Determinar estado
-                estado = EstadoDriver.OK
-                if not version or version == 'N/A':
-                    estado = EstadoDriver.FALTANTE
-                elif not d.get('IsSigned', True):
-                    estado = EstadoDriver.PROBLEMA
-
-                # Identificar fabricante si no está disponible
-                if fabricante == 'Desconocido' or not fabricante:
-                    fabricante = _identificar_fabricante(nombre, hardware_id)
-
-                categoria = _categorizar_driver(nombre, clase)
-
-                driver = DriverInfo(
-                    nombre=nombre,
-                    dispositivo=nombre,
-                    fabricante=fabricante,
-                    version=version,
-                    fecha=fecha,
-                    estado=estado,
-                    categoria=categoria,
-                    device_id=device_id,
-                    inf_name=inf_name,
-                    hardware_id=hardware_id,
-                    necesita_actualizacion=estado != EstadoDriver.OK
-                )
-                drivers.append(driver)
+# Un VEN_xxxx cuenta con la misma prioridad que las palabras de su fabricante
+_PATRON_VENDOR = re.compile(r'ven_([0-9a-f]{4})')
+_PRIORIDAD_VENDOR = {
+    vendor: [f for f, _ in _PALABRAS_FABRICANTE].index(fabricante)
+    for vendor, fabricante in _FABRICANTES_PCI.items()
+}
 
-        except json.JSONDecodeError:
-            pass
-        except Exception:
-            pass
 
-    if callback:
-        callback("Verificando dispositivos con problemas...", 75)
+def _categorizar_driver(nombre: str, clase: str) -> CategoriaDriver:
+    """Determina la categoría del driver basándose en su nombre y clase."""
+    # El salto de línea separa los textos: ninguna palabra clave lo contiene
+    indice = _CLASIFICADOR_CATEGORIA.prioridad(f"{(nombre or '').lower()}\n{(clase or '').lower()}")
+    return CategoriaDriver.OTHER if indice is None else _CLASIFICADOR_CATEGORIA.valores[indice]
 
-    # Buscar dispositivos con problemas
-    comando_problemas = """
-    Get-PnpDevice | Where-Object { $_.Problem -ne 0 -or $_.Status -eq 'Error' -or $_.Status -eq 'Unknown' } |
-    Select-Object InstanceId, FriendlyName, Class, Problem, Status, HardwareID |
-    ConvertTo-Json -Compress
+
+def _identificar_fabricante(nombre: str, hardware_id: str) -> str:
+    """Identifica el fabricante basándose en el nombre y hardware ID."""
+    # "VEN&8086" cuenta igual que "VEN_8086"
+    texto = f"{nombre} {hardware_id}".lower().replace('&', '_')
+    indices = [_PRIORIDAD_VENDOR[v] for v in _PATRON_VENDOR.findall(texto) if v in _PRIORIDAD_VENDOR]
+    indice = _CLASIFICADOR_FABRICANTE.prioridad(texto)
+    if indice is not None:
+        indices.append(indice)
+    return _CLASIFICADOR_FABRICANTE.valores[min(indices)] if indices else "Desconocido"
+
+
+# Drivers firmados y dispositivos con problemas en una sola invocación
+_SCRIPT_ESCANEO = """
+Get-WmiObject Win32_PnPSignedDriver | Where-Object { $_.DeviceName -ne $null } | ForEach-Object {
+    'D ' + ($_ | Select-Object DeviceName, Manufacturer, DriverVersion, DriverDate, DeviceClass, DeviceID, InfName,
+        IsSigned, HardWareID | ConvertTo-Json -Compress -Depth 3)
+}
+Get-PnpDevice | Where-Object { $_.Problem -ne 0 -or $_.Status -eq 'Error' -or $_.Status -eq 'Unknown' } | ForEach-Object {
+    'P ' + ($_ | Select-Object InstanceId, FriendlyName, Class, Problem, Status, HardwareID | ConvertTo-Json -Compress -Depth 3)
+}
+"""
+
+# Lo mismo, limitado a los dispositivos de $ids y en un único objeto JSON
+_SCRIPT_ESCANEO_PARCIAL = """
+$ids = @({ids})
+$filtro = ($ids | ForEach-Object {{ "DeviceID='" + ($_ -replace '\\\\', '\\\\' -replace "'", "\\'") + "'" }}) -join ' OR '
+$drivers = @(Get-WmiObject Win32_PnPSignedDriver -Filter $filtro | Where-Object {{ $_.DeviceName -ne $null }} |
+    Select-Object DeviceName, Manufacturer, DriverVersion, DriverDate, DeviceClass, DeviceID, InfName, IsSigned, HardWareID)
+$problemas = @(Get-PnpDevice -InstanceId $ids -ErrorAction SilentlyContinue |
+    Where-Object {{ $_.Problem -ne 0 -or $_.Status -eq 'Error' -or $_.Status -eq 'Unknown' }} |
+    Select-Object InstanceId, FriendlyName, Class, Problem, Status, HardwareID)
+[pscustomobject]@{{ Drivers = $drivers; Problemas = $problemas }} | ConvertTo-Json -Compress -Depth 4
+"""
+
+# Consulta ligera: una línea "InstanceId<TAB>versión<TAB>problema<TAB>estado" por dispositivo
+_SCRIPT_HUELLAS = """
+$dispositivos = @(Get-PnpDevice)
+$versiones = @{}
+# -InstanceId es obligatorio: llega por la tubería desde cada dispositivo
+$dispositivos | Get-PnpDeviceProperty -KeyName DEVPKEY_Device_DriverVersion -ErrorAction SilentlyContinue |
+    ForEach-Object { $versiones[$_.InstanceId] = $_.Data }
+$dispositivos | ForEach-Object {
+    "$($_.InstanceId)`t$($versiones[$_.InstanceId])`t$($_.Problem)`t$($_.Status)"
+}
+"""
+
+_ARCHIVO_ESCANEO = "drivers_escaneo.json"
+LIMITE_REESCANEO_PARCIAL = 100  # Con más dispositivos cambiados se hace un escaneo completo
+TAMANO_LOTE = 50
+INTERVALO_LOTE = 0.25  # Segundos como máximo entre lotes mientras llegan resultados
+
+
+def _como_lista(datos) -> list:
+    """ConvertTo-Json entrega un objeto suelto cuando la lista tiene un solo elemento."""
+    if datos is None:
+        return []
+    if isinstance(datos, dict):
+        return [datos]
+    return list(datos)
+
+
+def _parsear_fecha(fecha_raw) -> str:
+    """Convierte una fecha WMI (yyyymmdd000000.000000+000) a dd/mm/aaaa."""
+    match = re.match(r'(\d{4})(\d{2})(\d{2})', str(fecha_raw or ''))
+    if not match:
+        return "N/A"
+    return f"{match.group(3)}/{match.group(2)}/{match.group(1)}"
+
+
+def _driver_desde_wmi(d: dict) -> Optional[DriverInfo]:
+    """Crea un DriverInfo a partir de una fila de Win32_PnPSignedDriver."""
+    nombre = d.get('DeviceName') or 'Desconocido'
+    if nombre == 'Desconocido':
+        return None  # Saltar dispositivos sin nombre
+
+    fabricante = d.get('Manufacturer') or 'Desconocido'
+    version = d.get('DriverVersion') or 'N/A'
+    clase = d.get('DeviceClass') or ''
+    hardware_id = d.get('HardWareID') or ''
+
+    # Manejar HardwareID que puede ser lista o string
+    if isinstance(hardware_id, list):
+        hardware_id = hardware_id[0] if hardware_id else ''
+
+    # Determinar estado
+    estado = EstadoDriver.OK
+    if version == 'N/A':
+        estado = EstadoDriver.FALTANTE
+    elif not d.get('IsSigned', True):
+        estado = EstadoDriver.PROBLEMA
+
+    # Identificar fabricante si no está disponible
+    if fabricante == 'Desconocido':
+        fabricante = _identificar_fabricante(nombre, hardware_id)
+
+    return DriverInfo(
+        nombre=nombre,
+        dispositivo=nombre,
+        fabricante=fabricante,
+        version=version,
+        fecha=_parsear_fecha(d.get('DriverDate')),
+        estado=estado,
+        categoria=_categorizar_driver(nombre, clase),
+        device_id=d.get('DeviceID') or '',
+        inf_name=d.get('InfName') or '',
+        hardware_id=hardware_id,
+        necesita_actualizacion=estado != EstadoDriver.OK
+    )
+
+
+def _driver_desde_problema(p: dict) -> DriverInfo:
+    """Crea un DriverInfo para un dispositivo con problemas que no tiene driver firmado."""
+    nombre = p.get('FriendlyName') or 'Dispositivo desconocido'
+    hardware_ids = _como_lista(p.get('HardwareID'))
+    hardware_id = hardware_ids[0] if hardware_ids else ''
+    return DriverInfo(
+        nombre=nombre,
+        dispositivo=nombre,
+        fabricante=_identificar_fabricante(nombre, hardware_id),
+        version="No instalado",
+        fecha="N/A",
+        estado=EstadoDriver.FALTANTE if p.get('Problem') == 28 else EstadoDriver.PROBLEMA,
+        categoria=CategoriaDriver.OTHER,
+        device_id=p.get('InstanceId') or '',
+        hardware_id=hardware_id,
+        necesita_actualizacion=True
+    )
+
+
+def _aplicar_problema(driver: DriverInfo, p: dict) -> None:
+    """Marca un driver con el problema que reporta su dispositivo."""
+    driver.estado = EstadoDriver.FALTANTE if p.get('Problem') == 28 else EstadoDriver.PROBLEMA
+    driver.necesita_actualizacion = True
+    driver.version_disponible = ""
+
+
+def _parsear_escaneo(datos: dict) -> List[DriverInfo]:
     """
+    Combina los drivers firmados con los dispositivos con problemas.
 
-    exito_prob, salida_prob = ejecutar_powershell(comando_problemas)
+    Los dispositivos se cruzan por device id (sin distinguir mayúsculas) a
+    través de un diccionario; los que tienen problemas y no aparecen entre
+    los drivers se agregan al final. No tiene efectos secundarios.
+    """
+    drivers: List[DriverInfo] = []
+    por_id: Dict[str, DriverInfo] = {}
+    for d in _como_lista(datos.get('Drivers')):
+        driver = _driver_desde_wmi(d)
+        if driver:
+            drivers.append(driver)
+            por_id.setdefault(driver.device_id.upper(), driver)
 
-    if exito_prob and salida_prob and salida_prob.strip() not in ['', '[]', 'null']:
-        try:
-            import json
-            problemas = json.loads(salida_prob)
-
-            if isinstance(problemas, dict):
-                problemas = [problemas]
-
-            for p in problemas:
-                device_id = p.get('InstanceId') or ''
-                nombre = p.get('FriendlyName') or 'Dispositivo desconocido'
-                error_code = p.get('Problem') or 0
-                hardware_ids = p.get('HardwareID') or []
-                hardware_id = hardware_ids[0] if hardware_ids else ''
-
-                # Verificar si ya existe
-                existe = False
-                for d in drivers:
-                    if d.device_id == device_id:
-                        if error_code == 28:
-                            d.estado = EstadoDriver.FALTANTE
-                        else:
-                            d.estado = EstadoDriver.PROBLEMA
-                        d.necesita_actualizacion = True
-                        existe = True
-                        break
-
-                if not existe:
-                    fabricante = _identificar_fabricante(nombre, hardware_id)
-                    estado = EstadoDriver.FALTANTE if error_code == 28 else EstadoDriver.PROBLEMA
-
-                    driver = DriverInfo(
-                        nombre=nombre,
-                        dispositivo=nombre,
-                        fabricante=fabricante,
-                        version="No instalado",
-                        fecha="N/A",
-                        estado=estado,
-                        categoria=CategoriaDriver.OTHER,
-                        device_id=device_id,
-                        hardware_id=hardware_id,
-                        necesita_actualizacion=True
-                    )
-                    drivers.append(driver)
+    for p in _como_lista(datos.get('Problemas')):
+        existente = por_id.get((p.get('InstanceId') or '').upper())
+        if existente is None:
+            drivers.append(_driver_desde_problema(p))
+            continue
+        _aplicar_problema(existente, p)
 
-        except:
-            pass
+    return drivers
 
-    if callback:
-        callback("Finalizando escaneo...", 95)
 
-    # Calcular estadísticas
+def _marcar_desactualizados(drivers: List[DriverInfo], catalogo: Optional[CatalogoDrivers] = None) -> int:
+    """
+    Marca como DESACTUALIZADO cada driver OK cuya versión es anterior a la
+    del catálogo local (ver src/utils/catalogo_drivers.py). Retorna cuántos.
+    """
+    if catalogo is None:
+        catalogo = obtener_catalogo()
+    if not len(catalogo):
+        return 0
+    marcados = 0
+    for driver in drivers:
+        if driver.estado != EstadoDriver.OK:
+            continue
+        instalada = parsear_version(driver.version)
+        disponible = catalogo.version_mas_reciente(driver.hardware_id or driver.device_id)
+        if instalada and disponible and instalada < disponible:
+            driver.estado = EstadoDriver.DESACTUALIZADO
+            driver.version_disponible = formatear_version(disponible)
+            driver.necesita_actualizacion = True
+            marcados += 1
+    return marcados
+
+
+def _resumir_escaneo(drivers: List[DriverInfo]) -> ResultadoEscaneo:
+    """Calcula las estadísticas de un escaneo."""
     actualizados = sum(1 for d in drivers if d.estado == EstadoDriver.OK)
     desactualizados = sum(1 for d in drivers if d.estado == EstadoDriver.DESACTUALIZADO)
     faltantes = sum(1 for d in drivers if d.estado == EstadoDriver.FALTANTE)
     con_problemas = sum(1 for d in drivers if d.estado == EstadoDriver.PROBLEMA)
-    todos_ok = faltantes == 0 and con_problemas == 0
-
-    if callback:
-        callback("Escaneo completado", 100)
-
     return ResultadoEscaneo(
         total=len(drivers),
         actualizados=actualizados,
@@ -312,10 +401,222 @@ def escanear_drivers(callback: Optional[Callable[[str, int], None]] = None) -> R
         faltantes=faltantes,
         con_problemas=con_problemas,
         drivers=drivers,
-        todos_ok=todos_ok
+        todos_ok=faltantes == 0 and con_problemas == 0
     )
 
 
+def _parsear_huellas(salida: str) -> Dict[str, str]:
+    """Convierte la salida de _SCRIPT_HUELLAS en device id (mayúsculas) -> huella."""
+    huellas = {}
+    for linea in salida.splitlines():
+        instancia, _, resto = linea.strip().partition('\t')
+        if instancia and resto:
+            huellas[instancia.upper()] = resto
+    return huellas
+
+
+def _huella_global(huellas: Dict[str, str]) -> str:
+    """Cantidad de dispositivos más un hash de sus ids, versiones y estados."""
+    resumen = hashlib.sha1()
+    for instancia in sorted(huellas):
+        resumen.update(f"{instancia}\t{huellas[instancia]}\n".encode('utf-8'))
+    return f"{len(huellas)}:{resumen.hexdigest()}"
+
+
+def _driver_a_json(driver: DriverInfo) -> dict:
+    """Serializa un driver sin lo que sale del catálogo, que se recalcula al leerlo."""
+    datos = dict(driver.__dict__)
+    if driver.estado == EstadoDriver.DESACTUALIZADO:
+        datos['necesita_actualizacion'] = False
+        datos['estado'] = EstadoDriver.OK
+    datos['version_disponible'] = ""
+    datos['estado'] = datos['estado'].name
+    datos['categoria'] = driver.categoria.name
+    return datos
+
+
+def _driver_desde_json(datos: dict) -> DriverInfo:
+    return DriverInfo(**{
+        **datos,
+        'estado': EstadoDriver[datos['estado']],
+        'categoria': CategoriaDriver[datos['categoria']],
+    })
+
+
+def _leer_cache_escaneo() -> Optional[dict]:
+    """Último escaneo guardado, o None si no hay o no se puede leer."""
+    cache = leer_json(_ARCHIVO_ESCANEO)
+    try:
+        return {
+            'huella': cache['huella'],
+            'dispositivos': dict(cache['dispositivos']),
+            'drivers': [_driver_desde_json(d) for d in cache['drivers']],
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _guardar_cache_escaneo(huellas: Dict[str, str], drivers: List[DriverInfo]) -> None:
+    try:
+        escribir_json(_ARCHIVO_ESCANEO, {
+            'huella': _huella_global(huellas),
+            'dispositivos': huellas,
+            'drivers': [_driver_a_json(d) for d in drivers],
+        })
+    except OSError:
+        pass
+
+
+def _consultar_escaneo(script: str) -> Optional[dict]:
+    """Ejecuta un script de escaneo y retorna su JSON, o None si la consulta falló."""
+    exito, salida = ejecutar_powershell(script)
+    if not exito:
+        return None
+    try:
+        datos = json.loads(salida)
+    except json.JSONDecodeError:
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+def _literal_ps(texto: str) -> str:
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def escanear_drivers_por_lotes(forzar: bool = False, tamano_lote: int = TAMANO_LOTE) -> Iterator[LoteEscaneo]:
+    """
+    Escanea los drivers entregando los resultados por lotes a medida que llegan.
+
+    Primero se toma una huella ligera de los dispositivos (id, versión del
+    driver y estado de cada uno). Si coincide con la del último escaneo
+    guardado, se entrega ese resultado sin consultar WMI; si cambiaron pocos
+    dispositivos, solo esos se vuelven a escanear. En ambos casos llega un
+    único lote con todo. Si el reescaneo parcial falla, se hace el completo.
+
+    En otro caso se hace un escaneo completo (ver _SCRIPT_ESCANEO), que
+    escribe un driver por línea y después los dispositivos con problemas. Se
+    entrega un lote cada ``tamano_lote`` drivers o cada INTERVALO_LOTE
+    segundos. Un problema de un driver ya entregado lo modifica en el sitio y
+    lo incluye en ``actualizados`` del lote siguiente. Las versiones se
+    comparan con el catálogo local antes de entregar cada lote.
+
+    El último lote trae el ResultadoEscaneo completo. Solo se guarda para el
+    próximo escaneo si la consulta terminó bien: un escaneo vacío o cortado
+    guardado con la huella actual se seguiría usando hasta que algo cambie.
+    """
+    exito, salida = ejecutar_powershell(_SCRIPT_HUELLAS)
+    huellas = _parsear_huellas(salida) if exito else {}
+    cache = None if forzar or not huellas else _leer_cache_escaneo()
+
+    if cache and cache['huella'] == _huella_global(huellas):
+        _marcar_desactualizados(cache['drivers'])
+        yield LoteEscaneo(cache['drivers'], mensaje="Sin cambios desde el último escaneo", progreso=100,
+                          resultado=_resumir_escaneo(cache['drivers']))
+        return
+
+    cambiados = []
+    if cache:
+        previas = cache['dispositivos']
+        cambiados = [i for i, huella in huellas.items() if previas.get(i) != huella]
+        quitados = {i for i in previas if i not in huellas}
+
+    if cache and len(cambiados) <= LIMITE_REESCANEO_PARCIAL:
+        yield LoteEscaneo([], mensaje=f"Escaneando {len(cambiados)} dispositivos que cambiaron...", progreso=30)
+        datos = {}
+        if cambiados:
+            ids = ", ".join(_literal_ps(i) for i in cambiados)
+            datos = _consultar_escaneo(_SCRIPT_ESCANEO_PARCIAL.format(ids=ids))
+        if datos is not None:
+            descartar = set(cambiados) | quitados
+            drivers = [d for d in cache['drivers'] if d.device_id.upper() not in descartar] + _parsear_escaneo(datos)
+            _guardar_cache_escaneo(huellas, drivers)
+            _marcar_desactualizados(drivers)
+            yield LoteEscaneo(drivers, mensaje="Escaneo completado", progreso=100,
+                              resultado=_resumir_escaneo(drivers))
+            return
+
+    yield LoteEscaneo([], mensaje="Obteniendo dispositivos y drivers...", progreso=10)
+    drivers: List[DriverInfo] = []
+    por_id: Dict[str, tuple[int, DriverInfo]] = {}  # Device id -> (posición en drivers, driver)
+    pendientes: List[DriverInfo] = []
+    actualizados: Dict[str, DriverInfo] = {}
+    entregados = 0  # Los primeros de drivers ya están en algún lote
+    ultimo_lote = time.monotonic()
+
+    lineas = iterar_powershell(_SCRIPT_ESCANEO)
+    while True:
+        try:
+            linea = next(lineas)
+        except StopIteration as fin:
+            completo = fin.value
+            break
+        tipo, _, texto = linea.partition(' ')
+        try:
+            datos = json.loads(texto)
+        except json.JSONDecodeError:
+            continue
+        if not isinstance(datos, dict):
+            continue
+
+        if tipo == 'D':
+            driver = _driver_desde_wmi(datos)
+            if driver:
+                por_id.setdefault(driver.device_id.upper(), (len(drivers), driver))
+                drivers.append(driver)
+                pendientes.append(driver)
+        elif tipo == 'P':
+            clave = (datos.get('InstanceId') or '').upper()
+            if clave not in por_id:
+                drivers.append(_driver_desde_problema(datos))
+                pendientes.append(drivers[-1])
+            else:
+                posicion, existente = por_id[clave]
+                _aplicar_problema(existente, datos)
+                if posicion < entregados:
+                    actualizados[clave] = existente
+
+        if len(pendientes) + len(actualizados) >= tamano_lote or (
+                (pendientes or actualizados) and time.monotonic() - ultimo_lote >= INTERVALO_LOTE):
+            _marcar_desactualizados(pendientes)
+            progreso = 10 + int(80 * min(len(drivers) / max(len(huellas), 1), 1)) if huellas else 10
+            yield LoteEscaneo(pendientes, list(actualizados.values()),
+                              mensaje=f"Analizando drivers instalados ({len(drivers)})...", progreso=progreso)
+            entregados = len(drivers)
+            pendientes, actualizados = [], {}
+            ultimo_lote = time.monotonic()
+
+    if huellas and completo:
+        _guardar_cache_escaneo(huellas, drivers)
+    _marcar_desactualizados(pendientes)
+    yield LoteEscaneo(pendientes, list(actualizados.values()), mensaje="Escaneo completado", progreso=100,
+                      resultado=_resumir_escaneo(drivers))
+
+
+def escanear_drivers(callback: Optional[Callable[[str, int], None]] = None,
+                     forzar: bool = False) -> ResultadoEscaneo:
+    """
+    Escanea todos los drivers del sistema.
+
+    Consume escanear_drivers_por_lotes y retorna el resultado completo.
+
+    Args:
+        callback: Función para reportar progreso (mensaje, porcentaje)
+        forzar: Ignorar el escaneo guardado y consultar todo de nuevo
+
+    Returns:
+        ResultadoEscaneo con la lista de drivers encontrados
+    """
+    if callback:
+        callback("Comprobando cambios en los dispositivos...", 5)
+
+    resultado = None
+    for lote in escanear_drivers_por_lotes(forzar):
+        if callback:
+            callback(lote.mensaje, lote.progreso)
+        resultado = lote.resultado or resultado
+    return resultado
+
+
 def _descargar_intel_dsa(callback: Optional[Callable[[str, int], None]] = None) -> tuple[bool, str]:
     """Descarga e instala Intel Driver & Support Assistant."""
     if callback:
@@ -1,8 +1,13 @@
 """Módulo de limpieza del sistema."""
+import fnmatch
 import os
-import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from typing import Callable, Iterator
 from src.utils.admin import ejecutar_powershell, ejecutar_cmd
+from src.utils.indice_tamanos import obtener_indice, es_enlace as _es_enlace
 
 
 @dataclass
@@ -15,92 +20,128 @@ class ResultadoLimpieza:
     mensaje: str = ""
 
 
+@dataclass
+class AnalisisLimpieza:
+    """Espacio que liberaría un limpiador, calculado sin eliminar nada."""
+    id: str
+    nombre: str
+    espacio_recuperable_mb: float
+    archivos: int
+    truncado: bool = False  # Se alcanzó el límite de archivos: los valores son un mínimo
+
+
+@dataclass
+class EventoLimpieza:
+    """Progreso acumulado de un limpiador mientras se ejecuta."""
+    nombre: str
+    bytes_liberados: int = 0
+    archivos_eliminados: int = 0
+    errores: int = 0
+    directorio_actual: str = ""
+    resultado: ResultadoLimpieza | None = None  # Solo en el evento final
+
+
 def limpiar_temp_usuario() -> ResultadoLimpieza:
     """Limpia archivos temporales del usuario."""
+    return _consumir(limpiar_temp_usuario_con_progreso())
+
+
+def limpiar_temp_usuario_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia archivos temporales del usuario emitiendo progreso."""
     ruta = os.environ.get('TEMP', '')
-    return _limpiar_directorio(ruta, "Temp Usuario")
+    return _flujo_directorio(ruta, "Temp Usuario")
 
 
 def limpiar_temp_windows() -> ResultadoLimpieza:
     """Limpia archivos temporales de Windows."""
+    return _consumir(limpiar_temp_windows_con_progreso())
+
+
+def limpiar_temp_windows_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia archivos temporales de Windows emitiendo progreso."""
     ruta = "C:\\Windows\\Temp"
-    return _limpiar_directorio(ruta, "Temp Windows")
+    return _flujo_directorio(ruta, "Temp Windows")
 
 
 def limpiar_prefetch() -> ResultadoLimpieza:
     """Limpia archivos Prefetch."""
+    return _consumir(limpiar_prefetch_con_progreso())
+
+
+def limpiar_prefetch_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia archivos Prefetch emitiendo progreso."""
     ruta = "C:\\Windows\\Prefetch"
-    return _limpiar_directorio(ruta, "Prefetch")
+    return _flujo_directorio(ruta, "Prefetch")
 
 
 def limpiar_cache_windows_update() -> ResultadoLimpieza:
     """Limpia caché de Windows Update."""
-    ruta = "C:\\Windows\\SoftwareDistribution\\Download"
+    return _consumir(limpiar_cache_windows_update_con_progreso())
 
-    # Calcular tamaño antes de limpiar
-    tamano_antes = _obtener_tamano_directorio(ruta) if os.path.exists(ruta) else 0
 
-    cmd = '''
+def limpiar_cache_windows_update_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia caché de Windows Update emitiendo progreso."""
+    nombre = "Caché Windows Update"
+    ruta = "C:\\Windows\\SoftwareDistribution\\Download"
+
     # Detener el servicio de Windows Update
+    exito, _ = ejecutar_powershell('''
     $wu = Get-Service -Name "wuauserv" -ErrorAction SilentlyContinue
     if ($wu -and $wu.Status -eq 'Running') {
         Stop-Service -Name "wuauserv" -Force -ErrorAction SilentlyContinue
         Start-Sleep -Seconds 2
     }
+    ''')
 
-    # Limpiar caché
-    if (Test-Path "C:\\Windows\\SoftwareDistribution\\Download") {
-        Remove-Item -Path "C:\\Windows\\SoftwareDistribution\\Download\\*" -Recurse -Force -ErrorAction SilentlyContinue
-    }
-
-    # Reiniciar servicio
-    Start-Service -Name "wuauserv" -ErrorAction SilentlyContinue
-    Write-Output "DONE"
-    '''
+    # Limpiar caché contando exactamente lo que se elimina
+    try:
+        bytes_liberados, archivos, errores = yield from _flujo_rutas(nombre, [ruta])
+    finally:
+        # Reiniciar servicio aunque se interrumpa la limpieza
+        ejecutar_powershell('Start-Service -Name "wuauserv" -ErrorAction SilentlyContinue')
 
-    exito, salida = ejecutar_powershell(cmd)
-
-    # Calcular espacio liberado
-    tamano_despues = _obtener_tamano_directorio(ruta) if os.path.exists(ruta) else 0
-    espacio_liberado = max(0, tamano_antes - tamano_despues)
-
-    return ResultadoLimpieza(
-        nombre="Caché Windows Update",
-        espacio_liberado_mb=round(espacio_liberado, 2),
-        archivos_eliminados=0,
-        exito="DONE" in salida or exito,
-        mensaje="Caché limpiada correctamente" if exito else "Error parcial al limpiar"
-    )
+    yield _evento_final(ResultadoLimpieza(
+        nombre=nombre,
+        espacio_liberado_mb=round(bytes_liberados / (1024 * 1024), 2),
+        archivos_eliminados=archivos,
+        exito=exito,
+        mensaje="Caché limpiada correctamente" if exito and not errores else "Error parcial al limpiar"
+    ), errores)
 
 
 def limpiar_thumbnails() -> ResultadoLimpieza:
     """Limpia caché de miniaturas."""
+    return _consumir(limpiar_thumbnails_con_progreso())
+
+
+def limpiar_thumbnails_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia caché de miniaturas emitiendo progreso."""
+    nombre = "Caché de Miniaturas"
     ruta = os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'Windows', 'Explorer')
 
-    archivos = 0
-    tamano = 0
-
-    if os.path.exists(ruta):
-        for archivo in os.listdir(ruta):
-            if archivo.startswith('thumbcache_') and archivo.endswith('.db'):
-                archivo_path = os.path.join(ruta, archivo)
-                try:
-                    tamano += os.path.getsize(archivo_path) / (1024 * 1024)
-                    os.remove(archivo_path)
-                    archivos += 1
-                except:
-                    pass
+    bytes_liberados, archivos, errores = yield from _flujo_rutas(
+        nombre, [ruta], _PATRON_THUMBNAILS, recursivo=False
+    )
 
-    return ResultadoLimpieza(
-        nombre="Caché de Miniaturas",
-        espacio_liberado_mb=round(tamano, 2),
+    yield _evento_final(ResultadoLimpieza(
+        nombre=nombre,
+        espacio_liberado_mb=round(bytes_liberados / (1024 * 1024), 2),
         archivos_eliminados=archivos,
         exito=True
-    )
+    ), errores)
+
+
+_PATRON_THUMBNAILS = 'thumbcache_*.db'
 
 
 def limpiar_cache_navegadores() -> ResultadoLimpieza:
     """Limpia caché de navegadores comunes."""
+    return _consumir(limpiar_cache_navegadores_con_progreso())
+
+
+def limpiar_cache_navegadores_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia caché de navegadores comunes emitiendo progreso."""
+    nombre = "Caché de Navegadores"
     rutas = [
         # Chrome
         os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Google', 'Chrome', 'User Data', 'Default', 'Cache'),
@@ -110,21 +151,14 @@ def limpiar_cache_navegadores() -> ResultadoLimpieza:
         os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Mozilla', 'Firefox', 'Profiles'),
     ]
 
-    total_tamano = 0
-    total_archivos = 0
-
-    for ruta in rutas:
-        if os.path.exists(ruta):
-            resultado = _limpiar_directorio(ruta, "temp")
-            total_tamano += resultado.espacio_liberado_mb
-            total_archivos += resultado.archivos_eliminados
+    bytes_liberados, archivos, errores = yield from _flujo_rutas(nombre, rutas)
 
-    return ResultadoLimpieza(
-        nombre="Caché de Navegadores",
-        espacio_liberado_mb=round(total_tamano, 2),
-        archivos_eliminados=total_archivos,
+    yield _evento_final(ResultadoLimpieza(
+        nombre=nombre,
+        espacio_liberado_mb=round(bytes_liberados / (1024 * 1024), 2),
+        archivos_eliminados=archivos,
         exito=True
-    )
+    ), errores)
 
 
 def limpiar_papelera() -> ResultadoLimpieza:
@@ -142,26 +176,25 @@ def limpiar_papelera() -> ResultadoLimpieza:
 
 def limpiar_logs_windows() -> ResultadoLimpieza:
     """Limpia logs antiguos de Windows."""
+    return _consumir(limpiar_logs_windows_con_progreso())
+
+
+def limpiar_logs_windows_con_progreso() -> Iterator[EventoLimpieza]:
+    """Limpia logs antiguos de Windows emitiendo progreso."""
+    nombre = "Logs de Windows"
     rutas = [
         "C:\\Windows\\Logs\\CBS",
         "C:\\Windows\\Logs\\DISM",
     ]
 
-    total_tamano = 0
-    total_archivos = 0
-
-    for ruta in rutas:
-        if os.path.exists(ruta):
-            resultado = _limpiar_directorio(ruta, "temp")
-            total_tamano += resultado.espacio_liberado_mb
-            total_archivos += resultado.archivos_eliminados
+    bytes_liberados, archivos, errores = yield from _flujo_rutas(nombre, rutas)
 
-    return ResultadoLimpieza(
-        nombre="Logs de Windows",
-        espacio_liberado_mb=round(total_tamano, 2),
-        archivos_eliminados=total_archivos,
+    yield _evento_final(ResultadoLimpieza(
+        nombre=nombre,
+        espacio_liberado_mb=round(bytes_liberados / (1024 * 1024), 2),
+        archivos_eliminados=archivos,
         exito=True
-    )
+    ), errores)
 
 
 def ejecutar_limpieza_disco() -> ResultadoLimpieza:
@@ -202,61 +235,594 @@ def ejecutar_limpieza_disco() -> ResultadoLimpieza:
     )
 
 
-def ejecutar_limpieza_completa() -> list[ResultadoLimpieza]:
-    """Ejecuta todas las limpiezas y retorna los resultados."""
-    resultados = [
-        limpiar_temp_usuario(),
-        limpiar_temp_windows(),
-        limpiar_prefetch(),
-        limpiar_cache_windows_update(),
-        limpiar_thumbnails(),
-        limpiar_logs_windows(),
-        limpiar_papelera(),
-    ]
-    return resultados
+@dataclass
+class Limpiador:
+    """Limpiador que forma parte de la limpieza completa."""
+    id: str
+    nombre: str
+    funcion: Callable[[], ResultadoLimpieza]
+    # Rutas que toca el limpiador; determinan los volúmenes que ocupa
+    rutas: Callable[[], list[str]] | None = None
+    # Qué se elimina dentro de cada ruta (para el análisis sin borrar)
+    patron: str | None = None
+    recursivo: bool = True
+    # Medición propia (bytes, archivos) para limpiadores sin rutas
+    medir: Callable[[], tuple[int, int]] | None = None
+    # Variante con progreso de funcion; el último evento trae el resultado
+    flujo: Callable[[], Iterator[EventoLimpieza]] | None = None
+
+
+LIMPIADORES: list[Limpiador] = [
+    Limpiador("temp_usuario", "Temp Usuario", limpiar_temp_usuario,
+              lambda: [os.environ.get('TEMP', '')],
+              flujo=limpiar_temp_usuario_con_progreso),
+    Limpiador("temp_windows", "Temp Windows", limpiar_temp_windows,
+              lambda: ["C:\\Windows\\Temp"],
+              flujo=limpiar_temp_windows_con_progreso),
+    Limpiador("prefetch", "Prefetch", limpiar_prefetch,
+              lambda: ["C:\\Windows\\Prefetch"],
+              flujo=limpiar_prefetch_con_progreso),
+    Limpiador("windows_update", "Caché Windows Update", limpiar_cache_windows_update,
+              lambda: ["C:\\Windows\\SoftwareDistribution\\Download"],
+              flujo=limpiar_cache_windows_update_con_progreso),
+    Limpiador("thumbnails", "Caché de Miniaturas", limpiar_thumbnails,
+              lambda: [os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'Windows', 'Explorer')],
+              patron=_PATRON_THUMBNAILS, recursivo=False,
+              flujo=limpiar_thumbnails_con_progreso),
+    Limpiador("logs_windows", "Logs de Windows", limpiar_logs_windows,
+              lambda: ["C:\\Windows\\Logs\\CBS", "C:\\Windows\\Logs\\DISM"],
+              flujo=limpiar_logs_windows_con_progreso),
+    # La papelera abarca todas las unidades y la vacía el shell: sin límite por volumen
+    Limpiador("papelera", "Papelera de Reciclaje", limpiar_papelera,
+              medir=lambda: _medir_papelera()),
+]
+
+
+def _volumenes(limpiador: Limpiador) -> list[str]:
+    """Volúmenes que ocupa un limpiador, ordenados para adquirirlos sin interbloqueo."""
+    volumenes = set()
+    for ruta in (limpiador.rutas() if limpiador.rutas else []):
+        if ruta:
+            unidad = os.path.splitdrive(os.path.abspath(ruta))[0]
+            volumenes.add(unidad.upper() or os.sep)
+    return sorted(volumenes)
+
+
+INTERVALO_PROGRESO = 0.1  # Segundos mínimos entre eventos de progreso (~10 por segundo)
+
+
+class LimitadorEventos:
+    """Deja pasar como mucho un evento por intervalo; se puede compartir entre hilos."""
+
+    def __init__(self, intervalo: float = INTERVALO_PROGRESO):
+        self.intervalo = intervalo
+        self._ultimo = float('-inf')
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._ultimo < self.intervalo:
+                return False
+            self._ultimo = ahora
+            return True
+
+
+def limpiar_con_progreso(
+    limpiador: Limpiador,
+    limitador: LimitadorEventos | None = None
+) -> Iterator[EventoLimpieza]:
+    """
+    Ejecuta un limpiador emitiendo eventos de progreso limitados en frecuencia.
+
+    Los eventos intermedios que llegan antes del intervalo se descartan; el
+    evento final, con ``resultado``, se emite siempre.
+    """
+    if limpiador.flujo is None:
+        yield _evento_final(limpiador.funcion())
+        return
+
+    limitador = limitador or LimitadorEventos()
+    for evento in limpiador.flujo():
+        if evento.resultado is not None or limitador.permitir():
+            yield evento
+
+
+def _ejecutar_limpiador(
+    limpiador: Limpiador,
+    semaforos: dict[str, threading.Semaphore],
+    al_progresar: Callable[[EventoLimpieza], None] | None = None,
+    limitador: LimitadorEventos | None = None
+) -> ResultadoLimpieza:
+    """Ejecuta un limpiador respetando el límite de concurrencia de sus volúmenes."""
+    tomados = []
+    try:
+        for volumen in _volumenes(limpiador):
+            if volumen in semaforos:
+                semaforos[volumen].acquire()
+                tomados.append(semaforos[volumen])
+        for evento in limpiar_con_progreso(limpiador, limitador):
+            if evento.resultado is not None:
+                return evento.resultado
+            if al_progresar:
+                al_progresar(evento)
+        raise RuntimeError("El limpiador terminó sin resultado")
+    except Exception as e:
+        return ResultadoLimpieza(limpiador.nombre, 0, 0, False, str(e))
+    finally:
+        for semaforo in reversed(tomados):
+            semaforo.release()
+
+
+def limpiar_en_paralelo(
+    limpiadores: list[Limpiador] | None = None,
+    max_hilos: int = 4,
+    max_por_volumen: int = 2,
+    al_progresar: Callable[[EventoLimpieza], None] | None = None
+) -> Iterator[tuple[str, ResultadoLimpieza]]:
+    """
+    Ejecuta limpiadores en un pool de hilos acotado.
+
+    Como mucho ``max_por_volumen`` limpiadores trabajan a la vez sobre la
+    misma unidad. Los resultados se entregan como (id, resultado) a medida
+    que cada limpiador termina, no en el orden de la tabla.
+
+    ``al_progresar`` se llama desde los hilos del pool; todos los limpiadores
+    comparten un mismo limitador, así que recibe como mucho unos 10 eventos
+    por segundo en total.
+    """
+    limitador = LimitadorEventos()
+    limpiadores = LIMPIADORES if limpiadores is None else limpiadores
+    semaforos: dict[str, threading.Semaphore] = {}
+    for limpiador in limpiadores:
+        for volumen in _volumenes(limpiador):
+            semaforos.setdefault(volumen, threading.Semaphore(max_por_volumen))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as pool:
+        futuros = {
+            pool.submit(_ejecutar_limpiador, limpiador, semaforos, al_progresar, limitador): limpiador.id
+            for limpiador in limpiadores
+        }
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
+
+
+def ejecutar_limpieza_completa(
+    paralelo: bool = False,
+    al_terminar: Callable[[ResultadoLimpieza], None] | None = None,
+    al_progresar: Callable[[EventoLimpieza], None] | None = None
+) -> list[ResultadoLimpieza]:
+    """
+    Ejecuta todas las limpiezas y retorna los resultados.
+
+    Args:
+        paralelo: Ejecutar los limpiadores de forma concurrente
+        al_terminar: Se llama con cada resultado en cuanto está disponible
+        al_progresar: Recibe el progreso de los limpiadores (~10 eventos/s como máximo)
+
+    Returns:
+        Resultados en el orden de LIMPIADORES, sin importar el modo
+    """
+    if not paralelo:
+        resultados = []
+        limitador = LimitadorEventos()
+        for limpiador in LIMPIADORES:
+            resultado = _ejecutar_limpiador(limpiador, {}, al_progresar, limitador)
+            if al_terminar:
+                al_terminar(resultado)
+            resultados.append(resultado)
+        return resultados
+
+    por_id = {}
+    for id_limpiador, resultado in limpiar_en_paralelo(al_progresar=al_progresar):
+        if al_terminar:
+            al_terminar(resultado)
+        por_id[id_limpiador] = resultado
+    return [por_id[limpiador.id] for limpiador in LIMPIADORES]
+
+
+LIMITE_ANALISIS = 200_000  # Archivos por ruta antes de cortar el análisis
+
+
+def analizar_limpiador(limpiador: Limpiador, limite: int = LIMITE_ANALISIS,
+                       listar: bool = False) -> AnalisisLimpieza:
+    """
+    Calcula cuánto liberaría un limpiador sin eliminar nada.
+
+    Los árboles completos se miden con el índice persistente de tamaños. Con
+    ``listar`` se arma además la lista de archivos en memoria, que una
+    limpieza inmediatamente posterior reutiliza en lugar de recorrer de nuevo.
+    """
+    truncado = False
+    if limpiador.medir:
+        try:
+            total, archivos = limpiador.medir()
+        except Exception:
+            total, archivos = 0, 0
+    else:
+        total = archivos = 0
+        for ruta in (limpiador.rutas() if limpiador.rutas else []):
+            if not ruta or not os.path.isdir(ruta):
+                continue
+            if limpiador.patron is None and limpiador.recursivo and not listar:
+                bytes_ruta, archivos_ruta, truncado_ruta = obtener_indice().medir(ruta, limite)
+            else:
+                escaneo = _analizar_ruta(ruta, limpiador.patron, limpiador.recursivo, limite)
+                bytes_ruta, archivos_ruta, truncado_ruta = escaneo.bytes, len(escaneo.archivos), escaneo.truncado
+            total += bytes_ruta
+            archivos += archivos_ruta
+            truncado = truncado or truncado_ruta
+
+    return AnalisisLimpieza(
+        id=limpiador.id,
+        nombre=limpiador.nombre,
+        espacio_recuperable_mb=round(total / (1024 * 1024), 2),
+        archivos=archivos,
+        truncado=truncado
+    )
 
 
-def _limpiar_directorio(ruta: str, nombre: str) -> ResultadoLimpieza:
-    """Limpia un directorio y retorna estadísticas."""
-    if not os.path.exists(ruta):
-        return ResultadoLimpieza(nombre, 0, 0, True, "Directorio no existe")
+def analizar_limpieza(
+    limpiadores: list[Limpiador] | None = None,
+    max_hilos: int = 8,
+    al_terminar: Callable[[AnalisisLimpieza], None] | None = None,
+    listar: bool = False
+) -> list[AnalisisLimpieza]:
+    """
+    Analiza en paralelo el espacio recuperable de cada limpiador.
+
+    Las mediciones se validan con el mtime de cada directorio, así que
+    repetir el análisis no vuelve a listar lo que no cambió (ver
+    analizar_limpiador para ``listar``).
+
+    Returns:
+        Análisis en el orden de la tabla de limpiadores
+    """
+    limpiadores = LIMPIADORES if limpiadores is None else limpiadores
+    por_id = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as pool:
+        futuros = {
+            pool.submit(analizar_limpiador, limpiador, LIMITE_ANALISIS, listar): limpiador
+            for limpiador in limpiadores
+        }
+        for futuro in as_completed(futuros):
+            limpiador = futuros[futuro]
+            try:
+                analisis = futuro.result()
+            except Exception:
+                analisis = AnalisisLimpieza(limpiador.id, limpiador.nombre, 0, 0)
+            if al_terminar:
+                al_terminar(analisis)
+            por_id[limpiador.id] = analisis
+    return [por_id[limpiador.id] for limpiador in limpiadores]
+
+
+def _medir_papelera() -> tuple[int, int]:
+    """Cuenta los elementos de la papelera y su tamaño en bytes."""
+    exito, salida = ejecutar_powershell('''
+    $items = @((New-Object -ComObject Shell.Application).NameSpace(10).Items())
+    $total = [int64]0
+    foreach ($item in $items) { $total += [int64]$item.ExtendedProperty("Size") }
+    Write-Output "$($items.Count) $total"
+    ''')
+    partes = salida.split() if exito else []
+    if len(partes) == 2 and all(p.isdigit() for p in partes):
+        return int(partes[1]), int(partes[0])
+    return 0, 0
 
-    tamano_total = 0
-    archivos_eliminados = 0
 
-    for root, dirs, files in os.walk(ruta):
-        for archivo in files:
-            archivo_path = os.path.join(root, archivo)
-            try:
-                tamano_total += os.path.getsize(archivo_path)
-                os.remove(archivo_path)
-                archivos_eliminados += 1
-            except:
-                pass
-
-        for dir in dirs:
-            dir_path = os.path.join(root, dir)
+@dataclass
+class _Escaneo:
+    """Lista de lo que se eliminaría en una ruta, con los mtime de sus directorios."""
+    archivos: list[tuple[str, int]]  # (ruta, bytes)
+    directorios: list[str]  # Subdirectorios en orden de descubrimiento
+    mtimes: dict[str, int]  # Directorio -> st_mtime_ns al listarlo
+    truncado: bool = False
+
+    @property
+    def bytes(self) -> int:
+        return sum(tamano for _, tamano in self.archivos)
+
+
+_escaneos: dict[tuple[str, str | None, bool], _Escaneo] = {}
+_escaneos_lock = threading.Lock()
+
+
+def _escanear_arbol(ruta: str, patron: str | None = None, recursivo: bool = True,
+                    limite: int | None = None) -> _Escaneo:
+    """Recorre una ruta con os.scandir y anota lo que se eliminaría."""
+    escaneo = _Escaneo([], [], {})
+    pila = [ruta]
+    while pila:
+        directorio = pila.pop()
+        try:
+            # El mtime se toma antes de listar: un cambio durante el recorrido invalida el escaneo
+            escaneo.mtimes[directorio] = os.stat(directorio).st_mtime_ns
+            with os.scandir(directorio) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False) and not _es_enlace(entrada):
+                            if recursivo:
+                                pila.append(entrada.path)
+                                if patron is None:
+                                    escaneo.directorios.append(entrada.path)
+                            continue
+                        if patron and not fnmatch.fnmatch(entrada.name, patron):
+                            continue
+                        escaneo.archivos.append((entrada.path, entrada.stat(follow_symlinks=False).st_size))
+                    except OSError:
+                        continue
+                    if limite and len(escaneo.archivos) >= limite:
+                        escaneo.truncado = True
+                        return escaneo
+        except OSError:
+            continue
+    return escaneo
+
+
+def _escaneo_vigente(clave: tuple[str, str | None, bool]) -> _Escaneo | None:
+    """Retorna el escaneo en caché si ningún directorio cambió desde entonces."""
+    with _escaneos_lock:
+        escaneo = _escaneos.get(clave)
+    if escaneo is None:
+        return None
+    try:
+        vigente = all(os.stat(d).st_mtime_ns == m for d, m in escaneo.mtimes.items())
+    except OSError:
+        vigente = False
+    if not vigente:
+        with _escaneos_lock:
+            if _escaneos.get(clave) is escaneo:
+                del _escaneos[clave]
+        return None
+    return escaneo
+
+
+def _analizar_ruta(ruta: str, patron: str | None, recursivo: bool, limite: int | None) -> _Escaneo:
+    """Escanea una ruta reutilizando la caché. Los escaneos truncados no se guardan."""
+    clave = (ruta, patron, recursivo)
+    escaneo = _escaneo_vigente(clave)
+    if escaneo is None:
+        escaneo = _escanear_arbol(ruta, patron, recursivo, limite)
+        if not escaneo.truncado:
+            with _escaneos_lock:
+                _escaneos[clave] = escaneo
+    return escaneo
+
+
+# Cada cuántos archivos los recorridos emiten progreso, además de al cambiar de directorio
+_PROGRESO_CADA = 256
+
+
+def _iterar_eliminacion_escaneo(escaneo: _Escaneo) -> Iterator[tuple[int, int, int, str]]:
+    """Elimina lo listado en un escaneo emitiendo (bytes, archivos, errores, directorio) acumulados."""
+    bytes_liberados = 0
+    archivos = 0
+    errores = 0
+    directorio_actual = ""
+    for indice, (ruta, tamano) in enumerate(escaneo.archivos):
+        directorio = os.path.dirname(ruta)
+        if directorio != directorio_actual or indice % _PROGRESO_CADA == 0:
+            directorio_actual = directorio
+            yield bytes_liberados, archivos, errores, directorio_actual
+        try:
             try:
-                shutil.rmtree(dir_path, ignore_errors=True)
-            except:
-                pass
+                os.unlink(ruta)
+            except (IsADirectoryError, PermissionError):
+                # Enlaces a directorios en Windows se eliminan con rmdir
+                if not os.path.isdir(ruta):
+                    raise
+                os.rmdir(ruta)
+            bytes_liberados += tamano
+            archivos += 1
+        except FileNotFoundError:
+            pass
+        except OSError:
+            errores += 1
+    # Los hijos se descubren después que sus padres: recorrer al revés los vacía primero
+    for directorio in reversed(escaneo.directorios):
+        try:
+            os.rmdir(directorio)
+        except OSError:
+            errores += 1
+    yield bytes_liberados, archivos, errores, directorio_actual
+
+
+def _eliminar_escaneo(escaneo: _Escaneo) -> tuple[int, int, int]:
+    """Elimina lo listado en un escaneo. Retorna (bytes_liberados, archivos_eliminados, errores)."""
+    return _totales(_iterar_eliminacion_escaneo(escaneo))
+
+
+def _iterar_limpieza_ruta(ruta: str, patron: str | None = None,
+                          recursivo: bool = True) -> Iterator[tuple[int, int, int, str]]:
+    """Limpia una ruta emitiendo progreso; reutiliza un análisis previo si sigue vigente."""
+    clave = (ruta, patron, recursivo)
+    escaneo = _escaneo_vigente(clave)
+    try:
+        if escaneo is not None:
+            yield from _iterar_eliminacion_escaneo(escaneo)
+        elif patron is None and recursivo:
+            yield from _iterar_limpieza_arbol(ruta)
+        else:
+            yield from _iterar_eliminacion_escaneo(_escanear_arbol(ruta, patron, recursivo))
+    finally:
+        with _escaneos_lock:
+            _escaneos.pop(clave, None)
+
+
+def _limpiar_ruta(ruta: str, patron: str | None = None, recursivo: bool = True) -> tuple[int, int, int]:
+    """
+    Limpia una ruta reutilizando la lista de un análisis previo si sigue vigente.
+
+    Returns:
+        (bytes_liberados, archivos_eliminados, errores)
+    """
+    return _totales(_iterar_limpieza_ruta(ruta, patron, recursivo))
+
+
+def _totales(progreso: Iterator[tuple[int, int, int, str]]) -> tuple[int, int, int]:
+    """Consume un recorrido y retorna sus totales (bytes, archivos, errores)."""
+    ultimo = (0, 0, 0, "")
+    for ultimo in progreso:
+        pass
+    return ultimo[:3]
+
+
+def _flujo_rutas(nombre: str, rutas: list[str], patron: str | None = None,
+                 recursivo: bool = True) -> Iterator[EventoLimpieza]:
+    """
+    Limpia varias rutas emitiendo eventos con el progreso acumulado.
+
+    Las rutas inexistentes se omiten. Retorna (con ``yield from``) los totales
+    (bytes_liberados, archivos_eliminados, errores).
+    """
+    base = (0, 0, 0)
+    for ruta in rutas:
+        if not ruta or not os.path.exists(ruta):
+            continue
+        progreso = (0, 0, 0)
+        for bytes_liberados, archivos, errores, directorio in _iterar_limpieza_ruta(ruta, patron, recursivo):
+            progreso = (bytes_liberados, archivos, errores)
+            yield EventoLimpieza(
+                nombre,
+                base[0] + bytes_liberados,
+                base[1] + archivos,
+                base[2] + errores,
+                directorio
+            )
+        base = tuple(a + b for a, b in zip(base, progreso))
+    return base
+
+
+def _flujo_directorio(ruta: str, nombre: str) -> Iterator[EventoLimpieza]:
+    """Limpia un directorio emitiendo progreso; el último evento trae el resultado."""
+    if not os.path.exists(ruta):
+        yield _evento_final(ResultadoLimpieza(nombre, 0, 0, True, "Directorio no existe"))
+        return
 
-    return ResultadoLimpieza(
+    bytes_liberados, archivos_eliminados, errores = yield from _flujo_rutas(nombre, [ruta])
+
+    yield _evento_final(ResultadoLimpieza(
         nombre=nombre,
-        espacio_liberado_mb=round(tamano_total / (1024 * 1024), 2),
+        espacio_liberado_mb=round(bytes_liberados / (1024 * 1024), 2),
         archivos_eliminados=archivos_eliminados,
         exito=True
+    ), errores)
+
+
+def _evento_final(resultado: ResultadoLimpieza, errores: int = 0) -> EventoLimpieza:
+    """Evento que cierra el flujo de un limpiador."""
+    return EventoLimpieza(
+        nombre=resultado.nombre,
+        bytes_liberados=round(resultado.espacio_liberado_mb * 1024 * 1024),
+        archivos_eliminados=resultado.archivos_eliminados,
+        errores=errores,
+        resultado=resultado
     )
 
 
-def _obtener_tamano_directorio(ruta: str) -> float:
-    """Obtiene el tamaño de un directorio en MB."""
+def _consumir(eventos: Iterator[EventoLimpieza]) -> ResultadoLimpieza:
+    """Recorre el flujo de un limpiador y retorna su resultado final."""
+    for evento in eventos:
+        if evento.resultado is not None:
+            return evento.resultado
+    raise RuntimeError("El limpiador terminó sin resultado")
+
+
+def _iterar_limpieza_arbol(ruta: str) -> Iterator[tuple[int, int, int, str]]:
+    """
+    Elimina el contenido de un directorio en un único recorrido con os.scandir.
+
+    Los archivos se borran al encontrarlos, reutilizando el stat de DirEntry
+    para contar su tamaño, y los subdirectorios se eliminan de abajo hacia
+    arriba una vez vaciados. Los enlaces se eliminan sin seguirlos. El
+    directorio raíz se conserva.
+
+    Emite (bytes_liberados, archivos_eliminados, errores, directorio_actual)
+    acumulados al entrar a cada directorio, cada ``_PROGRESO_CADA`` archivos
+    y al terminar.
+    """
+    bytes_liberados = 0
+    archivos = 0
+    errores = 0
+
+    # Cada elemento es (directorio, vaciado); un directorio vuelve a la pila
+    # marcado como vaciado para borrarlo después que todos sus hijos.
+    pila = [(ruta, False)]
+    while pila:
+        directorio, vaciado = pila.pop()
+        if vaciado:
+            try:
+                os.rmdir(directorio)
+            except OSError:
+                errores += 1
+            continue
+
+        if directorio != ruta:
+            pila.append((directorio, True))
+        yield bytes_liberados, archivos, errores, directorio
+
+        try:
+            with os.scandir(directorio) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False) and not _es_enlace(entrada):
+                            pila.append((entrada.path, False))
+                            continue
+                        tamano = entrada.stat(follow_symlinks=False).st_size
+                        try:
+                            os.unlink(entrada.path)
+                        except (IsADirectoryError, PermissionError):
+                            # Enlaces a directorios en Windows se eliminan con rmdir
+                            if not entrada.is_dir(follow_symlinks=False):
+                                raise
+                            os.rmdir(entrada.path)
+                        bytes_liberados += tamano
+                        archivos += 1
+                        if archivos % _PROGRESO_CADA == 0:
+                            yield bytes_liberados, archivos, errores, directorio
+                    except OSError:
+                        errores += 1
+        except OSError:
+            errores += 1
+
+    yield bytes_liberados, archivos, errores, ruta
+
+
+def _limpiar_arbol(ruta: str) -> tuple[int, int, int]:
+    """
+    Elimina el contenido de un directorio conservando la raíz.
+
+    Returns:
+        (bytes_liberados, archivos_eliminados, errores)
+    """
+    return _totales(_iterar_limpieza_arbol(ruta))
+
+
+def _medir_arbol(ruta: str) -> tuple[int, int]:
+    """Suma el tamaño de un árbol con os.scandir. Retorna (bytes, archivos)."""
     total = 0
-    if os.path.exists(ruta):
-        for root, dirs, files in os.walk(ruta):
-            for archivo in files:
-                try:
-                    total += os.path.getsize(os.path.join(root, archivo))
-                except:
-                    pass
+    archivos = 0
+    pila = [ruta]
+    while pila:
+        directorio = pila.pop()
+        try:
+            with os.scandir(directorio) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False) and not _es_enlace(entrada):
+                            pila.append(entrada.path)
+                        else:
+                            total += entrada.stat(follow_symlinks=False).st_size
+                            archivos += 1
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total, archivos
+
+
+def _obtener_tamano_directorio(ruta: str) -> float:
+    """Obtiene el tamaño de un directorio en MB usando el índice persistente."""
+    total, _, _ = obtener_indice().medir(ruta)
     return round(total / (1024 * 1024), 2)
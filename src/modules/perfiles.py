@@ -1,8 +1,12 @@
 """Módulo de perfiles de optimización predefinidos."""
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from enum import Enum
 from typing import Callable
 from src.modules import tweaks, servicios, bloatware, limpieza
+from src.modules.tweaks import Tweak
+from src.utils.costos import estimar_costo
+from src.utils.etapas import Etapa, ejecutar_etapas
+from src.utils.operaciones import ConfigurarServicio, EliminarAppx, depurar_operaciones
 
 
 class NivelPerfil(Enum):
@@ -23,6 +27,8 @@ class ResultadoPerfil:
     apps_eliminadas: int
     espacio_liberado_mb: float
     requiere_reinicio: bool
+    tweaks_omitidos: int = 0  # Ya estaban aplicados
+    operaciones_redundantes: int = 0  # Quitadas del plan por repetidas o reemplazadas
 
 
 @dataclass
@@ -155,85 +161,187 @@ PERFILES = {
 }
 
 
-def aplicar_perfil(nivel: NivelPerfil, callback: Callable[[str, int], None] | None = None) -> ResultadoPerfil:
+@dataclass
+class PlanPerfil:
+    """Operaciones de un perfil ya depuradas, listas para ejecutar."""
+    tweaks: list[Tweak] = field(default_factory=list)  # Con sus operaciones depuradas
+    tweaks_cubiertos: list[str] = field(default_factory=list)  # Todo lo que hacían ya lo hace otro paso
+    tweaks_omitidos: int = 0
+    servicios: list[str] = field(default_factory=list)
+    servicios_cubiertos: list[str] = field(default_factory=list)  # Los configura un tweak del plan
+    paquetes: list[str] = field(default_factory=list)
+    limpiar: bool = False
+    redundantes: int = 0
+
+
+def _servicios_perfil(nivel: NivelPerfil) -> list[str]:
+    """Servicios que deshabilita el paso de servicios de cada perfil."""
+    if nivel == NivelPerfil.MAXIMO:
+        return list(servicios.SERVICIOS_DESHABILITABLES.keys())
+    if nivel == NivelPerfil.MINIMO:
+        return list(servicios.SERVICIOS_TELEMETRIA)
+    return list(servicios.SERVICIOS_PERFIL_RECOMENDADO)
+
+
+def planificar_perfil(nivel: NivelPerfil) -> PlanPerfil:
+    """
+    Expande un perfil a un único plan de operaciones y quita lo redundante.
+
+    Los tweaks ya aplicados se omiten. Tweaks, servicios y bloatware se
+    expresan como operaciones en el orden en que se ejecutan; se quitan las
+    repetidas y las que un paso posterior reemplaza, y el resto se reparte
+    de nuevo entre los pasos. Los servicios que ya deshabilita un tweak
+    quedan en ``servicios_cubiertos``: su estado original se registra antes
+    de los tweaks para que restaurar_servicios pueda devolverlos.
+    """
+    perfil = PERFILES[nivel]
+    plan = PlanPerfil(limpiar=perfil.limpiar_sistema)
+
+    lista_tweaks = [t for t in (tweaks.obtener_tweak_por_id(i) for i in perfil.tweaks) if t]
+    if lista_tweaks:
+        estados = tweaks.detectar_estados_tweaks(lista_tweaks)
+        pendientes = [t for t in lista_tweaks if estados[t.id] != tweaks.EstadoTweak.APLICADO]
+        plan.tweaks_omitidos = len(lista_tweaks) - len(pendientes)
+        lista_tweaks = pendientes
+
+    # Plan completo: (paso, operación); paso es un Tweak, "servicio" o "paquete"
+    pasos = [(tweak, op) for tweak in lista_tweaks for op in tweak.operaciones]
+    if perfil.deshabilitar_servicios:
+        pasos += [("servicio", ConfigurarServicio(nombre, "Disabled", detener=True))
+                  for nombre in _servicios_perfil(nivel)]
+    if perfil.eliminar_bloatware:
+        pasos += [("paquete", EliminarAppx(paquete)) for paquete in bloatware.obtener_paquetes_recomendados()]
+
+    conservar = depurar_operaciones([op for _, op in pasos])
+    plan.redundantes = conservar.count(False)
+
+    operaciones_tweak: dict[str, list] = {t.id: [] for t in lista_tweaks}
+    for (paso, operacion), conservada in zip(pasos, conservar):
+        if not conservada:
+            if paso == "servicio":
+                plan.servicios_cubiertos.append(operacion.nombre)
+            continue
+        if paso == "servicio":
+            plan.servicios.append(operacion.nombre)
+        elif paso == "paquete":
+            plan.paquetes.append(operacion.patron)
+        else:
+            operaciones_tweak[paso.id].append(operacion)
+
+    for tweak in lista_tweaks:
+        if not tweak.operaciones:
+            plan.tweaks.append(tweak)
+        elif not operaciones_tweak[tweak.id]:
+            plan.tweaks_cubiertos.append(tweak.id)
+        elif len(operaciones_tweak[tweak.id]) == len(tweak.operaciones):
+            plan.tweaks.append(tweak)
+        else:
+            plan.tweaks.append(replace(tweak, operaciones=operaciones_tweak[tweak.id], script=""))
+    return plan
+
+
+def etapas_perfil(perfil: Perfil, plan: PlanPerfil) -> list[Etapa]:
+    """
+    Etapas de un plan de perfil y sus dependencias.
+
+    Los servicios van después de los tweaks porque ambos configuran
+    servicios. La eliminación de bloatware y la limpieza de archivos no
+    dependen de nada y corren junto a los demás; los pasos de PowerShell
+    comparten la sesión persistente, así que entre ellos se turnan, pero la
+    limpieza trabaja en disco mientras tanto.
+
+    El peso de cada etapa es su duración estimada según las ejecuciones
+    anteriores (ver src/utils/costos.py).
+    """
+    etapas = []
+    total_tweaks = len(plan.tweaks) + len(plan.tweaks_cubiertos)
+
+    if plan.tweaks:
+        def aplicar(avance):
+            if plan.servicios_cubiertos:
+                # Antes de que los tweaks los cambien: el paso de servicios ya no los toca
+                servicios.registrar_estados_originales(plan.servicios_cubiertos)
+            resultados = tweaks.aplicar_tweaks_en_lote(plan.tweaks, ejecucion=f"Perfil {perfil.nombre}")
+            exitos = sum(1 for t in plan.tweaks if resultados[t.id][0]) + len(plan.tweaks_cubiertos)
+            avance(1.0, f"Tweaks aplicados: {exitos} de {total_tweaks}")
+            return resultados
+        etapas.append(Etapa("tweaks", aplicar, f"Aplicando {len(plan.tweaks)} tweaks...",
+                            peso=estimar_costo("tweaks", len(plan.tweaks)), unidades=len(plan.tweaks)))
+
+    if plan.servicios:
+        etapas.append(Etapa(
+            "servicios", lambda avance: servicios.detener_servicios(plan.servicios),
+            "Deshabilitando servicios...",
+            peso=estimar_costo("servicios", len(plan.servicios)),
+            depende_de=("tweaks",) if plan.tweaks else (),
+            unidades=len(plan.servicios)
+        ))
+
+    if plan.paquetes:
+        etapas.append(Etapa(
+            "bloatware", lambda avance: bloatware.desinstalar_multiples_apps(plan.paquetes),
+            "Eliminando bloatware...",
+            peso=estimar_costo("bloatware", len(plan.paquetes)),
+            unidades=len(plan.paquetes)
+        ))
+
+    if plan.limpiar:
+        def limpiar(avance):
+            terminados = []
+            total = len(limpieza.LIMPIADORES) or 1
+
+            def al_terminar(resultado):
+                terminados.append(resultado)
+                avance(len(terminados) / total)
+            return limpieza.ejecutar_limpieza_completa(paralelo=True, al_terminar=al_terminar)
+        etapas.append(Etapa("limpieza", limpiar, "Limpiando sistema...", peso=estimar_costo("limpieza")))
+
+    return etapas
+
+
+def aplicar_perfil(nivel: NivelPerfil, callback: Callable[[str, int], None] | None = None,
+                   max_hilos: int = 3,
+                   al_estimar: Callable[[float | None], None] | None = None) -> ResultadoPerfil:
     """
     Aplica un perfil de optimización completo.
 
+    Primero arma el plan depurado (ver planificar_perfil) y luego ejecuta
+    sus etapas (ver etapas_perfil), en paralelo las que no dependen entre sí.
+
     Args:
         nivel: El nivel de perfil a aplicar
-        callback: Función opcional para reportar progreso (mensaje, porcentaje)
+        callback: Función opcional para reportar progreso (mensaje, porcentaje).
+            Puede llamarse desde varios hilos; el porcentaje nunca retrocede.
+        max_hilos: Etapas que pueden correr a la vez
+        al_estimar: Función opcional que recibe los segundos restantes estimados
 
     Returns:
         ResultadoPerfil con los resultados de la operación
     """
     perfil = PERFILES[nivel]
+    plan = planificar_perfil(nivel)
+
+    if not plan.tweaks and plan.tweaks_omitidos and callback:
+        callback(f"Los {plan.tweaks_omitidos} tweaks ya estaban aplicados", 0)
 
-    tweaks_ok = 0
+    resultados = ejecutar_etapas(etapas_perfil(perfil, plan), max_hilos=max_hilos, callback=callback,
+                                 al_estimar=al_estimar, registrar_costos=True)
+
+    # Lo que hacían los cubiertos lo ejecutó otro paso del plan
+    tweaks_ok = len(plan.tweaks_cubiertos)
     tweaks_fail = 0
-    servicios_ok = 0
-    apps_ok = 0
-    espacio = 0.0
     reinicio = False
-
-    total_pasos = len(perfil.tweaks)
-    if perfil.deshabilitar_servicios:
-        total_pasos += 1
-    if perfil.eliminar_bloatware:
-        total_pasos += 1
-    if perfil.limpiar_sistema:
-        total_pasos += 1
-
-    paso_actual = 0
-
-    # 1. Aplicar tweaks
-    for tweak_id in perfil.tweaks:
-        paso_actual += 1
-        tweak = tweaks.obtener_tweak_por_id(tweak_id)
-
-        if tweak:
-            if callback:
-                callback(f"Aplicando: {tweak.nombre}", int((paso_actual / total_pasos) * 100))
-
-            exito, _ = tweak.aplicar()
-            if exito:
-                tweaks_ok += 1
-                if tweak.requiere_reinicio:
-                    reinicio = True
-            else:
-                tweaks_fail += 1
-
-    # 2. Deshabilitar servicios
-    if perfil.deshabilitar_servicios:
-        paso_actual += 1
-        if callback:
-            callback("Deshabilitando servicios...", int((paso_actual / total_pasos) * 100))
-
-        if nivel == NivelPerfil.MAXIMO:
-            ok, _ = servicios.aplicar_perfil_maximo()
-        elif nivel == NivelPerfil.MINIMO:
-            ok, _ = servicios.aplicar_perfil_minimo()
+    for tweak in plan.tweaks:
+        exito, _ = resultados["tweaks"][tweak.id]
+        if exito:
+            tweaks_ok += 1
+            reinicio = reinicio or tweak.requiere_reinicio
         else:
-            ok, _ = servicios.aplicar_perfil_recomendado()
-        servicios_ok = ok
-
-    # 3. Eliminar bloatware
-    if perfil.eliminar_bloatware:
-        paso_actual += 1
-        if callback:
-            callback("Eliminando bloatware...", int((paso_actual / total_pasos) * 100))
-
-        ok, _ = bloatware.eliminar_todo_bloatware_recomendado()
-        apps_ok = ok
-
-    # 4. Limpiar sistema
-    if perfil.limpiar_sistema:
-        paso_actual += 1
-        if callback:
-            callback("Limpiando sistema...", int((paso_actual / total_pasos) * 100))
+            tweaks_fail += 1
 
-        resultados = limpieza.ejecutar_limpieza_completa()
-        for r in resultados:
-            espacio += r.espacio_liberado_mb
+    servicios_ok = sum(1 for exito, _ in resultados.get("servicios", {}).values() if exito)
+    apps_ok = sum(1 for exito, _ in resultados.get("bloatware", {}).values() if exito)
+    espacio = sum(r.espacio_liberado_mb for r in resultados.get("limpieza", []))
 
     if callback:
         callback("¡Completado!", 100)
@@ -245,7 +353,9 @@ def aplicar_perfil(nivel: NivelPerfil, callback: Callable[[str, int], None] | No
         servicios_deshabilitados=servicios_ok,
         apps_eliminadas=apps_ok,
         espacio_liberado_mb=round(espacio, 2),
-        requiere_reinicio=reinicio
+        requiere_reinicio=reinicio,
+        tweaks_omitidos=plan.tweaks_omitidos,
+        operaciones_redundantes=plan.redundantes
     )
 
 
@@ -1,7 +1,15 @@
 """Módulo de gestión de servicios de Windows."""
-from dataclasses import dataclass
+import json
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
 from enum import Enum
+from typing import Callable
 from src.utils.admin import ejecutar_powershell
+from src.utils.sesion_powershell import SesionPowerShell
+from src.utils.datos import leer_json, escribir_json
+from src.utils.lote import ejecutar_lote, parsear_lote, MARCADOR
 
 
 class EstadoServicio(Enum):
@@ -27,6 +35,21 @@ class Servicio:
     tipo_inicio: TipoInicio
     recomendacion: str = ""
     seguro_deshabilitar: bool = False
+    pid: int = 0
+    dependencias: list[str] = field(default_factory=list)  # Servicios de los que depende
+    dependientes: list[str] = field(default_factory=list)  # Servicios que dependen de este
+    inicio_retrasado: bool = False
+
+
+@dataclass
+class InstantaneaServicios:
+    """Instantánea de los servicios del sistema indexada por nombre."""
+    servicios: dict[str, Servicio]  # Clave: nombre en minúsculas
+    fecha: float = field(default_factory=time.time)
+
+    def obtener(self, nombre: str) -> Servicio | None:
+        """Busca un servicio por nombre (sin distinguir mayúsculas)."""
+        return self.servicios.get(nombre.lower())
 
 
 # Servicios que se pueden deshabilitar de forma segura
@@ -92,168 +115,701 @@ SERVICIOS_DESHABILITABLES = {
 }
 
 
-def obtener_servicios() -> list[Servicio]:
-    """Obtiene todos los servicios del sistema."""
-    cmd = '''
-    Get-Service | Select-Object Name, DisplayName, Status, StartType | ConvertTo-Json -Compress
-    '''
-    exito, salida = ejecutar_powershell(cmd)
+# Instantánea compartida: una sola consulta alimenta todas las búsquedas
+_INSTANTANEA_TTL = 30  # segundos
+_instantanea: InstantaneaServicios | None = None
+_instantanea_lock = threading.Lock()
 
-    if not exito or not salida or salida.strip() in ['', '[]', 'null']:
+_SCRIPT_INSTANTANEA = '''
+$deps = @{}
+foreach ($s in Get-Service -ErrorAction SilentlyContinue) {
+    $deps[$s.Name] = @(
+        @($s.ServicesDependedOn | ForEach-Object { $_.Name }),
+        @($s.DependentServices | ForEach-Object { $_.Name })
+    )
+}
+@(Get-CimInstance -ClassName Win32_Service -ErrorAction SilentlyContinue | ForEach-Object {
+    $d = $deps[$_.Name]
+    [pscustomobject]@{
+        N = $_.Name
+        D = $_.DisplayName
+        X = $_.Description
+        E = $_.State
+        I = $_.StartMode
+        R = [bool]$_.DelayedAutoStart
+        P = [int]$_.ProcessId
+        A = if ($d) { @($d[0]) } else { @() }
+        B = if ($d) { @($d[1]) } else { @() }
+    }
+}) | ConvertTo-Json -Compress -Depth 3
+'''
+
+
+def _parsear_estado(valor) -> EstadoServicio:
+    """Convierte el estado de Win32_Service (o de Get-Service) a EstadoServicio."""
+    if isinstance(valor, int):
+        return EstadoServicio.EJECUTANDO if valor == 4 else EstadoServicio.DETENIDO
+    if isinstance(valor, str):
+        return EstadoServicio.EJECUTANDO if valor.lower() == 'running' else EstadoServicio.DETENIDO
+    return EstadoServicio.DESCONOCIDO
+
+
+def _parsear_tipo_inicio(valor, retrasado: bool = False) -> TipoInicio:
+    """Convierte StartMode de Win32_Service (Auto, Manual, Disabled...) a TipoInicio."""
+    if isinstance(valor, int):
+        valor = {2: "auto", 3: "manual", 4: "disabled"}.get(valor, "auto")
+    modo = valor.lower() if isinstance(valor, str) else ""
+    if 'disabled' in modo:
+        return TipoInicio.DESHABILITADO
+    if 'auto' in modo:
+        return TipoInicio.AUTOMATICO_RETRASADO if retrasado else TipoInicio.AUTOMATICO
+    if modo in ('boot', 'system'):
+        return TipoInicio.AUTOMATICO
+    return TipoInicio.MANUAL
+
+
+def _lista_nombres(valor) -> list[str]:
+    """Normaliza una lista de nombres de ConvertTo-Json (puede llegar como str o null)."""
+    if not valor:
         return []
+    if isinstance(valor, str):
+        return [valor]
+    return [str(v) for v in valor if v]
 
-    import json
+
+def _parsear_instantanea(salida: str) -> dict[str, Servicio]:
+    """Convierte la salida JSON del script de instantánea en servicios indexados por nombre."""
+    if not salida or salida.strip() in ['', '[]', 'null']:
+        return {}
     try:
         datos = json.loads(salida)
-        if isinstance(datos, dict):
-            datos = [datos]
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(datos, dict):
+        datos = [datos]
+
+    servicios = {}
+    for svc in datos:
+        nombre = svc.get('N') if isinstance(svc, dict) else None
+        if not nombre:
+            continue
+
+        retrasado = bool(svc.get('R'))
+        descripcion = svc.get('X') or ""
+        recomendacion = ""
+        seguro = False
+        if nombre in SERVICIOS_DESHABILITABLES:
+            descripcion, recomendacion = SERVICIOS_DESHABILITABLES[nombre]
+            seguro = True
+
+        servicios[nombre.lower()] = Servicio(
+            nombre=nombre,
+            nombre_display=svc.get('D') or nombre,
+            descripcion=descripcion,
+            estado=_parsear_estado(svc.get('E')),
+            tipo_inicio=_parsear_tipo_inicio(svc.get('I'), retrasado),
+            recomendacion=recomendacion,
+            seguro_deshabilitar=seguro,
+            pid=int(svc.get('P') or 0),
+            dependencias=_lista_nombres(svc.get('A')),
+            dependientes=_lista_nombres(svc.get('B')),
+            inicio_retrasado=retrasado
+        )
+    return servicios
+
+
+def _tomar_instantanea(ejecutar: Callable[[str], tuple[bool, str]] | None = None) -> InstantaneaServicios:
+    """Consulta todos los servicios con Win32_Service en una sola llamada."""
+    exito, salida = (ejecutar or ejecutar_powershell)(_SCRIPT_INSTANTANEA)
+    return InstantaneaServicios(_parsear_instantanea(salida) if exito else {})
+
+
+def obtener_instantanea(forzar: bool = False) -> InstantaneaServicios:
+    """Retorna la instantánea de servicios, tomándola si hace falta."""
+    global _instantanea
+    with _instantanea_lock:
+        if forzar or _instantanea is None or time.time() - _instantanea.fecha > _INSTANTANEA_TTL:
+            _instantanea = _tomar_instantanea()
+        return _instantanea
+
+
+def invalidar_instantanea():
+    """Descarta la instantánea para que la próxima consulta la renueve."""
+    global _instantanea
+    with _instantanea_lock:
+        _instantanea = None
 
-        servicios = []
-        for svc in datos:
-            nombre = svc.get('Name', '')
-            if not nombre:
-                continue
 
-            # Estado puede ser número (4=Running, 1=Stopped) o string
-            status = svc.get('Status')
-            if isinstance(status, int):
-                estado = EstadoServicio.EJECUTANDO if status == 4 else EstadoServicio.DETENIDO
-            elif isinstance(status, str):
-                estado = EstadoServicio.EJECUTANDO if status.lower() == 'running' else EstadoServicio.DETENIDO
-            else:
-                estado = EstadoServicio.DESCONOCIDO
-
-            # StartType puede ser número (2=Auto, 3=Manual, 4=Disabled) o string
-            tipo = svc.get('StartType', 0)
-            if isinstance(tipo, int):
-                if tipo == 2:
-                    tipo_inicio = TipoInicio.AUTOMATICO
-                elif tipo == 3:
-                    tipo_inicio = TipoInicio.MANUAL
-                elif tipo == 4:
-                    tipo_inicio = TipoInicio.DESHABILITADO
-                else:
-                    tipo_inicio = TipoInicio.AUTOMATICO
-            elif isinstance(tipo, str):
-                tipo_lower = tipo.lower()
-                if 'disabled' in tipo_lower:
-                    tipo_inicio = TipoInicio.DESHABILITADO
-                elif 'manual' in tipo_lower:
-                    tipo_inicio = TipoInicio.MANUAL
-                elif 'auto' in tipo_lower:
-                    tipo_inicio = TipoInicio.AUTOMATICO
-                else:
-                    tipo_inicio = TipoInicio.MANUAL
-            else:
-                tipo_inicio = TipoInicio.MANUAL
-
-            desc = ""
-            recomendacion = ""
-            seguro = False
-
-            if nombre in SERVICIOS_DESHABILITABLES:
-                desc, recomendacion = SERVICIOS_DESHABILITABLES[nombre]
-                seguro = True
-
-            servicios.append(Servicio(
-                nombre=nombre,
-                nombre_display=svc.get('DisplayName', nombre) or nombre,
-                descripcion=desc,
-                estado=estado,
-                tipo_inicio=tipo_inicio,
-                recomendacion=recomendacion,
-                seguro_deshabilitar=seguro
-            ))
-
-        return servicios
-    except Exception:
-        return []
+def obtener_servicios() -> list[Servicio]:
+    """Obtiene todos los servicios del sistema."""
+    return list(obtener_instantanea().servicios.values())
+
 
+def obtener_servicio(nombre: str) -> Servicio | None:
+    """Busca un servicio por nombre (sin distinguir mayúsculas)."""
+    return obtener_instantanea().obtener(nombre)
 
-def obtener_servicios_deshabilitables() -> list[Servicio]:
+
+def obtener_servicios_deshabilitables(instantanea: InstantaneaServicios | None = None) -> list[Servicio]:
     """Obtiene solo los servicios que se pueden deshabilitar de forma segura."""
-    todos = obtener_servicios()
-    return [s for s in todos if s.seguro_deshabilitar]
+    instantanea = instantanea or obtener_instantanea()
+    servicios = [instantanea.obtener(nombre) for nombre in SERVICIOS_DESHABILITABLES]
+    return [s for s in servicios if s is not None]
+
+
+# Vigilancia: sondeo ligero del SCM y publicación de los servicios que cambiaron
+INTERVALO_VIGILANCIA = 3.0  # segundos
+
+# Solo los campos volátiles, una línea por servicio separada por tabuladores
+_SCRIPT_SONDEO = '''
+Get-CimInstance -ClassName Win32_Service -Property Name,State,StartMode,DelayedAutoStart,ProcessId -ErrorAction SilentlyContinue |
+    ForEach-Object { "{0}`t{1}`t{2}`t{3}`t{4}" -f $_.Name, $_.State, $_.StartMode, [int][bool]$_.DelayedAutoStart, [int]$_.ProcessId }
+'''
+
+
+@dataclass
+class CambiosServicios:
+    """Servicios que cambiaron entre dos sondeos."""
+    modificados: list[Servicio]  # Servicios nuevos o con estado, tipo de inicio o PID distinto
+    eliminados: list[str]  # Nombres de servicios que ya no existen
+    fecha: float = field(default_factory=time.time)
+
+
+def _parsear_sondeo(salida: str) -> dict[str, tuple[EstadoServicio, TipoInicio, int]]:
+    """Convierte la salida del sondeo en (estado, tipo_inicio, pid) por nombre en minúsculas."""
+    volatiles = {}
+    for linea in salida.splitlines():
+        partes = linea.strip().split('\t')
+        if len(partes) != 5 or not partes[0]:
+            continue
+        nombre, estado, modo, retrasado, pid = partes
+        volatiles[nombre.lower()] = (
+            _parsear_estado(estado),
+            _parsear_tipo_inicio(modo, retrasado == '1'),
+            int(pid) if pid.isdigit() else 0
+        )
+    return volatiles
+
+
+class VigilanteServicios:
+    """Hilo que sondea el SCM por un canal propio y publica solo los cambios.
+
+    La primera pasada toma una instantánea completa; las siguientes consultan
+    solo estado, tipo de inicio y PID, y comparan contra la anterior. Si
+    aparece un servicio desconocido se vuelve a tomar la instantánea completa.
+    Un suscriptor puede pasar la instantánea que ya muestra como base, para
+    recibir también los cambios ocurridos desde que se tomó.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_VIGILANCIA,
+                 ejecutar: Callable[[str], tuple[bool, str]] | None = None):
+        self.intervalo = intervalo
+        self._sesion: SesionPowerShell | None = None
+        self._ejecutar = ejecutar
+        self._base: dict[str, Servicio] | None = None
+        self._base_pendiente: dict[str, Servicio] | None = None  # Se adopta en el próximo sondeo
+        self._suscriptores: list[Callable[[CambiosServicios], None]] = []
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo: threading.Thread | None = None
+
+    def _ejecutar_script(self, script: str) -> tuple[bool, str]:
+        if self._ejecutar is not None:
+            return self._ejecutar(script)
+        if self._sesion is None:
+            # Sesión dedicada: el sondeo no espera detrás de las acciones del usuario
+            self._sesion = SesionPowerShell(timeout=60)
+        return self._sesion.ejecutar(script)
+
+    def sondear(self) -> CambiosServicios | None:
+        """Hace un sondeo y retorna los cambios, o None si no hubo ninguno."""
+        with self._lock:
+            if self._base_pendiente is not None:
+                self._base, self._base_pendiente = self._base_pendiente, None
+        if self._base is None:
+            self._base = _tomar_instantanea(self._ejecutar_script).servicios
+            return None
+
+        exito, salida = self._ejecutar_script(_SCRIPT_SONDEO)
+        volatiles = _parsear_sondeo(salida) if exito else {}
+        if not volatiles:
+            return None
+
+        base = self._base
+        if any(clave not in base for clave in volatiles):
+            # Servicio nuevo: sus datos descriptivos requieren la instantánea completa
+            completa = _tomar_instantanea(self._ejecutar_script).servicios
+            if completa:
+                volatiles = {c: (s.estado, s.tipo_inicio, s.pid) for c, s in completa.items()}
+                base = {**completa, **{c: s for c, s in base.items() if c in completa}}
+
+        actuales = {}
+        modificados = []
+        for clave, (estado, tipo, pid) in volatiles.items():
+            servicio = base.get(clave)
+            if servicio is None:
+                continue
+            if clave not in self._base:
+                modificados.append(servicio)
+            elif (servicio.estado, servicio.tipo_inicio, servicio.pid) != (estado, tipo, pid):
+                servicio = replace(servicio, estado=estado, tipo_inicio=tipo, pid=pid,
+                                   inicio_retrasado=tipo == TipoInicio.AUTOMATICO_RETRASADO)
+                modificados.append(servicio)
+            actuales[clave] = servicio
+        eliminados = [s.nombre for c, s in self._base.items() if c not in actuales]
+        self._base = actuales
+
+        if not modificados and not eliminados:
+            return None
+        invalidar_instantanea()
+        return CambiosServicios(modificados, eliminados)
+
+    def suscribir(self, al_cambiar: Callable[[CambiosServicios], None],
+                  base: InstantaneaServicios | None = None) -> Callable[[], None]:
+        """
+        Registra un suscriptor e inicia la vigilancia. Retorna la función para cancelarlo.
+
+        Con base, el próximo sondeo compara contra esa instantánea (la que el
+        suscriptor ya muestra) en lugar de contra una propia.
+        """
+        with self._lock:
+            self._suscriptores.append(al_cambiar)
+            if base is not None:
+                self._base_pendiente = dict(base.servicios)
+                self._despertar.set()
+            self._detener.clear()
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, daemon=True)
+                self._hilo.start()
+
+        def cancelar():
+            with self._lock:
+                if al_cambiar in self._suscriptores:
+                    self._suscriptores.remove(al_cambiar)
+                if not self._suscriptores:
+                    self._detener.set()
+                    self._despertar.set()
+        return cancelar
+
+    def sondear_ahora(self):
+        """Adelanta el próximo sondeo (por ejemplo, tras una acción del usuario)."""
+        self._despertar.set()
+
+    def _bucle(self):
+        while True:
+            with self._lock:
+                if self._detener.is_set():
+                    if self._sesion is not None:
+                        self._sesion.cerrar()
+                        self._sesion = None
+                    # Al reanudar se compara contra una instantánea nueva
+                    self._base = None
+                    self._hilo = None
+                    return
+            try:
+                cambios = self.sondear()
+            except Exception:
+                cambios = None
+            if cambios is not None:
+                with self._lock:
+                    suscriptores = list(self._suscriptores)
+                for al_cambiar in suscriptores:
+                    try:
+                        al_cambiar(cambios)
+                    except Exception:
+                        pass
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+
+_vigilante: VigilanteServicios | None = None
+_vigilante_lock = threading.Lock()
+
+
+def obtener_vigilante() -> VigilanteServicios:
+    """Retorna el vigilante de servicios compartido."""
+    global _vigilante
+    with _vigilante_lock:
+        if _vigilante is None:
+            _vigilante = VigilanteServicios()
+        return _vigilante
+
+
+class AccionServicio(Enum):
+    NINGUNA = "ninguna"
+    DETENER = "detener"
+    INICIAR = "iniciar"
+
+
+@dataclass
+class CambioServicio:
+    """Cambio a aplicar sobre un servicio: acción y, opcionalmente, tipo de inicio."""
+    nombre: str
+    accion: AccionServicio = AccionServicio.NINGUNA
+    tipo_inicio: TipoInicio | None = None
+
+
+# Grupos de servicios de las acciones rápidas y perfiles
+SERVICIOS_TELEMETRIA = ["DiagTrack", "dmwappushservice", "WerSvc"]
+SERVICIOS_XBOX = ["XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc"]
+SERVICIOS_HYPERV = [
+    "HvHost", "vmickvpexchange", "vmicguestinterface", "vmicshutdown",
+    "vmicheartbeat", "vmicvmsession", "vmicrdv", "vmictimesync", "vmicvss"
+]
+SERVICIOS_PERFIL_RECOMENDADO = [
+    *SERVICIOS_TELEMETRIA,
+    *SERVICIOS_XBOX,
+    "MapsBroker", "lfsvc",  # Mapas/Ubicación
+    "RetailDemo", "wisvc",  # Demo/Insider
+]
+
+_MENSAJE_NO_EXISTE = "El servicio no existe en este equipo"
+
+
+def _script_tipo_inicio(nombre: str, tipo: TipoInicio) -> str:
+    """Instrucción que cambia el tipo de inicio y falla si no se aplica.
+
+    ``nombre`` es una expresión de PowerShell: un literal entre comillas o una variable.
+    """
+    if tipo == TipoInicio.AUTOMATICO_RETRASADO:
+        # Set-Service no admite inicio retrasado en Windows PowerShell 5.1
+        return (f"$r = sc.exe config {nombre} start= delayed-auto; "
+                "if ($LASTEXITCODE) { throw ($r -join ' ') }")
+    return f"Set-Service -Name {nombre} -StartupType {tipo.value} -ErrorAction Stop"
+
+
+def _script_cambio(cambio: CambioServicio) -> str:
+    """Script de PowerShell de un cambio; falla con un mensaje exacto si algo no se aplica."""
+    nombre = cambio.nombre.replace("'", "''")
+    lineas = [
+        f"$s = Get-Service -Name '{nombre}' -ErrorAction SilentlyContinue",
+        f"if (-not $s) {{ throw '{_MENSAJE_NO_EXISTE}' }}",
+    ]
+    if cambio.accion == AccionServicio.DETENER:
+        lineas.append("if ($s.Status -ne 'Stopped') { Stop-Service -InputObject $s -Force -ErrorAction Stop }")
+    if cambio.tipo_inicio is not None:
+        lineas.append(_script_tipo_inicio(f"'{nombre}'", cambio.tipo_inicio))
+    if cambio.accion == AccionServicio.INICIAR:
+        lineas.append("if ($s.Status -ne 'Running') { Start-Service -InputObject $s -ErrorAction Stop }")
+    lineas.append("Write-Output 'OK'")
+    return "\n".join(lineas)
+
+
+@dataclass
+class EstadoOriginalServicio:
+    """Estado de un servicio antes de que el optimizador lo modificara."""
+    nombre: str
+    tipo_inicio: TipoInicio
+    estado: EstadoServicio
+    fecha: str  # ISO 8601, momento en que se registró
+
+
+# Registro local de estados originales; sobrevive a reinicios
+_ARCHIVO_ORIGINALES = "servicios_originales.json"
+_originales_lock = threading.Lock()
+
+
+def obtener_estados_originales() -> dict[str, EstadoOriginalServicio]:
+    """Retorna los estados originales registrados, por nombre en minúsculas."""
+    registro = leer_json(_ARCHIVO_ORIGINALES, {})
+    estados = {}
+    for clave, datos in (registro if isinstance(registro, dict) else {}).items():
+        try:
+            estados[clave] = EstadoOriginalServicio(
+                nombre=datos["nombre"],
+                tipo_inicio=TipoInicio(datos["tipo_inicio"]),
+                estado=EstadoServicio(datos["estado"]),
+                fecha=datos.get("fecha", "")
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+    return estados
+
+
+def registrar_estados_originales(nombres: list[str]):
+    """
+    Guarda tipo de inicio y estado actuales de los servicios sin registro previo.
+
+    El primer registro de cada servicio se conserva: es el estado anterior a
+    cualquier cambio del optimizador.
+    """
+    instantanea = obtener_instantanea()
+    fecha = datetime.now().isoformat(timespec='seconds')
+    with _originales_lock:
+        registro = leer_json(_ARCHIVO_ORIGINALES, {})
+        if not isinstance(registro, dict):
+            registro = {}
+        nuevos = 0
+        for nombre in nombres:
+            servicio = instantanea.obtener(nombre)
+            if servicio is None or nombre.lower() in registro:
+                continue
+            registro[nombre.lower()] = {
+                "nombre": servicio.nombre,
+                "tipo_inicio": servicio.tipo_inicio.value,
+                "estado": servicio.estado.value,
+                "fecha": fecha,
+            }
+            nuevos += 1
+        if nuevos:
+            escribir_json(_ARCHIVO_ORIGINALES, registro)
+
+
+def _olvidar_estados_originales(nombres: list[str]):
+    """Quita del registro los servicios que ya volvieron a su estado original."""
+    with _originales_lock:
+        registro = leer_json(_ARCHIVO_ORIGINALES, {})
+        if not isinstance(registro, dict):
+            return
+        claves = {nombre.lower() for nombre in nombres} & set(registro)
+        if claves:
+            for clave in claves:
+                del registro[clave]
+            escribir_json(_ARCHIVO_ORIGINALES, registro)
+
+
+def aplicar_cambios_servicios(cambios: list[CambioServicio],
+                              registrar: bool = True) -> dict[str, tuple[bool, str]]:
+    """
+    Aplica varios cambios de servicios en una sola invocación de PowerShell.
+
+    Args:
+        cambios: Cambios a aplicar
+        registrar: Guardar antes el estado original de los servicios tocados
+
+    Returns:
+        Diccionario nombre -> (exito, mensaje) con una entrada por servicio,
+        incluidos los que no existen en el equipo.
+    """
+    if not cambios:
+        return {}
+    if registrar:
+        registrar_estados_originales([cambio.nombre for cambio in cambios])
+    pasos = [(f"svc{i}", _script_cambio(cambio)) for i, cambio in enumerate(cambios)]
+    try:
+        resultados = ejecutar_lote(pasos)
+    finally:
+        invalidar_instantanea()
+
+    por_servicio = {}
+    for (id_paso, _), cambio in zip(pasos, cambios):
+        exito, mensaje = resultados[id_paso]
+        por_servicio[cambio.nombre] = (exito, mensaje if not exito else "")
+    return por_servicio
+
+
+def _aplicar_cambio(cambio: CambioServicio) -> tuple[bool, str]:
+    """Aplica un único cambio con el mismo mecanismo que los cambios en bloque."""
+    return aplicar_cambios_servicios([cambio])[cambio.nombre]
+
+
+def grafo_dependientes(instantanea: InstantaneaServicios | None = None) -> dict[str, set[str]]:
+    """Retorna, por servicio (en minúsculas), los servicios que dependen de él."""
+    instantanea = instantanea or obtener_instantanea()
+    grafo = {clave: set() for clave in instantanea.servicios}
+    for clave, servicio in instantanea.servicios.items():
+        for dependiente in servicio.dependientes:
+            grafo[clave].add(dependiente.lower())
+        # La relación inversa también se declara en el dependiente
+        for dependencia in servicio.dependencias:
+            grafo.setdefault(dependencia.lower(), set()).add(clave)
+    return grafo
+
+
+def planificar_detencion(nombres: list[str],
+                         instantanea: InstantaneaServicios | None = None) -> list[list[str]]:
+    """
+    Ordena la detención de servicios en olas según sus dependencias.
+
+    Un servicio se detiene en una ola posterior a la de todos sus dependientes
+    que también están en la lista; los servicios de una misma ola no dependen
+    entre sí y se pueden detener a la vez. Los servicios desconocidos van en
+    la primera ola.
+    """
+    grafo = grafo_dependientes(instantanea)
+    unicos = list(dict.fromkeys(nombres))
+    claves = {nombre.lower(): nombre for nombre in unicos}
+    # Dependientes pendientes de cada servicio, dentro del conjunto a detener
+    pendientes = {
+        clave: {d for d in grafo.get(clave, set()) if d in claves and d != clave}
+        for clave in claves
+    }
+
+    olas = []
+    restantes = [nombre.lower() for nombre in unicos]
+    while restantes:
+        ola = [clave for clave in restantes if not pendientes[clave]]
+        if not ola:
+            # Ciclo (no debería ocurrir): detener el resto juntos
+            ola = restantes
+        olas.append([claves[clave] for clave in ola])
+        detenidos = set(ola)
+        restantes = [clave for clave in restantes if clave not in detenidos]
+        for clave in restantes:
+            pendientes[clave] -= detenidos
+    return olas
+
+
+_ESPERA_DETENCION = 30  # Segundos máximos por servicio para llegar a Stopped
+
+
+def _script_detencion(olas: list[list[tuple[str, str]]], tipo: TipoInicio | None) -> str:
+    """
+    Script que detiene servicios ola por ola; dentro de una ola se piden todas
+    las detenciones con ServiceController.Stop() y después se espera a cada uno.
+    Emite un marcador de lote por servicio.
+    """
+    partes = []
+    for ola in olas:
+        entradas = ",\n    ".join(
+            f"@{{ Id = '{id_paso}'; Nombre = '{nombre.replace(chr(39), chr(39) * 2)}' }}"
+            for id_paso, nombre in ola
+        )
+        cambio_tipo = _script_tipo_inicio("$__c.Nombre", tipo) if tipo is not None else ""
+        partes.append(f'''
+$__ola = @(
+    {entradas}
+)
+foreach ($__c in $__ola) {{
+    $__c.Svc = Get-Service -Name $__c.Nombre -ErrorAction SilentlyContinue
+    if (-not $__c.Svc) {{ $__c.Error = '{_MENSAJE_NO_EXISTE}'; continue }}
+    try {{
+        {cambio_tipo}
+        if ($__c.Svc.Status -ne 'Stopped') {{ $__c.Svc.Stop() }}
+    }} catch {{ $__c.Error = $_.Exception.Message }}
+}}
+foreach ($__c in $__ola) {{
+    if ($__c.Svc -and -not $__c.Error) {{
+        try {{ $__c.Svc.WaitForStatus('Stopped', [TimeSpan]::FromSeconds({_ESPERA_DETENCION})) }}
+        catch {{ $__c.Error = 'El servicio no se detuvo a tiempo' }}
+    }}
+    if ($__c.Error) {{ Write-Output ("{MARCADOR} " + $__c.Id + " FAIL " + ($__c.Error -replace '\\s+', ' ')) }}
+    else {{ Write-Output ("{MARCADOR} " + $__c.Id + " OK") }}
+}}
+''')
+    return "\n".join(partes)
+
+
+def detener_servicios(nombres: list[str], tipo: TipoInicio | None = TipoInicio.DESHABILITADO) -> dict[str, tuple[bool, str]]:
+    """
+    Detiene (y por defecto deshabilita) servicios en orden de dependencias.
+
+    Todo se ejecuta en una sola invocación: las olas de planificar_detencion
+    van en serie y los servicios de cada ola se detienen en paralelo.
+
+    Returns:
+        Diccionario nombre -> (exito, mensaje) con una entrada por servicio.
+    """
+    olas = planificar_detencion(nombres)
+    if not olas:
+        return {}
+    registrar_estados_originales(nombres)
+    contador = iter(range(len(nombres)))
+    olas_ids = [[(f"svc{next(contador)}", nombre) for nombre in ola] for ola in olas]
+    ids = [id_paso for ola in olas_ids for id_paso, _ in ola]
+
+    try:
+        exito, salida = ejecutar_powershell(_script_detencion(olas_ids, tipo))
+    finally:
+        invalidar_instantanea()
+    resultados = parsear_lote(salida, ids, "" if exito else salida)
+
+    return {
+        nombre: (resultados[id_paso][0], "" if resultados[id_paso][0] else resultados[id_paso][1])
+        for ola in olas_ids for id_paso, nombre in ola
+    }
+
+
+def restaurar_servicios(nombres: list[str] | None = None) -> dict[str, tuple[bool, str]]:
+    """
+    Devuelve los servicios a su estado original registrado en una sola invocación.
+
+    Restaura el tipo de inicio exacto y vuelve a iniciar los que estaban en
+    ejecución; las dependencias se restauran antes que sus dependientes. Los
+    servicios restaurados con éxito se quitan del registro.
+
+    Args:
+        nombres: Servicios a restaurar; None restaura todos los registrados
+    """
+    originales = obtener_estados_originales()
+    if nombres is not None:
+        pedidos = {nombre.lower() for nombre in nombres}
+        originales = {clave: o for clave, o in originales.items() if clave in pedidos}
+    if not originales:
+        return {}
+
+    # Orden inverso al de detención: dependencias primero
+    orden = [nombre for ola in reversed(planificar_detencion([o.nombre for o in originales.values()]))
+             for nombre in ola]
+    cambios = []
+    for nombre in orden:
+        original = originales[nombre.lower()]
+        accion = AccionServicio.INICIAR if original.estado == EstadoServicio.EJECUTANDO else AccionServicio.NINGUNA
+        cambios.append(CambioServicio(original.nombre, accion, original.tipo_inicio))
+
+    resultados = aplicar_cambios_servicios(cambios, registrar=False)
+    _olvidar_estados_originales([nombre for nombre, (exito, _) in resultados.items() if exito])
+    return resultados
+
+
+def restaurar_servicios_originales() -> tuple[int, int]:
+    """Restaura todos los servicios registrados. Retorna (exitosos, fallidos)."""
+    resultados = restaurar_servicios()
+    exitosos = sum(1 for exito, _ in resultados.values() if exito)
+    return exitosos, len(resultados) - exitosos
+
+
+def _deshabilitar_grupo(nombres: list[str]) -> tuple[int, int]:
+    """Detiene y deshabilita un grupo de servicios. Retorna (exitosos, fallidos)."""
+    resultados = detener_servicios(nombres)
+    exitosos = sum(1 for exito, _ in resultados.values() if exito)
+    return exitosos, len(resultados) - exitosos
 
 
 def detener_servicio(nombre: str) -> tuple[bool, str]:
     """Detiene un servicio."""
-    cmd = f'Stop-Service -Name "{nombre}" -Force -ErrorAction SilentlyContinue'
-    return ejecutar_powershell(cmd)
+    return _aplicar_cambio(CambioServicio(nombre, AccionServicio.DETENER))
 
 
 def iniciar_servicio(nombre: str) -> tuple[bool, str]:
     """Inicia un servicio."""
-    cmd = f'Start-Service -Name "{nombre}" -ErrorAction SilentlyContinue'
-    return ejecutar_powershell(cmd)
+    return _aplicar_cambio(CambioServicio(nombre, AccionServicio.INICIAR))
 
 
 def deshabilitar_servicio(nombre: str) -> tuple[bool, str]:
     """Deshabilita un servicio."""
-    cmd = f'''
-    Stop-Service -Name "{nombre}" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "{nombre}" -StartupType Disabled -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return _aplicar_cambio(CambioServicio(nombre, AccionServicio.DETENER, TipoInicio.DESHABILITADO))
+
 
+def habilitar_servicio(nombre: str, tipo: TipoInicio | None = None) -> tuple[bool, str]:
+    """
+    Habilita un servicio.
 
-def habilitar_servicio(nombre: str, tipo: TipoInicio = TipoInicio.MANUAL) -> tuple[bool, str]:
-    """Habilita un servicio."""
-    cmd = f'''
-    Set-Service -Name "{nombre}" -StartupType {tipo.value} -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    Sin ``tipo``, vuelve al estado original registrado si se conoce y si no
+    lo deja en Manual.
+    """
+    if tipo is None:
+        if nombre.lower() in obtener_estados_originales():
+            resultados = restaurar_servicios([nombre])
+            return next(iter(resultados.values()), (False, "Error desconocido"))
+        tipo = TipoInicio.MANUAL
+    return _aplicar_cambio(CambioServicio(nombre, tipo_inicio=tipo))
 
 
 def deshabilitar_servicios_telemetria() -> tuple[int, int]:
     """Deshabilita todos los servicios de telemetría."""
-    servicios = ["DiagTrack", "dmwappushservice", "WerSvc"]
-    exitosos = 0
-    fallidos = 0
-
-    for svc in servicios:
-        exito, _ = deshabilitar_servicio(svc)
-        if exito:
-            exitosos += 1
-        else:
-            fallidos += 1
-
-    return exitosos, fallidos
+    return _deshabilitar_grupo(SERVICIOS_TELEMETRIA)
 
 
 def deshabilitar_servicios_xbox() -> tuple[int, int]:
     """Deshabilita todos los servicios de Xbox."""
-    servicios = ["XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc"]
-    exitosos = 0
-    fallidos = 0
-
-    for svc in servicios:
-        exito, _ = deshabilitar_servicio(svc)
-        if exito:
-            exitosos += 1
-        else:
-            fallidos += 1
-
-    return exitosos, fallidos
+    return _deshabilitar_grupo(SERVICIOS_XBOX)
 
 
 def deshabilitar_servicios_hyperv() -> tuple[int, int]:
     """Deshabilita todos los servicios de Hyper-V."""
-    servicios = [
-        "HvHost", "vmickvpexchange", "vmicguestinterface", "vmicshutdown",
-        "vmicheartbeat", "vmicvmsession", "vmicrdv", "vmictimesync", "vmicvss"
-    ]
-    exitosos = 0
-    fallidos = 0
-
-    for svc in servicios:
-        exito, _ = deshabilitar_servicio(svc)
-        if exito:
-            exitosos += 1
-        else:
-            fallidos += 1
-
-    return exitosos, fallidos
+    return _deshabilitar_grupo(SERVICIOS_HYPERV)
 
 
 def aplicar_perfil_minimo() -> tuple[int, int]:
@@ -263,36 +819,9 @@ def aplicar_perfil_minimo() -> tuple[int, int]:
 
 def aplicar_perfil_recomendado() -> tuple[int, int]:
     """Aplica el perfil recomendado de servicios."""
-    servicios = [
-        "DiagTrack", "dmwappushservice", "WerSvc",  # Telemetría
-        "XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc",  # Xbox
-        "MapsBroker", "lfsvc",  # Mapas/Ubicación
-        "RetailDemo", "wisvc",  # Demo/Insider
-    ]
-
-    exitosos = 0
-    fallidos = 0
-
-    for svc in servicios:
-        exito, _ = deshabilitar_servicio(svc)
-        if exito:
-            exitosos += 1
-        else:
-            fallidos += 1
-
-    return exitosos, fallidos
+    return _deshabilitar_grupo(SERVICIOS_PERFIL_RECOMENDADO)
 
 
 def aplicar_perfil_maximo() -> tuple[int, int]:
     """Aplica el perfil máximo de servicios (deshabilita todo lo seguro)."""
-    exitosos = 0
-    fallidos = 0
-
-    for nombre in SERVICIOS_DESHABILITABLES.keys():
-        exito, _ = deshabilitar_servicio(nombre)
-        if exito:
-            exitosos += 1
-        else:
-            fallidos += 1
-
-    return exitosos, fallidos
+    return _deshabilitar_grupo(list(SERVICIOS_DESHABILITABLES.keys()))
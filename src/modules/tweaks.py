@@ -1,8 +1,19 @@
 """Módulo de Tweaks del Sistema para Windows 11 25H2."""
-from dataclasses import dataclass
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
 from enum import Enum
 from typing import Callable
 from src.utils.admin import ejecutar_powershell, ejecutar_cmd
+from src.utils.datos import leer_json, escribir_json
+from src.utils.lote import ejecutar_lote
+from src.utils.operaciones import (
+    Operacion, EstablecerRegistro, EliminarRegistro, ConfigurarServicio,
+    Powercfg, EliminarAppx, ScriptOpaco, compilar_operaciones,
+    compilar_sondeo, parsear_sondeo, operacion_aplicada,
+    extraer_sondeo, operaciones_inversas
+)
 
 
 class CategoriaTweak(Enum):
@@ -20,6 +31,13 @@ class NivelRiesgo(Enum):
     ALTO = "Alto"
 
 
+class EstadoTweak(Enum):
+    APLICADO = "Aplicado"
+    NO_APLICADO = "No aplicado"
+    PARCIAL = "Parcial"
+    DESCONOCIDO = "Desconocido"
+
+
 @dataclass
 class Tweak:
     """Representa un tweak del sistema."""
@@ -31,99 +49,126 @@ class Tweak:
     aplicar: Callable[[], tuple[bool, str]]
     revertir: Callable[[], tuple[bool, str]] | None = None
     requiere_reinicio: bool = False
+    script: str = ""  # Script de PowerShell de aplicar(), para ejecución en lote
+    operaciones: list[Operacion] = field(default_factory=list)  # Lo que hace aplicar(), como datos
+
+    def __post_init__(self):
+        if self.operaciones and not self.script:
+            self.script = compilar_operaciones(self.operaciones)
+
+
+_CLAVE_EXPLORER_AVANZADO = "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced"
 
 
 # ============================================
 # TWEAKS DE RENDIMIENTO
 # ============================================
 
+_OPS_DESHABILITAR_SUPERFETCH = [
+    ConfigurarServicio("SysMain", "Disabled", detener=True),
+]
+_SCRIPT_DESHABILITAR_SUPERFETCH = compilar_operaciones(_OPS_DESHABILITAR_SUPERFETCH)
+
+
 def deshabilitar_superfetch() -> tuple[bool, str]:
     """Deshabilita SysMain/Superfetch."""
-    cmd = '''
-    Stop-Service -Name "SysMain" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "SysMain" -StartupType Disabled -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_SUPERFETCH)
+
+
+_OPS_HABILITAR_SUPERFETCH = [
+    ConfigurarServicio("SysMain", "Automatic", iniciar=True),
+]
+_SCRIPT_HABILITAR_SUPERFETCH = compilar_operaciones(_OPS_HABILITAR_SUPERFETCH)
 
 
 def habilitar_superfetch() -> tuple[bool, str]:
     """Habilita SysMain/Superfetch."""
-    cmd = '''
-    Set-Service -Name "SysMain" -StartupType Automatic -ErrorAction SilentlyContinue
-    Start-Service -Name "SysMain" -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_HABILITAR_SUPERFETCH)
+
+
+_OPS_DESHABILITAR_INDEXACION = [
+    ConfigurarServicio("WSearch", "Disabled", detener=True),
+]
+_SCRIPT_DESHABILITAR_INDEXACION = compilar_operaciones(_OPS_DESHABILITAR_INDEXACION)
 
 
 def deshabilitar_indexacion() -> tuple[bool, str]:
     """Deshabilita Windows Search Indexer."""
-    cmd = '''
-    Stop-Service -Name "WSearch" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "WSearch" -StartupType Disabled -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_INDEXACION)
+
+
+_OPS_HABILITAR_INDEXACION = [
+    ConfigurarServicio("WSearch", "Automatic", iniciar=True),
+]
+_SCRIPT_HABILITAR_INDEXACION = compilar_operaciones(_OPS_HABILITAR_INDEXACION)
 
 
 def habilitar_indexacion() -> tuple[bool, str]:
     """Habilita Windows Search Indexer."""
-    cmd = '''
-    Set-Service -Name "WSearch" -StartupType Automatic -ErrorAction SilentlyContinue
-    Start-Service -Name "WSearch" -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_HABILITAR_INDEXACION)
 
 
-def optimizar_efectos_visuales() -> tuple[bool, str]:
-    """Optimiza efectos visuales para rendimiento."""
-    cmd = '''
+_OPS_OPTIMIZAR_EFECTOS_VISUALES = [
     # Configurar para mejor rendimiento
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects" -Name "VisualFXSetting" -Value 2 -Type DWord -Force
+    EstablecerRegistro("HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects", "VisualFXSetting", 2),
     # Deshabilitar transparencia
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize" -Name "EnableTransparency" -Value 0 -Type DWord -Force
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize", "EnableTransparency", 0),
     # Deshabilitar animaciones
-    Set-ItemProperty -Path "HKCU:\\Control Panel\\Desktop\\WindowMetrics" -Name "MinAnimate" -Value "0" -Type String -Force
-    Set-ItemProperty -Path "HKCU:\\Control Panel\\Desktop" -Name "MenuShowDelay" -Value "0" -Type String -Force
+    EstablecerRegistro("HKCU:\\Control Panel\\Desktop\\WindowMetrics", "MinAnimate", "0"),
+    EstablecerRegistro("HKCU:\\Control Panel\\Desktop", "MenuShowDelay", "0"),
     # Deshabilitar animaciones de ventanas
-    Set-ItemProperty -Path "HKCU:\\Control Panel\\Desktop" -Name "UserPreferencesMask" -Value ([byte[]](0x90,0x12,0x03,0x80,0x10,0x00,0x00,0x00)) -Type Binary -Force
-    '''
-    return ejecutar_powershell(cmd)
+    EstablecerRegistro("HKCU:\\Control Panel\\Desktop", "UserPreferencesMask", bytes([0x90, 0x12, 0x03, 0x80, 0x10, 0x00, 0x00, 0x00])),
+]
+_SCRIPT_OPTIMIZAR_EFECTOS_VISUALES = compilar_operaciones(_OPS_OPTIMIZAR_EFECTOS_VISUALES)
+
+
+def optimizar_efectos_visuales() -> tuple[bool, str]:
+    """Optimiza efectos visuales para rendimiento."""
+    return ejecutar_powershell(_SCRIPT_OPTIMIZAR_EFECTOS_VISUALES)
+
+
+_OPS_RESTAURAR_EFECTOS_VISUALES = [
+    EstablecerRegistro("HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects", "VisualFXSetting", 0),
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize", "EnableTransparency", 1),
+    EstablecerRegistro("HKCU:\\Control Panel\\Desktop\\WindowMetrics", "MinAnimate", "1"),
+    EstablecerRegistro("HKCU:\\Control Panel\\Desktop", "MenuShowDelay", "400"),
+]
+_SCRIPT_RESTAURAR_EFECTOS_VISUALES = compilar_operaciones(_OPS_RESTAURAR_EFECTOS_VISUALES)
 
 
 def restaurar_efectos_visuales() -> tuple[bool, str]:
     """Restaura efectos visuales predeterminados."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\VisualEffects" -Name "VisualFXSetting" -Value 0 -Type DWord -Force
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Themes\\Personalize" -Name "EnableTransparency" -Value 1 -Type DWord -Force
-    Set-ItemProperty -Path "HKCU:\\Control Panel\\Desktop\\WindowMetrics" -Name "MinAnimate" -Value "1" -Type String -Force
-    Set-ItemProperty -Path "HKCU:\\Control Panel\\Desktop" -Name "MenuShowDelay" -Value "400" -Type String -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_RESTAURAR_EFECTOS_VISUALES)
 
 
-def deshabilitar_game_bar() -> tuple[bool, str]:
-    """Deshabilita Xbox Game Bar y Game DVR."""
-    cmd = '''
+_OPS_DESHABILITAR_GAME_BAR = [
     # Game DVR
-    New-Item -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\GameDVR" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\GameDVR" -Name "AppCaptureEnabled" -Value 0 -Type DWord -Force
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\GameDVR", "AppCaptureEnabled", 0),
     # Game Bar
-    New-Item -Path "HKCU:\\System\\GameConfigStore" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\System\\GameConfigStore" -Name "GameDVR_Enabled" -Value 0 -Type DWord -Force
+    EstablecerRegistro("HKCU:\\System\\GameConfigStore", "GameDVR_Enabled", 0),
     # Game Bar Tips
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\GameBar" -Name "ShowStartupPanel" -Value 0 -Type DWord -Force -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\GameBar", "ShowStartupPanel", 0),
+]
+_SCRIPT_DESHABILITAR_GAME_BAR = compilar_operaciones(_OPS_DESHABILITAR_GAME_BAR)
+
+
+def deshabilitar_game_bar() -> tuple[bool, str]:
+    """Deshabilita Xbox Game Bar y Game DVR."""
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_GAME_BAR)
+
+
+_OPS_PLAN_ENERGIA_ALTO_RENDIMIENTO = [
+    Powercfg("/setactive 8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c"),
+]
+_SCRIPT_PLAN_ENERGIA_ALTO_RENDIMIENTO = compilar_operaciones(_OPS_PLAN_ENERGIA_ALTO_RENDIMIENTO)
 
 
 def plan_energia_alto_rendimiento() -> tuple[bool, str]:
     """Activa el plan de energía de alto rendimiento."""
-    cmd = 'powercfg /setactive 8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c'
-    return ejecutar_cmd(cmd)
+    return ejecutar_cmd(_SCRIPT_PLAN_ENERGIA_ALTO_RENDIMIENTO)
 
 
-def plan_energia_ultimate() -> tuple[bool, str]:
-    """Activa o crea el plan de energía Ultimate Performance."""
-    cmd = '''
+_OPS_PLAN_ENERGIA_ULTIMATE = [ScriptOpaco('''
     # Intentar activar Ultimate Performance
     $ultimate = powercfg /list | Select-String "Ultimate"
     if (-not $ultimate) {
@@ -139,219 +184,264 @@ def plan_energia_ultimate() -> tuple[bool, str]:
         powercfg /setactive 8c5e7fda-e8bf-4a96-9a85-a6e23a8c635c
         Write-Output "Alto Rendimiento activado"
     }
-    '''
-    return ejecutar_powershell(cmd)
+    ''')]
+_SCRIPT_PLAN_ENERGIA_ULTIMATE = compilar_operaciones(_OPS_PLAN_ENERGIA_ULTIMATE)
+
+
+def plan_energia_ultimate() -> tuple[bool, str]:
+    """Activa o crea el plan de energía Ultimate Performance."""
+    return ejecutar_powershell(_SCRIPT_PLAN_ENERGIA_ULTIMATE)
+
+
+_OPS_DESHABILITAR_HIBERNACION = [
+    Powercfg("/hibernate off"),
+]
+_SCRIPT_DESHABILITAR_HIBERNACION = compilar_operaciones(_OPS_DESHABILITAR_HIBERNACION)
 
 
 def deshabilitar_hibernacion() -> tuple[bool, str]:
     """Deshabilita la hibernación."""
-    cmd = 'powercfg /hibernate off'
-    return ejecutar_cmd(cmd)
+    return ejecutar_cmd(_SCRIPT_DESHABILITAR_HIBERNACION)
+
+
+_OPS_HABILITAR_HIBERNACION = [
+    Powercfg("/hibernate on"),
+]
+_SCRIPT_HABILITAR_HIBERNACION = compilar_operaciones(_OPS_HABILITAR_HIBERNACION)
 
 
 def habilitar_hibernacion() -> tuple[bool, str]:
     """Habilita la hibernación."""
-    cmd = 'powercfg /hibernate on'
-    return ejecutar_cmd(cmd)
+    return ejecutar_cmd(_SCRIPT_HABILITAR_HIBERNACION)
 
 
 # ============================================
 # TWEAKS DE PRIVACIDAD
 # ============================================
 
-def deshabilitar_telemetria() -> tuple[bool, str]:
-    """Deshabilita telemetría de Windows."""
-    cmd = '''
+_OPS_DESHABILITAR_TELEMETRIA = [
     # Servicio de telemetría
-    Stop-Service -Name "DiagTrack" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "DiagTrack" -StartupType Disabled -ErrorAction SilentlyContinue
+    ConfigurarServicio("DiagTrack", "Disabled", detener=True),
+    ConfigurarServicio("dmwappushservice", "Disabled", detener=True),
+    # Registro - Nivel de telemetría al mínimo
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\DataCollection", "AllowTelemetry", 0),
+    # Deshabilitar feedback
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\Siuf\\Rules", "NumberOfSIUFInPeriod", 0),
+]
+_SCRIPT_DESHABILITAR_TELEMETRIA = compilar_operaciones(_OPS_DESHABILITAR_TELEMETRIA)
 
-    # dmwappushservice
-    Stop-Service -Name "dmwappushservice" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "dmwappushservice" -StartupType Disabled -ErrorAction SilentlyContinue
 
-    # Registro - Nivel de telemetría al mínimo
-    New-Item -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\DataCollection" -Force | Out-Null
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\DataCollection" -Name "AllowTelemetry" -Value 0 -Type DWord -Force
+def deshabilitar_telemetria() -> tuple[bool, str]:
+    """Deshabilita telemetría de Windows."""
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_TELEMETRIA)
 
-    # Deshabilitar feedback
-    New-Item -Path "HKCU:\\SOFTWARE\\Microsoft\\Siuf\\Rules" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Siuf\\Rules" -Name "NumberOfSIUFInPeriod" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+
+_OPS_DESHABILITAR_CORTANA = [
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search", "AllowCortana", 0),
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search", "DisableWebSearch", 1),
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search", "ConnectedSearchUseWeb", 0),
+]
+_SCRIPT_DESHABILITAR_CORTANA = compilar_operaciones(_OPS_DESHABILITAR_CORTANA)
 
 
 def deshabilitar_cortana() -> tuple[bool, str]:
     """Deshabilita Cortana."""
-    cmd = '''
-    New-Item -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search" -Force | Out-Null
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search" -Name "AllowCortana" -Value 0 -Type DWord -Force
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search" -Name "DisableWebSearch" -Value 1 -Type DWord -Force
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\Windows Search" -Name "ConnectedSearchUseWeb" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_CORTANA)
+
+
+_OPS_DESHABILITAR_HISTORIAL_ACTIVIDAD = [
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System", "EnableActivityFeed", 0),
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System", "PublishUserActivities", 0),
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System", "UploadUserActivities", 0),
+]
+_SCRIPT_DESHABILITAR_HISTORIAL_ACTIVIDAD = compilar_operaciones(_OPS_DESHABILITAR_HISTORIAL_ACTIVIDAD)
 
 
 def deshabilitar_historial_actividad() -> tuple[bool, str]:
     """Deshabilita el historial de actividad."""
-    cmd = '''
-    New-Item -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System" -Force | Out-Null
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System" -Name "EnableActivityFeed" -Value 0 -Type DWord -Force
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System" -Name "PublishUserActivities" -Value 0 -Type DWord -Force
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\System" -Name "UploadUserActivities" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_HISTORIAL_ACTIVIDAD)
+
+
+_OPS_DESHABILITAR_ADVERTISING_ID = [
+    EstablecerRegistro("HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\AdvertisingInfo", "Enabled", 0),
+]
+_SCRIPT_DESHABILITAR_ADVERTISING_ID = compilar_operaciones(_OPS_DESHABILITAR_ADVERTISING_ID)
 
 
 def deshabilitar_advertising_id() -> tuple[bool, str]:
     """Deshabilita el ID de publicidad."""
-    cmd = '''
-    New-Item -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\AdvertisingInfo" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\AdvertisingInfo" -Name "Enabled" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_ADVERTISING_ID)
+
+
+_OPS_DESHABILITAR_UBICACION = [
+    ConfigurarServicio("lfsvc", "Disabled", detener=True),
+    EstablecerRegistro("HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\LocationAndSensors", "DisableLocation", 1),
+]
+_SCRIPT_DESHABILITAR_UBICACION = compilar_operaciones(_OPS_DESHABILITAR_UBICACION)
 
 
 def deshabilitar_ubicacion() -> tuple[bool, str]:
     """Deshabilita servicios de ubicación."""
-    cmd = '''
-    Stop-Service -Name "lfsvc" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "lfsvc" -StartupType Disabled -ErrorAction SilentlyContinue
-    New-Item -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\LocationAndSensors" -Force | Out-Null
-    Set-ItemProperty -Path "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\LocationAndSensors" -Name "DisableLocation" -Value 1 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_UBICACION)
+
+
+_OPS_DESHABILITAR_APPS_BACKGROUND = [
+    EstablecerRegistro("HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\BackgroundAccessApplications", "GlobalUserDisabled", 1),
+    EstablecerRegistro("HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Search", "BackgroundAppGlobalToggle", 0),
+]
+_SCRIPT_DESHABILITAR_APPS_BACKGROUND = compilar_operaciones(_OPS_DESHABILITAR_APPS_BACKGROUND)
 
 
 def deshabilitar_apps_background() -> tuple[bool, str]:
     """Deshabilita apps en segundo plano."""
-    cmd = '''
-    New-Item -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\BackgroundAccessApplications" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\BackgroundAccessApplications" -Name "GlobalUserDisabled" -Value 1 -Type DWord -Force
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Search" -Name "BackgroundAppGlobalToggle" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_APPS_BACKGROUND)
 
 
 # ============================================
 # TWEAKS DE SERVICIOS
 # ============================================
 
+_OPS_DESHABILITAR_SERVICIOS_XBOX = [
+    ConfigurarServicio(nombre, "Disabled", detener=True)
+    for nombre in ("XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc")
+]
+_SCRIPT_DESHABILITAR_SERVICIOS_XBOX = compilar_operaciones(_OPS_DESHABILITAR_SERVICIOS_XBOX)
+
+
 def deshabilitar_servicios_xbox() -> tuple[bool, str]:
     """Deshabilita todos los servicios de Xbox."""
-    cmd = '''
-    $servicios = @("XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc")
-    foreach ($svc in $servicios) {
-        Stop-Service -Name $svc -Force -ErrorAction SilentlyContinue
-        Set-Service -Name $svc -StartupType Disabled -ErrorAction SilentlyContinue
-    }
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_SERVICIOS_XBOX)
+
+
+_OPS_DESHABILITAR_SERVICIOS_IMPRESION = [
+    ConfigurarServicio("Spooler", "Disabled", detener=True),
+    ConfigurarServicio("Fax", "Disabled", detener=True),
+]
+_SCRIPT_DESHABILITAR_SERVICIOS_IMPRESION = compilar_operaciones(_OPS_DESHABILITAR_SERVICIOS_IMPRESION)
 
 
 def deshabilitar_servicios_impresion() -> tuple[bool, str]:
     """Deshabilita servicios de impresión (si no usas impresora)."""
-    cmd = '''
-    Stop-Service -Name "Spooler" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "Spooler" -StartupType Disabled -ErrorAction SilentlyContinue
-    Stop-Service -Name "Fax" -Force -ErrorAction SilentlyContinue
-    Set-Service -Name "Fax" -StartupType Disabled -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_SERVICIOS_IMPRESION)
+
+
+_OPS_DESHABILITAR_ESCRITORIO_REMOTO = [
+    ConfigurarServicio(nombre, "Disabled", detener=True)
+    for nombre in ("TermService", "SessionEnv", "UmRdpService")
+]
+_SCRIPT_DESHABILITAR_ESCRITORIO_REMOTO = compilar_operaciones(_OPS_DESHABILITAR_ESCRITORIO_REMOTO)
 
 
 def deshabilitar_escritorio_remoto() -> tuple[bool, str]:
     """Deshabilita servicios de escritorio remoto."""
-    cmd = '''
-    $servicios = @("TermService", "SessionEnv", "UmRdpService")
-    foreach ($svc in $servicios) {
-        Stop-Service -Name $svc -Force -ErrorAction SilentlyContinue
-        Set-Service -Name $svc -StartupType Disabled -ErrorAction SilentlyContinue
-    }
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_ESCRITORIO_REMOTO)
+
+
+_OPS_DESHABILITAR_PHONE_LINK = [
+    EliminarAppx("*YourPhone*"),
+    EliminarAppx("*PhoneExperienceHost*"),
+]
+_SCRIPT_DESHABILITAR_PHONE_LINK = compilar_operaciones(_OPS_DESHABILITAR_PHONE_LINK)
 
 
 def deshabilitar_phone_link() -> tuple[bool, str]:
     """Deshabilita Phone Link / Tu Teléfono."""
-    cmd = '''
-    Get-AppxPackage *YourPhone* | Remove-AppxPackage -ErrorAction SilentlyContinue
-    Get-AppxPackage *PhoneExperienceHost* | Remove-AppxPackage -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_PHONE_LINK)
 
 
 # ============================================
 # TWEAKS DE INTERFAZ WINDOWS 11
 # ============================================
 
+_OPS_MENU_CLASICO_CLICK_DERECHO = [
+    EstablecerRegistro("HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}\\InprocServer32", "(Default)", ""),
+]
+_SCRIPT_MENU_CLASICO_CLICK_DERECHO = compilar_operaciones(_OPS_MENU_CLASICO_CLICK_DERECHO)
+
+
 def menu_clasico_click_derecho() -> tuple[bool, str]:
     """Restaura el menú contextual clásico de Windows 10."""
-    cmd = '''
-    New-Item -Path "HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}\\InprocServer32" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}\\InprocServer32" -Name "(Default)" -Value "" -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_MENU_CLASICO_CLICK_DERECHO)
+
+
+_OPS_MENU_NUEVO_CLICK_DERECHO = [
+    EliminarRegistro("HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}"),
+]
+_SCRIPT_MENU_NUEVO_CLICK_DERECHO = compilar_operaciones(_OPS_MENU_NUEVO_CLICK_DERECHO)
 
 
 def menu_nuevo_click_derecho() -> tuple[bool, str]:
     """Restaura el menú contextual nuevo de Windows 11."""
-    cmd = '''
-    Remove-Item -Path "HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}" -Recurse -Force -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_MENU_NUEVO_CLICK_DERECHO)
+
+
+_OPS_BARRA_TAREAS_IZQUIERDA = [
+    EstablecerRegistro(_CLAVE_EXPLORER_AVANZADO, "TaskbarAl", 0),
+]
+_SCRIPT_BARRA_TAREAS_IZQUIERDA = compilar_operaciones(_OPS_BARRA_TAREAS_IZQUIERDA)
 
 
 def barra_tareas_izquierda() -> tuple[bool, str]:
     """Alinea la barra de tareas a la izquierda."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" -Name "TaskbarAl" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_BARRA_TAREAS_IZQUIERDA)
+
+
+_OPS_BARRA_TAREAS_CENTRO = [
+    EstablecerRegistro(_CLAVE_EXPLORER_AVANZADO, "TaskbarAl", 1),
+]
+_SCRIPT_BARRA_TAREAS_CENTRO = compilar_operaciones(_OPS_BARRA_TAREAS_CENTRO)
 
 
 def barra_tareas_centro() -> tuple[bool, str]:
     """Alinea la barra de tareas al centro."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" -Name "TaskbarAl" -Value 1 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_BARRA_TAREAS_CENTRO)
+
+
+_OPS_DESHABILITAR_WIDGETS = [
+    EstablecerRegistro(_CLAVE_EXPLORER_AVANZADO, "TaskbarDa", 0),
+    # Desinstalar Widgets
+    EliminarAppx("*WebExperience*"),
+]
+_SCRIPT_DESHABILITAR_WIDGETS = compilar_operaciones(_OPS_DESHABILITAR_WIDGETS)
 
 
 def deshabilitar_widgets() -> tuple[bool, str]:
     """Deshabilita Widgets de Windows 11."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" -Name "TaskbarDa" -Value 0 -Type DWord -Force
-    # Desinstalar Widgets
-    Get-AppxPackage *WebExperience* | Remove-AppxPackage -ErrorAction SilentlyContinue
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_WIDGETS)
+
+
+_OPS_DESHABILITAR_CHAT_TEAMS = [
+    EstablecerRegistro(_CLAVE_EXPLORER_AVANZADO, "TaskbarMn", 0),
+]
+_SCRIPT_DESHABILITAR_CHAT_TEAMS = compilar_operaciones(_OPS_DESHABILITAR_CHAT_TEAMS)
 
 
 def deshabilitar_chat_teams() -> tuple[bool, str]:
     """Deshabilita el chat de Teams en la barra de tareas."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" -Name "TaskbarMn" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_CHAT_TEAMS)
+
+
+_OPS_DESHABILITAR_BUSQUEDA_BARRA = [
+    EstablecerRegistro("HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Search", "SearchboxTaskbarMode", 0),
+]
+_SCRIPT_DESHABILITAR_BUSQUEDA_BARRA = compilar_operaciones(_OPS_DESHABILITAR_BUSQUEDA_BARRA)
 
 
 def deshabilitar_busqueda_barra() -> tuple[bool, str]:
     """Oculta la barra de búsqueda."""
-    cmd = '''
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Search" -Name "SearchboxTaskbarMode" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_BUSQUEDA_BARRA)
+
+
+_OPS_DESHABILITAR_COPILOT = [
+    EstablecerRegistro("HKCU:\\Software\\Policies\\Microsoft\\Windows\\WindowsCopilot", "TurnOffWindowsCopilot", 1),
+    EstablecerRegistro(_CLAVE_EXPLORER_AVANZADO, "ShowCopilotButton", 0),
+]
+_SCRIPT_DESHABILITAR_COPILOT = compilar_operaciones(_OPS_DESHABILITAR_COPILOT)
 
 
 def deshabilitar_copilot() -> tuple[bool, str]:
     """Deshabilita Windows Copilot."""
-    cmd = '''
-    New-Item -Path "HKCU:\\Software\\Policies\\Microsoft\\Windows\\WindowsCopilot" -Force | Out-Null
-    Set-ItemProperty -Path "HKCU:\\Software\\Policies\\Microsoft\\Windows\\WindowsCopilot" -Name "TurnOffWindowsCopilot" -Value 1 -Type DWord -Force
-    Set-ItemProperty -Path "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced" -Name "ShowCopilotButton" -Value 0 -Type DWord -Force
-    '''
-    return ejecutar_powershell(cmd)
+    return ejecutar_powershell(_SCRIPT_DESHABILITAR_COPILOT)
 
 
 # ============================================
@@ -367,6 +457,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
         aplicar=deshabilitar_superfetch,
+        operaciones=_OPS_DESHABILITAR_SUPERFETCH,
         revertir=habilitar_superfetch
     ),
     Tweak(
@@ -376,6 +467,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
         aplicar=deshabilitar_indexacion,
+        operaciones=_OPS_DESHABILITAR_INDEXACION,
         revertir=habilitar_indexacion
     ),
     Tweak(
@@ -385,6 +477,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
         aplicar=optimizar_efectos_visuales,
+        operaciones=_OPS_OPTIMIZAR_EFECTOS_VISUALES,
         revertir=restaurar_efectos_visuales
     ),
     Tweak(
@@ -393,7 +486,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita Game Bar y DVR. Mejora rendimiento en juegos.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_game_bar
+        aplicar=deshabilitar_game_bar,
+        operaciones=_OPS_DESHABILITAR_GAME_BAR
     ),
     Tweak(
         id="plan_ultimate",
@@ -401,7 +495,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Activa el plan de energía de máximo rendimiento.",
         categoria=CategoriaTweak.ENERGIA,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=plan_energia_ultimate
+        aplicar=plan_energia_ultimate,
+        operaciones=_OPS_PLAN_ENERGIA_ULTIMATE
     ),
     Tweak(
         id="deshabilitar_hibernacion",
@@ -410,6 +505,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.ALMACENAMIENTO,
         riesgo=NivelRiesgo.BAJO,
         aplicar=deshabilitar_hibernacion,
+        operaciones=_OPS_DESHABILITAR_HIBERNACION,
         revertir=habilitar_hibernacion
     ),
 
@@ -420,7 +516,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Detiene el envío de datos de diagnóstico a Microsoft.",
         categoria=CategoriaTweak.PRIVACIDAD,
         riesgo=NivelRiesgo.MEDIO,
-        aplicar=deshabilitar_telemetria
+        aplicar=deshabilitar_telemetria,
+        operaciones=_OPS_DESHABILITAR_TELEMETRIA
     ),
     Tweak(
         id="deshabilitar_cortana",
@@ -428,7 +525,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita Cortana y búsqueda web desde el menú inicio.",
         categoria=CategoriaTweak.PRIVACIDAD,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_cortana
+        aplicar=deshabilitar_cortana,
+        operaciones=_OPS_DESHABILITAR_CORTANA
     ),
     Tweak(
         id="deshabilitar_historial",
@@ -436,7 +534,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita Timeline y sincronización de actividad.",
         categoria=CategoriaTweak.PRIVACIDAD,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_historial_actividad
+        aplicar=deshabilitar_historial_actividad,
+        operaciones=_OPS_DESHABILITAR_HISTORIAL_ACTIVIDAD
     ),
     Tweak(
         id="deshabilitar_ads",
@@ -444,7 +543,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita el identificador para anuncios personalizados.",
         categoria=CategoriaTweak.PRIVACIDAD,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_advertising_id
+        aplicar=deshabilitar_advertising_id,
+        operaciones=_OPS_DESHABILITAR_ADVERTISING_ID
     ),
     Tweak(
         id="deshabilitar_ubicacion",
@@ -452,7 +552,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita servicios de localización.",
         categoria=CategoriaTweak.PRIVACIDAD,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_ubicacion
+        aplicar=deshabilitar_ubicacion,
+        operaciones=_OPS_DESHABILITAR_UBICACION
     ),
     Tweak(
         id="deshabilitar_background",
@@ -460,7 +561,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Impide que las apps se ejecuten en segundo plano.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.MEDIO,
-        aplicar=deshabilitar_apps_background
+        aplicar=deshabilitar_apps_background,
+        operaciones=_OPS_DESHABILITAR_APPS_BACKGROUND
     ),
 
     # SERVICIOS
@@ -470,7 +572,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita todos los servicios de Xbox Live.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_servicios_xbox
+        aplicar=deshabilitar_servicios_xbox,
+        operaciones=_OPS_DESHABILITAR_SERVICIOS_XBOX
     ),
     Tweak(
         id="deshabilitar_impresion",
@@ -478,7 +581,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita Print Spooler. Solo si no usas impresora.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.MEDIO,
-        aplicar=deshabilitar_servicios_impresion
+        aplicar=deshabilitar_servicios_impresion,
+        operaciones=_OPS_DESHABILITAR_SERVICIOS_IMPRESION
     ),
     Tweak(
         id="deshabilitar_remoto",
@@ -486,7 +590,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita servicios de Remote Desktop.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_escritorio_remoto
+        aplicar=deshabilitar_escritorio_remoto,
+        operaciones=_OPS_DESHABILITAR_ESCRITORIO_REMOTO
     ),
     Tweak(
         id="deshabilitar_phone",
@@ -494,7 +599,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Elimina la app Tu Teléfono/Phone Link. Libera ~700MB RAM.",
         categoria=CategoriaTweak.RENDIMIENTO,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_phone_link
+        aplicar=deshabilitar_phone_link,
+        operaciones=_OPS_DESHABILITAR_PHONE_LINK
     ),
 
     # INTERFAZ
@@ -505,6 +611,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
         aplicar=menu_clasico_click_derecho,
+        operaciones=_OPS_MENU_CLASICO_CLICK_DERECHO,
         revertir=menu_nuevo_click_derecho,
         requiere_reinicio=True
     ),
@@ -515,6 +622,7 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
         aplicar=barra_tareas_izquierda,
+        operaciones=_OPS_BARRA_TAREAS_IZQUIERDA,
         revertir=barra_tareas_centro
     ),
     Tweak(
@@ -523,7 +631,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Elimina el panel de Widgets de Windows 11.",
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_widgets
+        aplicar=deshabilitar_widgets,
+        operaciones=_OPS_DESHABILITAR_WIDGETS
     ),
     Tweak(
         id="deshabilitar_chat",
@@ -531,7 +640,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Oculta el icono de Chat de la barra de tareas.",
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_chat_teams
+        aplicar=deshabilitar_chat_teams,
+        operaciones=_OPS_DESHABILITAR_CHAT_TEAMS
     ),
     Tweak(
         id="ocultar_busqueda",
@@ -539,7 +649,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Oculta la barra/icono de búsqueda de la barra de tareas.",
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_busqueda_barra
+        aplicar=deshabilitar_busqueda_barra,
+        operaciones=_OPS_DESHABILITAR_BUSQUEDA_BARRA
     ),
     Tweak(
         id="deshabilitar_copilot",
@@ -547,7 +658,8 @@ TWEAKS_DISPONIBLES: list[Tweak] = [
         descripcion="Deshabilita Copilot y oculta su botón.",
         categoria=CategoriaTweak.INTERFAZ,
         riesgo=NivelRiesgo.BAJO,
-        aplicar=deshabilitar_copilot
+        aplicar=deshabilitar_copilot,
+        operaciones=_OPS_DESHABILITAR_COPILOT
     ),
 ]
 
@@ -563,3 +675,207 @@ def obtener_tweak_por_id(id: str) -> Tweak | None:
         if t.id == id:
             return t
     return None
+
+
+# Registro local de valores previos para revertir; sobrevive a reinicios
+_ARCHIVO_REVERSION = "tweaks_reversion.json"
+_PASO_CAPTURA = "__captura"
+_reversion_lock = threading.Lock()
+
+
+@dataclass
+class EjecucionTweaks:
+    """Una aplicación registrada de varios tweaks (por ejemplo, un perfil)."""
+    id: str
+    nombre: str
+    fecha: str  # ISO 8601
+    tweaks: list[str]
+
+
+def _leer_reversion() -> dict:
+    registro = leer_json(_ARCHIVO_REVERSION, {})
+    if not isinstance(registro, dict):
+        registro = {}
+    if not isinstance(registro.get("tweaks"), dict):
+        registro["tweaks"] = {}
+    if not isinstance(registro.get("ejecuciones"), list):
+        registro["ejecuciones"] = []
+    return registro
+
+
+def _registrar_valores_previos(tweaks: list[Tweak], observado: dict, ejecucion: str | None) -> str | None:
+    """
+    Guarda los valores previos de cada tweak y, si se indica, la ejecución.
+
+    El primer registro de cada tweak se conserva: son los valores anteriores
+    a cualquier cambio del optimizador. Retorna el id de la ejecución.
+    """
+    fecha = datetime.now().isoformat(timespec='seconds')
+    with _reversion_lock:
+        registro = _leer_reversion()
+        for tweak in tweaks:
+            if tweak.id not in registro["tweaks"]:
+                registro["tweaks"][tweak.id] = {
+                    "fecha": fecha,
+                    "valores": extraer_sondeo(tweak.operaciones, observado),
+                }
+        id_ejecucion = None
+        if ejecucion:
+            id_ejecucion = uuid.uuid4().hex[:12]
+            registro["ejecuciones"].append({
+                "id": id_ejecucion,
+                "nombre": ejecucion,
+                "fecha": fecha,
+                "tweaks": [t.id for t in tweaks],
+            })
+        escribir_json(_ARCHIVO_REVERSION, registro)
+    return id_ejecucion
+
+
+def obtener_tweaks_revertibles() -> list[str]:
+    """IDs de los tweaks con valores previos registrados."""
+    return list(_leer_reversion()["tweaks"])
+
+
+def obtener_ejecuciones() -> list[EjecucionTweaks]:
+    """Ejecuciones registradas, de la más antigua a la más reciente."""
+    ejecuciones = []
+    for datos in _leer_reversion()["ejecuciones"]:
+        try:
+            ejecuciones.append(EjecucionTweaks(datos["id"], datos["nombre"], datos.get("fecha", ""), list(datos["tweaks"])))
+        except (KeyError, TypeError):
+            continue
+    return ejecuciones
+
+
+def aplicar_tweaks_en_lote(tweaks: list[Tweak], ejecucion: str | None = None) -> dict[str, tuple[bool, str]]:
+    """
+    Aplica varios tweaks con una sola invocación de PowerShell.
+
+    El primer paso del mismo lote captura los valores que las operaciones
+    van a cambiar, y se guardan para poder revertir con exactitud. Los
+    tweaks sin script se aplican individualmente con aplicar().
+
+    Args:
+        tweaks: Tweaks a aplicar
+        ejecucion: Nombre con el que registrar esta aplicación para revertirla
+            completa (por ejemplo, el nombre de un perfil)
+
+    Returns:
+        Diccionario id -> (exito, mensaje) con una entrada por tweak
+    """
+    en_lote = [t for t in tweaks if t.script]
+    con_operaciones = [t for t in en_lote if t.operaciones]
+    pasos = [(t.id, t.script) for t in en_lote]
+    if con_operaciones:
+        captura = compilar_sondeo([op for t in con_operaciones for op in t.operaciones], capturar=True)
+        pasos.insert(0, (_PASO_CAPTURA, captura))
+    resultados = ejecutar_lote(pasos)
+
+    exito_captura, salida_captura = resultados.pop(_PASO_CAPTURA, (False, ""))
+    observado = parsear_sondeo(salida_captura) if exito_captura else None
+    if observado is not None:
+        _registrar_valores_previos(con_operaciones, observado, ejecucion)
+
+    for tweak in tweaks:
+        if not tweak.script:
+            try:
+                resultados[tweak.id] = tweak.aplicar()
+            except Exception as e:
+                resultados[tweak.id] = (False, str(e))
+
+    return resultados
+
+
+def revertir_tweaks(ids: list[str]) -> dict[str, tuple[bool, str]]:
+    """
+    Revierte tweaks a los valores registrados antes de aplicarlos, en un solo lote.
+
+    Se revierten en orden inverso al recibido. Los tweaks sin valores
+    registrados usan su función revertir() si la tienen. Los revertidos con
+    éxito se quitan del registro.
+
+    Returns:
+        Diccionario id -> (exito, mensaje) con una entrada por tweak
+    """
+    registrados = _leer_reversion()["tweaks"]
+    pasos = []
+    resultados = {}
+    for id_tweak in reversed(ids):
+        tweak = obtener_tweak_por_id(id_tweak)
+        if tweak is None:
+            resultados[id_tweak] = (False, "Tweak desconocido")
+            continue
+        entrada = registrados.get(id_tweak)
+        if entrada is None:
+            if tweak.revertir is None:
+                resultados[id_tweak] = (False, "No hay valores previos registrados")
+            else:
+                try:
+                    resultados[id_tweak] = tweak.revertir()
+                except Exception as e:
+                    resultados[id_tweak] = (False, str(e))
+            continue
+        inversas = operaciones_inversas(tweak.operaciones, entrada.get("valores") or {})
+        # Sin inversas (todo ya estaba así, o nada es reversible) no hay nada que ejecutar
+        if inversas:
+            pasos.append((id_tweak, compilar_operaciones(inversas)))
+        else:
+            resultados[id_tweak] = (True, "")
+
+    resultados.update(ejecutar_lote(pasos))
+
+    revertidos = {i for i, (exito, _) in resultados.items() if exito and i in registrados}
+    if revertidos:
+        with _reversion_lock:
+            registro = _leer_reversion()
+            for id_tweak in revertidos:
+                registro["tweaks"].pop(id_tweak, None)
+            escribir_json(_ARCHIVO_REVERSION, registro)
+    return resultados
+
+
+def revertir_ejecucion(id_ejecucion: str) -> dict[str, tuple[bool, str]]:
+    """Revierte todos los tweaks de una ejecución registrada en un solo lote."""
+    ejecucion = next((e for e in obtener_ejecuciones() if e.id == id_ejecucion), None)
+    if ejecucion is None:
+        return {}
+    resultados = revertir_tweaks(ejecucion.tweaks)
+    if all(exito for exito, _ in resultados.values()):
+        with _reversion_lock:
+            registro = _leer_reversion()
+            registro["ejecuciones"] = [e for e in registro["ejecuciones"] if e.get("id") != id_ejecucion]
+            escribir_json(_ARCHIVO_REVERSION, registro)
+    return resultados
+
+
+def estado_tweak(tweak: Tweak, observado: dict) -> EstadoTweak:
+    """Calcula el estado de un tweak a partir de los valores leídos por un sondeo."""
+    verificaciones = [operacion_aplicada(op, observado) for op in tweak.operaciones]
+    conocidas = [v for v in verificaciones if v is not None]
+    if not conocidas:
+        return EstadoTweak.DESCONOCIDO
+    if all(conocidas):
+        # Lo verificable está aplicado, pero no se puede asegurar el resto
+        return EstadoTweak.APLICADO if len(conocidas) == len(verificaciones) else EstadoTweak.DESCONOCIDO
+    if not any(conocidas):
+        return EstadoTweak.NO_APLICADO
+    return EstadoTweak.PARCIAL
+
+
+def detectar_estados_tweaks(tweaks: list[Tweak] | None = None) -> dict[str, EstadoTweak]:
+    """
+    Detecta qué tweaks ya están aplicados con una sola consulta de PowerShell.
+
+    Returns:
+        Diccionario id -> EstadoTweak con una entrada por tweak
+    """
+    tweaks = TWEAKS_DISPONIBLES if tweaks is None else tweaks
+    operaciones = [op for t in tweaks for op in t.operaciones]
+    observado = None
+    if operaciones:
+        exito, salida = ejecutar_powershell(compilar_sondeo(operaciones))
+        observado = parsear_sondeo(salida) if exito else None
+    if observado is None:
+        return {t.id: EstadoTweak.DESCONOCIDO for t in tweaks}
+    return {t.id: estado_tweak(t, observado) for t in tweaks}
@@ -2,7 +2,7 @@
 import flet as ft
 from src.ui import theme
 from src.modules.bloatware import (
-    BLOATWARE_APPS, CategoriaBloat, desinstalar_app,
+    BLOATWARE_APPS, CategoriaBloat, desinstalar_app, desinstalar_multiples_apps,
     eliminar_todo_bloatware_recomendado, obtener_apps_instaladas_por_categoria,
     verificar_app_instalada
 )
@@ -233,19 +233,17 @@ def crear_pagina_bloatware(page: ft.Page = None) -> ft.Column:
         def ejecutar():
             total = len(apps_seleccionadas)
             exitosos = 0
-            paquetes_eliminados = []
 
-            for i, paquete in enumerate(list(apps_seleccionadas)):
-                estado_texto.value = f"Eliminando aplicación {i + 1} de {total}..."
-                progreso_bar.value = (i + 1) / total
-                if page:
-                    page.update()
+            estado_texto.value = f"Eliminando {total} aplicaciones..."
+            progreso_bar.value = None
+            if page:
+                page.update()
 
-                exito, _ = desinstalar_app(paquete)
+            # Una sola pasada para todas las apps seleccionadas
+            resultados = desinstalar_multiples_apps(list(apps_seleccionadas))
+            for paquete, (exito, _) in resultados.items():
                 if exito:
                     exitosos += 1
-                    paquetes_eliminados.append(paquete)
-                    # Eliminar de la lista inmediatamente
                     eliminar_app_de_lista(paquete)
 
             estado_texto.value = f"Completado: {exitosos} de {total} apps eliminadas"
@@ -272,20 +270,13 @@ def crear_pagina_bloatware(page: ft.Page = None) -> ft.Column:
 
             # Obtener apps recomendadas de la lista actual
             apps_recomendadas = [a for a in apps_en_lista if a.recomendado_eliminar]
-            total = len(apps_recomendadas)
             exitosos = 0
 
-            for i, app in enumerate(apps_recomendadas):
-                estado_texto.value = f"Eliminando {app.nombre}... ({i + 1}/{total})"
-                progreso_bar.value = (i + 1) / total
-                if page:
-                    page.update()
-
-                exito, _ = desinstalar_app(app.paquete)
+            resultados = desinstalar_multiples_apps([a.paquete for a in apps_recomendadas])
+            for paquete, (exito, _) in resultados.items():
                 if exito:
                     exitosos += 1
-                    # Eliminar de la lista inmediatamente
-                    eliminar_app_de_lista(app.paquete)
+                    eliminar_app_de_lista(paquete)
 
             estado_texto.value = f"Completado: {exitosos} aplicaciones eliminadas"
             estado_texto.color = theme.COLORS["success"]
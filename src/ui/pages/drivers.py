@@ -2,17 +2,27 @@
 import flet as ft
 from src.ui import theme
 from src.modules.drivers import (
-    escanear_drivers, actualizar_todos_drivers, buscar_actualizaciones_windows,
+    escanear_drivers_por_lotes, actualizar_todos_drivers, buscar_actualizaciones_windows,
     verificar_estado_drivers, EstadoDriver, CategoriaDriver, DriverInfo, ResultadoEscaneo
 )
+from src.utils.catalogo_drivers import actualizar_catalogo
 import threading
 
+# Selector de archivos del catálogo; se agrega una sola vez al overlay de la página
+_selector_catalogo: ft.FilePicker | None = None
+
 
 def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
     """Página para escanear y actualizar drivers del sistema con estilo CleanMyMac."""
 
+    global _selector_catalogo
+
     resultado_escaneo: ResultadoEscaneo = None
     categoria_actual = [None]  # None = todas
+    # Un solo escaneo a la vez; un catálogo importado durante el escaneo se aplica al terminar
+    escaneo_en_curso = [False]
+    reescanear_al_terminar = [False]
+    lock_escaneo = threading.Lock()
 
     # UI Elements
     contenedor_drivers = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO, expand=True)
@@ -132,6 +142,10 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
             color_estado = theme.COLORS["warning"]
             icono_estado = ft.Icons.WARNING_ROUNDED
             texto_estado = "Problema"
+        elif driver.estado == EstadoDriver.DESACTUALIZADO:
+            color_estado = theme.COLORS["info"]
+            icono_estado = ft.Icons.UPDATE_ROUNDED
+            texto_estado = "Desactualizado"
         else:
             color_estado = theme.COLORS["text_muted"]
             icono_estado = ft.Icons.HELP_ROUNDED
@@ -179,7 +193,12 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
                                         border_radius=2,
                                         bgcolor=theme.COLORS["text_muted"],
                                     ),
-                                    ft.Text(f"v{driver.version or 'N/A'}", size=12, color=theme.COLORS["text_muted"]),
+                                    ft.Text(
+                                        f"v{driver.version or 'N/A'}"
+                                        + (f" → v{driver.version_disponible}" if driver.version_disponible else ""),
+                                        size=12,
+                                        color=theme.COLORS["text_muted"]
+                                    ),
                                 ],
                                 spacing=8,
                             ),
@@ -265,6 +284,13 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
         """Inicia el escaneo de drivers."""
         nonlocal resultado_escaneo
 
+        with lock_escaneo:
+            if escaneo_en_curso[0]:
+                return
+            escaneo_en_curso[0] = True
+        btn_catalogo.disabled = True
+        btn_catalogo.opacity = 0.5
+
         progreso_bar.visible = True
         progreso_bar.value = 0
         estado_texto.visible = True
@@ -280,10 +306,44 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
             if page:
                 page.update()
 
+        def mostrar_lote(lote, recibidos: list, filas: dict):
+            """Agrega las filas nuevas del lote y redibuja las que cambiaron."""
+            if not recibidos:
+                contenedor_drivers.controls.clear()  # Quitar el mensaje de lista vacía
+            for driver in lote.actualizados:
+                fila = filas.get(id(driver))
+                if fila in contenedor_drivers.controls:  # No está si se cambió de categoría
+                    posicion = contenedor_drivers.controls.index(fila)
+                    filas[id(driver)] = contenedor_drivers.controls[posicion] = crear_driver_item(driver)
+            for driver in lote.drivers:
+                recibidos.append(driver)
+                if categoria_actual[0] in (None, driver.categoria):
+                    filas[id(driver)] = crear_driver_item(driver)
+                    contenedor_drivers.controls.append(filas[id(driver)])
+
+            stat_total.value = str(len(recibidos))
+            stat_ok.value = str(sum(1 for d in recibidos if d.estado == EstadoDriver.OK))
+            stat_problemas.value = str(sum(1 for d in recibidos if d.estado == EstadoDriver.PROBLEMA))
+            stat_faltantes.value = str(sum(1 for d in recibidos if d.estado == EstadoDriver.FALTANTE))
+
         def ejecutar():
             nonlocal resultado_escaneo
             try:
-                resultado_escaneo = escanear_drivers(callback)
+                # Las filas se agregan a medida que llegan; el orden final se aplica al terminar
+                recibidos, filas = [], {}
+                # Parcial mientras dura el escaneo, para poder filtrar por categoría
+                resultado_escaneo = ResultadoEscaneo(0, 0, 0, 0, 0, recibidos)
+                lotes = escanear_drivers_por_lotes()
+                try:
+                    for lote in lotes:
+                        if lote.resultado is not None:
+                            resultado_escaneo = lote.resultado
+                            break
+                        if lote.drivers or lote.actualizados:
+                            mostrar_lote(lote, recibidos, filas)
+                        callback(lote.mensaje, lote.progreso)
+                finally:
+                    lotes.close()
 
                 # Actualizar stats
                 stat_total.value = str(resultado_escaneo.total)
@@ -310,8 +370,16 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
                 banner_perfecto.visible = False
 
             progreso_bar.visible = False
+            btn_catalogo.disabled = False
+            btn_catalogo.opacity = 1
+            with lock_escaneo:
+                escaneo_en_curso[0] = False
+                reescanear = reescanear_al_terminar[0]
+                reescanear_al_terminar[0] = False
             if page:
                 page.update()
+            if reescanear:
+                escanear_click(None)
 
         threading.Thread(target=ejecutar).start()
 
@@ -424,6 +492,42 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
 
         threading.Thread(target=ejecutar).start()
 
+    def al_elegir_catalogo(e):
+        """Importa el catálogo elegido y vuelve a comparar las versiones."""
+        if not e.files:
+            return
+        exito, mensaje = actualizar_catalogo(e.files[0].path)
+        if exito:
+            with lock_escaneo:
+                # Las versiones se vuelven a comparar cuando termine el escaneo en curso
+                reescanear_al_terminar[0] = escaneo_en_curso[0]
+                if reescanear_al_terminar[0]:
+                    return
+        if exito and resultado_escaneo is not None:
+            # Con el escaneo guardado es instantáneo y marca los desactualizados
+            escanear_click(None)
+            return
+        estado_texto.visible = True
+        estado_texto.value = mensaje if exito else f"No se pudo importar el catálogo: {mensaje}"
+        estado_texto.color = theme.COLORS["success"] if exito else theme.COLORS["error"]
+        if page:
+            page.update()
+
+    def importar_catalogo_click(e):
+        """Abre el selector de archivos del catálogo de versiones."""
+        if _selector_catalogo is None:
+            return
+        _selector_catalogo.on_result = al_elegir_catalogo
+        _selector_catalogo.pick_files(
+            dialog_title="Catálogo de versiones de drivers",
+            allowed_extensions=["tsv", "txt"],
+        )
+
+    if page and _selector_catalogo is None:
+        _selector_catalogo = ft.FilePicker()
+        page.overlay.append(_selector_catalogo)
+        page.update()
+
     def cambiar_categoria(cat):
         """Cambia el filtro de categoría."""
         categoria_actual[0] = cat
@@ -472,6 +576,23 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
         ink=True,
     )
 
+    btn_catalogo = ft.Container(
+        content=ft.Row(
+            controls=[
+                ft.Icon(ft.Icons.LIBRARY_ADD_ROUNDED, size=20, color=theme.COLORS["text"]),
+                ft.Text("Importar catálogo", size=14, weight=ft.FontWeight.W_600, color=theme.COLORS["text"]),
+            ],
+            spacing=10,
+        ),
+        padding=ft.padding.symmetric(horizontal=28, vertical=14),
+        border_radius=theme.BORDER_RADIUS_SM,
+        bgcolor=theme.COLORS["surface"],
+        border=ft.border.all(1, theme.COLORS["border"]),
+        on_click=importar_catalogo_click,
+        ink=True,
+        tooltip="Archivo TSV con hardware_id y versión más reciente de cada dispositivo",
+    )
+
     # Filtros de categoría
     filtros = ft.Row(
         controls=[
@@ -574,7 +695,7 @@ def crear_pagina_drivers(page: ft.Page = None) -> ft.Column:
             # Botones de acción
             ft.Container(
                 content=ft.Row(
-                    controls=[btn_escanear, btn_actualizar],
+                    controls=[btn_escanear, btn_actualizar, btn_catalogo],
                     spacing=16,
                 ),
                 padding=ft.padding.symmetric(horizontal=30),
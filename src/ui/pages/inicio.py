@@ -3,6 +3,8 @@ import flet as ft
 from src.ui import theme
 from src.utils.system_info import obtener_info_sistema
 from src.modules.perfiles import NivelPerfil, aplicar_perfil, PERFILES
+from src.utils.costos import formatear_eta
+from src.modules.limpieza import analizar_limpieza, LIMPIADORES
 import threading
 
 
@@ -18,6 +20,9 @@ def crear_pagina_inicio(page: ft.Page = None) -> ft.Container:
     except:
         info_sistema = None
 
+    # Analizar en segundo plano: el escaneo posterior reutiliza la caché
+    threading.Thread(target=analizar_limpieza, daemon=True).start()
+
     # Referencias para actualizar UI
     scan_button_ref = {"container": None, "content": None, "ring": None}
     status_text_ref = {"text": None}
@@ -112,49 +117,50 @@ def crear_pagina_inicio(page: ft.Page = None) -> ft.Container:
         if page:
             page.update()
 
-        def ejecutar_escaneo():
-            try:
-                import time
-                pasos = [
-                    ("Analizando archivos temporales...", 15),
-                    ("Escaneando caché del sistema...", 30),
-                    ("Verificando bloatware instalado...", 45),
-                    ("Analizando servicios de Windows...", 60),
-                    ("Detectando drivers desactualizados...", 75),
-                    ("Calculando optimizaciones...", 90),
-                    ("Finalizando análisis...", 100),
+        def mostrar_progreso(progreso: int, texto: str):
+            scanning["progress"] = progreso
+
+            # Actualizar contenido del botón
+            if scan_button_ref["content"]:
+                scan_button_ref["content"].controls = [
+                    ft.ProgressRing(
+                        width=50,
+                        height=50,
+                        stroke_width=4,
+                        color=ft.Colors.WHITE,
+                    ),
+                    ft.Container(height=8),
+                    ft.Text(
+                        f"{progreso}%",
+                        size=22,
+                        weight=ft.FontWeight.BOLD,
+                        color=ft.Colors.WHITE,
+                    ),
                 ]
 
-                for paso, progreso in pasos:
-                    if not scanning["active"]:
-                        break
+            if status_text_ref["text"]:
+                status_text_ref["text"].value = texto
 
-                    scanning["progress"] = progreso
+            if page:
+                page.update()
 
-                    # Actualizar contenido del botón
-                    if scan_button_ref["content"]:
-                        scan_button_ref["content"].controls = [
-                            ft.ProgressRing(
-                                width=50,
-                                height=50,
-                                stroke_width=4,
-                                color=ft.Colors.WHITE,
-                            ),
-                            ft.Container(height=8),
-                            ft.Text(
-                                f"{progreso}%",
-                                size=22,
-                                weight=ft.FontWeight.BOLD,
-                                color=ft.Colors.WHITE,
-                            ),
-                        ]
+        def ejecutar_escaneo():
+            try:
+                import time
+                completados = [0]
+                recuperable = [0.0]
 
-                    if status_text_ref["text"]:
-                        status_text_ref["text"].value = paso
+                def al_terminar(analisis):
+                    completados[0] += 1
+                    recuperable[0] += analisis.espacio_recuperable_mb
+                    if scanning["active"]:
+                        mostrar_progreso(
+                            int(completados[0] / len(LIMPIADORES) * 100),
+                            f"Analizado: {analisis.nombre}"
+                        )
 
-                    if page:
-                        page.update()
-                    time.sleep(0.6)
+                mostrar_progreso(0, "Analizando archivos temporales...")
+                analizar_limpieza(al_terminar=al_terminar)
 
                 # Completado
                 scanning["active"] = False
@@ -178,7 +184,11 @@ def crear_pagina_inicio(page: ft.Page = None) -> ft.Container:
                     ]
 
                 if status_text_ref["text"]:
-                    status_text_ref["text"].value = "Se encontraron oportunidades de optimización"
+                    if recuperable[0] >= 1024:
+                        espacio = f"{recuperable[0] / 1024:.2f} GB"
+                    else:
+                        espacio = f"{recuperable[0]:.1f} MB"
+                    status_text_ref["text"].value = f"Se pueden liberar {espacio} con la limpieza"
                     status_text_ref["text"].color = theme.COLORS["success"]
 
                 # Mostrar resultados después de 1.5s
@@ -475,9 +485,24 @@ def crear_pagina_inicio(page: ft.Page = None) -> ft.Container:
         if page:
             page.update()
 
+        progreso = {"eta": None}
+
+        def al_progresar(mensaje: str, porcentaje: int):
+            if not status_text_ref["text"]:
+                return
+            texto = f"{mensaje} {porcentaje}%"
+            if progreso["eta"] is not None:
+                texto += f" · quedan {formatear_eta(progreso['eta'])}"
+            status_text_ref["text"].value = texto
+            if page:
+                page.update()
+
+        def al_estimar(segundos: float | None):
+            progreso["eta"] = segundos
+
         def ejecutar():
             try:
-                resultado = aplicar_perfil(nivel, lambda msg, pct: None)
+                resultado = aplicar_perfil(nivel, al_progresar, al_estimar=al_estimar)
                 if status_text_ref["text"]:
                     status_text_ref["text"].value = (
                         f"Perfil aplicado: {resultado.tweaks_aplicados} tweaks, "
@@ -4,7 +4,7 @@ from src.ui import theme
 from src.modules.limpieza import (
     limpiar_temp_usuario, limpiar_temp_windows, limpiar_prefetch,
     limpiar_cache_windows_update, limpiar_thumbnails, limpiar_logs_windows,
-    limpiar_papelera, ejecutar_limpieza_completa
+    limpiar_papelera, ejecutar_limpieza_completa, limpiar_con_progreso, analizar_limpieza, LIMPIADORES
 )
 import threading
 
@@ -28,7 +28,18 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
         visible=False
     )
 
+    estado_texto = ft.Text(
+        "",
+        size=12,
+        color=theme.COLORS["text_muted"],
+        text_align=ft.TextAlign.CENTER,
+        max_lines=1,
+        overflow=ft.TextOverflow.ELLIPSIS,
+    )
+
     total_acumulado = [0.0]
+    en_curso: dict[str, float] = {}  # Limpiador -> MB liberados hasta ahora
+    lock_ui = threading.Lock()
     btn_limpiar = None
 
     def agregar_resultado(resultado):
@@ -65,20 +76,56 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
         )
         resultados_lista.controls.insert(0, item)
 
+    def mostrar_total():
+        total = total_acumulado[0] + sum(en_curso.values())
+        if total >= 1024:
+            total_liberado.value = f"{total / 1024:.2f} GB"
+        else:
+            total_liberado.value = f"{total:.1f} MB"
+
     def actualizar_total(mb: float):
         total_acumulado[0] += mb
-        if total_acumulado[0] >= 1024:
-            total_liberado.value = f"{total_acumulado[0] / 1024:.2f} GB"
-        else:
-            total_liberado.value = f"{total_acumulado[0]:.1f} MB"
+        mostrar_total()
 
-    def limpiar_individual(funcion, nombre: str):
-        def ejecutar():
-            resultado = funcion()
+    def al_progresar(evento):
+        # Llega limitado a ~10 eventos por segundo
+        with lock_ui:
+            en_curso[evento.nombre] = evento.bytes_liberados / (1024 * 1024)
+            estado_texto.value = (
+                f"{evento.nombre}: {evento.archivos_eliminados:,} archivos · {evento.directorio_actual}"
+            )
+            mostrar_total()
+            if page:
+                page.update()
+
+    def al_terminar_limpiador(resultado, completados: list | None = None):
+        # Con varios limpiadores en paralelo llega desde varios hilos a la vez
+        with lock_ui:
+            if completados is not None:
+                completados[0] += 1
+                progreso_bar.value = completados[0] / len(LIMPIADORES)
+            en_curso.pop(resultado.nombre, None)
             agregar_resultado(resultado)
             actualizar_total(resultado.espacio_liberado_mb)
             if page:
                 page.update()
+
+    def limpiar_individual(funcion, nombre: str):
+        limpiador = next((l for l in LIMPIADORES if l.funcion is funcion), None)
+
+        def ejecutar():
+            if limpiador is None:
+                al_terminar_limpiador(funcion())
+                return
+            for evento in limpiar_con_progreso(limpiador):
+                if evento.resultado is not None:
+                    al_terminar_limpiador(evento.resultado)
+                else:
+                    al_progresar(evento)
+            estado_texto.value = ""
+            if page:
+                page.update()
+            actualizar_recuperable()
         threading.Thread(target=ejecutar).start()
 
     def limpiar_todo(e):
@@ -86,25 +133,21 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
         progreso_bar.value = None
         resultados_lista.controls.clear()
         total_acumulado[0] = 0
+        en_curso.clear()
         total_liberado.value = "0 MB"
         if page:
             page.update()
 
         def ejecutar():
-            resultados = ejecutar_limpieza_completa()
-            for i, resultado in enumerate(resultados):
-                progreso_bar.value = (i + 1) / len(resultados)
-                agregar_resultado(resultado)
-                total_acumulado[0] += resultado.espacio_liberado_mb
-                if page:
-                    page.update()
-
-            if total_acumulado[0] >= 1024:
-                total_liberado.value = f"{total_acumulado[0] / 1024:.2f} GB"
-            else:
-                total_liberado.value = f"{total_acumulado[0]:.1f} MB"
+            completados = [0]
+
+            # Cada limpiador se muestra en cuanto termina
+            ejecutar_limpieza_completa(paralelo=True, al_progresar=al_progresar,
+                                       al_terminar=lambda resultado: al_terminar_limpiador(resultado, completados))
 
             progreso_bar.visible = False
+            estado_texto.value = ""
+            actualizar_recuperable()
             if page:
                 page.update()
 
@@ -121,8 +164,30 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
         ("Papelera", ft.Icons.DELETE_SWEEP_ROUNDED, limpiar_papelera, theme.COLORS["error"]),
     ]
 
+    # Espacio recuperable por opción, calculado con el índice de tamaños
+    textos_recuperable: dict[str, ft.Text] = {}
+
+    def formatear_mb(mb: float) -> str:
+        return f"{mb / 1024:.2f} GB" if mb >= 1024 else f"{mb:.1f} MB"
+
+    def actualizar_recuperable():
+        def al_terminar(analisis):
+            texto = textos_recuperable.get(analisis.nombre)
+            if texto is None:
+                return
+            prefijo = "≥ " if analisis.truncado else ""
+            texto.value = f"{prefijo}{formatear_mb(analisis.espacio_recuperable_mb)}"
+            if page:
+                page.update()
+
+        analizar_limpieza(al_terminar=al_terminar)
+
     items_limpieza = []
     for nombre, icono, funcion, color in opciones:
+        limpiador = next((l for l in LIMPIADORES if l.funcion is funcion), None)
+        texto_recuperable = ft.Text("", size=12, color=theme.COLORS["text_muted"])
+        if limpiador:
+            textos_recuperable[limpiador.nombre] = texto_recuperable
         item = ft.Container(
             content=ft.Row(
                 controls=[
@@ -132,12 +197,18 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
                         border_radius=14,
                         bgcolor=ft.Colors.with_opacity(0.1, color),
                     ),
-                    ft.Text(
-                        nombre,
-                        size=14,
-                        weight=ft.FontWeight.W_500,
-                        color=theme.COLORS["text"],
-                        expand=True
+                    ft.Column(
+                        controls=[
+                            ft.Text(
+                                nombre,
+                                size=14,
+                                weight=ft.FontWeight.W_500,
+                                color=theme.COLORS["text"],
+                            ),
+                            texto_recuperable,
+                        ],
+                        spacing=2,
+                        expand=True,
                     ),
                     ft.Container(
                         content=ft.Icon(ft.Icons.CLEANING_SERVICES_ROUNDED, size=18, color=ft.Colors.WHITE),
@@ -157,6 +228,8 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
         )
         items_limpieza.append(item)
 
+    threading.Thread(target=actualizar_recuperable, daemon=True).start()
+
     # Botón de limpieza completa
     btn_limpiar = ft.Container(
         content=ft.Row(
@@ -241,6 +314,7 @@ def crear_pagina_limpieza(page: ft.Page = None) -> ft.Column:
                             total_liberado,
                             ft.Container(height=16),
                             progreso_bar,
+                            estado_texto,
                             ft.Container(height=16),
                             btn_limpiar,
                         ],
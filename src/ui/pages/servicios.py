@@ -4,16 +4,156 @@ from src.ui import theme
 from src.modules.servicios import (
     obtener_servicios_deshabilitables, deshabilitar_servicio, habilitar_servicio,
     EstadoServicio, TipoInicio,
-    deshabilitar_servicios_telemetria, deshabilitar_servicios_xbox, deshabilitar_servicios_hyperv
+    deshabilitar_servicios_telemetria, deshabilitar_servicios_xbox, deshabilitar_servicios_hyperv,
+    restaurar_servicios_originales, obtener_estados_originales, obtener_vigilante, obtener_instantanea
 )
 import threading
 
+# Suscripción al vigilante de la página visible
+_cancelar_vigilancia = None
+_pagina_vigilada = None  # La página que puede suscribirse al terminar de cargar
+_vigilancia_lock = threading.Lock()
+
+
+def detener_vigilancia():
+    """Cancela la suscripción de la página al salir de ella; sin suscriptores el vigilante se detiene."""
+    global _cancelar_vigilancia, _pagina_vigilada
+    with _vigilancia_lock:
+        _pagina_vigilada = None
+        if _cancelar_vigilancia is not None:
+            _cancelar_vigilancia()
+            _cancelar_vigilancia = None
+
+
+def _vigilar(pagina, al_cambiar, instantanea):
+    """Suscribe la página al vigilante si sigue visible, con la instantánea que muestra como base."""
+    global _cancelar_vigilancia
+    with _vigilancia_lock:
+        if _pagina_vigilada is not pagina:
+            return
+        # Al recargar, la suscripción nueva reemplaza a la anterior sin detener el vigilante
+        anterior = _cancelar_vigilancia
+        _cancelar_vigilancia = obtener_vigilante().suscribir(al_cambiar, base=instantanea)
+        if anterior is not None:
+            anterior()
+
 
 def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
     """Página para gestionar servicios de Windows con estilo CleanMyMac."""
 
+    global _pagina_vigilada
+
     servicios_lista = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO, expand=True)
     estado_texto = ft.Text("", size=14, visible=False)
+    filas: dict[str, ft.Container] = {}  # Clave: nombre en minúsculas
+    lock_filas = threading.Lock()
+
+    def crear_fila(servicio) -> ft.Container:
+        esta_deshabilitado = servicio.tipo_inicio == TipoInicio.DESHABILITADO
+        esta_ejecutando = servicio.estado == EstadoServicio.EJECUTANDO
+
+        if esta_deshabilitado:
+            color_estado = theme.COLORS["warning"]
+            texto_estado = "Deshabilitado"
+            icono_estado = ft.Icons.PAUSE_CIRCLE_ROUNDED
+        elif esta_ejecutando:
+            color_estado = theme.COLORS["success"]
+            texto_estado = "Ejecutando"
+            icono_estado = ft.Icons.PLAY_CIRCLE_ROUNDED
+        else:
+            color_estado = theme.COLORS["text_muted"]
+            texto_estado = "Detenido"
+            icono_estado = ft.Icons.STOP_CIRCLE_ROUNDED
+
+        return ft.Container(
+            content=ft.Row(
+                controls=[
+                    ft.Container(
+                        content=ft.Icon(ft.Icons.MISCELLANEOUS_SERVICES_ROUNDED, size=20, color=theme.COLORS["primary"]),
+                        padding=10,
+                        border_radius=12,
+                        bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["primary"]),
+                    ),
+                    ft.Column(
+                        controls=[
+                            ft.Row(
+                                controls=[
+                                    ft.Text(
+                                        servicio.nombre,
+                                        size=14,
+                                        weight=ft.FontWeight.W_600,
+                                        color=theme.COLORS["text"]
+                                    ),
+                                    ft.Container(
+                                        content=ft.Row(
+                                            controls=[
+                                                ft.Icon(icono_estado, size=14, color=ft.Colors.WHITE),
+                                                ft.Text(texto_estado, size=10, weight=ft.FontWeight.W_500, color=ft.Colors.WHITE),
+                                            ],
+                                            spacing=4,
+                                        ),
+                                        padding=ft.padding.symmetric(horizontal=10, vertical=4),
+                                        border_radius=12,
+                                        bgcolor=color_estado,
+                                    ),
+                                ],
+                                spacing=10,
+                            ),
+                            ft.Text(
+                                servicio.descripcion or servicio.nombre_display,
+                                size=12,
+                                color=theme.COLORS["text_muted"],
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS,
+                            ),
+                            ft.Text(
+                                f"Dependen de este servicio: {', '.join(servicio.dependientes)}",
+                                size=11,
+                                color=theme.COLORS["warning"],
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS,
+                            ) if servicio.dependientes else ft.Container(),
+                        ],
+                        spacing=4,
+                        expand=True,
+                    ),
+                    ft.Row(
+                        controls=[
+                            ft.Container(
+                                content=ft.Icon(
+                                    ft.Icons.STOP_ROUNDED,
+                                    size=18,
+                                    color=theme.COLORS["error"] if not esta_deshabilitado else theme.COLORS["text_muted"]
+                                ),
+                                padding=8,
+                                border_radius=8,
+                                bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["error"]) if not esta_deshabilitado else None,
+                                on_click=lambda e, s=servicio: accion_servicio(s, False) if not esta_deshabilitado else None,
+                                ink=True if not esta_deshabilitado else False,
+                            ),
+                            ft.Container(
+                                content=ft.Icon(
+                                    ft.Icons.PLAY_ARROW_ROUNDED,
+                                    size=18,
+                                    color=theme.COLORS["success"] if esta_deshabilitado else theme.COLORS["text_muted"]
+                                ),
+                                padding=8,
+                                border_radius=8,
+                                bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["success"]) if esta_deshabilitado else None,
+                                on_click=lambda e, s=servicio: accion_servicio(s, True) if esta_deshabilitado else None,
+                                ink=True if esta_deshabilitado else False,
+                            ),
+                        ],
+                        spacing=8,
+                    ),
+                ],
+                spacing=14,
+            ),
+            padding=18,
+            border_radius=theme.BORDER_RADIUS,
+            bgcolor=theme.COLORS["surface"],
+            border=ft.border.all(1, theme.COLORS["border"]),
+        )
 
     def cargar_servicios():
         servicios_lista.controls.clear()
@@ -35,109 +175,16 @@ def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
             page.update()
 
         def cargar():
-            servicios = obtener_servicios_deshabilitables()
+            instantanea = obtener_instantanea()
+            servicios = obtener_servicios_deshabilitables(instantanea)
             servicios_lista.controls.clear()
 
-            for servicio in servicios:
-                esta_deshabilitado = servicio.tipo_inicio == TipoInicio.DESHABILITADO
-                esta_ejecutando = servicio.estado == EstadoServicio.EJECUTANDO
-
-                if esta_deshabilitado:
-                    color_estado = theme.COLORS["warning"]
-                    texto_estado = "Deshabilitado"
-                    icono_estado = ft.Icons.PAUSE_CIRCLE_ROUNDED
-                elif esta_ejecutando:
-                    color_estado = theme.COLORS["success"]
-                    texto_estado = "Ejecutando"
-                    icono_estado = ft.Icons.PLAY_CIRCLE_ROUNDED
-                else:
-                    color_estado = theme.COLORS["text_muted"]
-                    texto_estado = "Detenido"
-                    icono_estado = ft.Icons.STOP_CIRCLE_ROUNDED
-
-                item = ft.Container(
-                    content=ft.Row(
-                        controls=[
-                            ft.Container(
-                                content=ft.Icon(ft.Icons.MISCELLANEOUS_SERVICES_ROUNDED, size=20, color=theme.COLORS["primary"]),
-                                padding=10,
-                                border_radius=12,
-                                bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["primary"]),
-                            ),
-                            ft.Column(
-                                controls=[
-                                    ft.Row(
-                                        controls=[
-                                            ft.Text(
-                                                servicio.nombre,
-                                                size=14,
-                                                weight=ft.FontWeight.W_600,
-                                                color=theme.COLORS["text"]
-                                            ),
-                                            ft.Container(
-                                                content=ft.Row(
-                                                    controls=[
-                                                        ft.Icon(icono_estado, size=14, color=ft.Colors.WHITE),
-                                                        ft.Text(texto_estado, size=10, weight=ft.FontWeight.W_500, color=ft.Colors.WHITE),
-                                                    ],
-                                                    spacing=4,
-                                                ),
-                                                padding=ft.padding.symmetric(horizontal=10, vertical=4),
-                                                border_radius=12,
-                                                bgcolor=color_estado,
-                                            ),
-                                        ],
-                                        spacing=10,
-                                    ),
-                                    ft.Text(
-                                        servicio.descripcion or servicio.nombre_display,
-                                        size=12,
-                                        color=theme.COLORS["text_muted"],
-                                        max_lines=1,
-                                        overflow=ft.TextOverflow.ELLIPSIS,
-                                    ),
-                                ],
-                                spacing=4,
-                                expand=True,
-                            ),
-                            ft.Row(
-                                controls=[
-                                    ft.Container(
-                                        content=ft.Icon(
-                                            ft.Icons.STOP_ROUNDED,
-                                            size=18,
-                                            color=theme.COLORS["error"] if not esta_deshabilitado else theme.COLORS["text_muted"]
-                                        ),
-                                        padding=8,
-                                        border_radius=8,
-                                        bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["error"]) if not esta_deshabilitado else None,
-                                        on_click=lambda e, s=servicio: accion_servicio(s, False) if not esta_deshabilitado else None,
-                                        ink=True if not esta_deshabilitado else False,
-                                    ),
-                                    ft.Container(
-                                        content=ft.Icon(
-                                            ft.Icons.PLAY_ARROW_ROUNDED,
-                                            size=18,
-                                            color=theme.COLORS["success"] if esta_deshabilitado else theme.COLORS["text_muted"]
-                                        ),
-                                        padding=8,
-                                        border_radius=8,
-                                        bgcolor=ft.Colors.with_opacity(0.1, theme.COLORS["success"]) if esta_deshabilitado else None,
-                                        on_click=lambda e, s=servicio: accion_servicio(s, True) if esta_deshabilitado else None,
-                                        ink=True if esta_deshabilitado else False,
-                                    ),
-                                ],
-                                spacing=8,
-                            ),
-                        ],
-                        spacing=14,
-                    ),
-                    padding=18,
-                    border_radius=theme.BORDER_RADIUS,
-                    bgcolor=theme.COLORS["surface"],
-                    border=ft.border.all(1, theme.COLORS["border"]),
-                )
-                servicios_lista.controls.append(item)
+            with lock_filas:
+                filas.clear()
+                for servicio in servicios:
+                    item = crear_fila(servicio)
+                    filas[servicio.nombre.lower()] = item
+                    servicios_lista.controls.append(item)
 
             if not servicios:
                 servicios_lista.controls.append(
@@ -148,9 +195,32 @@ def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
                 )
             if page:
                 page.update()
+            # Los cambios posteriores a esta instantánea llegan por el vigilante
+            _vigilar(servicios_lista, al_cambiar_servicios, instantanea)
 
         threading.Thread(target=cargar).start()
 
+    def al_cambiar_servicios(cambios):
+        """Reemplaza solo las filas de los servicios que cambiaron."""
+        with lock_filas:
+            reemplazos = 0
+            for servicio in cambios.modificados:
+                clave = servicio.nombre.lower()
+                anterior = filas.get(clave)
+                if anterior is None or anterior not in servicios_lista.controls:
+                    continue
+                nueva = crear_fila(servicio)
+                servicios_lista.controls[servicios_lista.controls.index(anterior)] = nueva
+                filas[clave] = nueva
+                reemplazos += 1
+            for nombre in cambios.eliminados:
+                anterior = filas.pop(nombre.lower(), None)
+                if anterior is not None and anterior in servicios_lista.controls:
+                    servicios_lista.controls.remove(anterior)
+                    reemplazos += 1
+        if reemplazos and page:
+            page.update()
+
     def accion_servicio(servicio, habilitar: bool):
         estado_texto.visible = True
         estado_texto.value = f"{'Habilitando' if habilitar else 'Deshabilitando'} {servicio.nombre}..."
@@ -165,7 +235,9 @@ def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
                 exito, _ = deshabilitar_servicio(servicio.nombre)
             estado_texto.value = f"{servicio.nombre} {'habilitado' if habilitar else 'deshabilitado'}" if exito else "Error en la operación"
             estado_texto.color = theme.COLORS["success"] if exito else theme.COLORS["error"]
-            cargar_servicios()
+            if page:
+                page.update()
+            obtener_vigilante().sondear_ahora()
 
         threading.Thread(target=ejecutar).start()
 
@@ -180,7 +252,29 @@ def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
             exitosos, _ = funcion()
             estado_texto.value = f"{nombre}: {exitosos} servicios deshabilitados"
             estado_texto.color = theme.COLORS["success"]
-            cargar_servicios()
+            if page:
+                page.update()
+            obtener_vigilante().sondear_ahora()
+
+        threading.Thread(target=ejecutar).start()
+
+    def accion_restaurar():
+        estado_texto.visible = True
+        estado_texto.value = "Restaurando servicios a su estado original..."
+        estado_texto.color = theme.COLORS["info"]
+        if page:
+            page.update()
+
+        def ejecutar():
+            exitosos, fallidos = restaurar_servicios_originales()
+            if exitosos or fallidos:
+                estado_texto.value = f"{exitosos} servicios restaurados" + (f", {fallidos} con error" if fallidos else "")
+            else:
+                estado_texto.value = "No hay cambios de servicios para restaurar"
+            estado_texto.color = theme.COLORS["success"] if not fallidos else theme.COLORS["warning"]
+            if page:
+                page.update()
+            obtener_vigilante().sondear_ahora()
 
         threading.Thread(target=ejecutar).start()
 
@@ -219,6 +313,36 @@ def crear_pagina_servicios(page: ft.Page = None) -> ft.Column:
         )
         acciones_widgets.append(widget)
 
+    # Restaurar lo que el optimizador cambió (el registro persiste tras reiniciar)
+    acciones_widgets.append(ft.Container(
+        content=ft.Column(
+            controls=[
+                ft.Container(
+                    content=ft.Icon(ft.Icons.RESTORE_ROUNDED, size=28, color=ft.Colors.WHITE),
+                    padding=16,
+                    border_radius=16,
+                    bgcolor=theme.COLORS["primary"],
+                ),
+                ft.Container(height=8),
+                ft.Text("Restaurar", size=14, weight=ft.FontWeight.BOLD, color=theme.COLORS["text"]),
+                ft.Text(f"{len(obtener_estados_originales())} registrados", size=11, color=theme.COLORS["text_muted"]),
+            ],
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            spacing=4,
+        ),
+        padding=20,
+        border_radius=theme.BORDER_RADIUS,
+        bgcolor=theme.COLORS["surface"],
+        border=ft.border.all(1, theme.COLORS["border"]),
+        on_click=lambda e: accion_restaurar(),
+        ink=True,
+        width=140,
+    ))
+
+    # Vigilancia en vivo: solo una página recibe los cambios a la vez
+    detener_vigilancia()
+    with _vigilancia_lock:
+        _pagina_vigilada = servicios_lista
     cargar_servicios()
 
     return ft.Column(
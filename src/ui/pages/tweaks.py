@@ -2,8 +2,9 @@
 import flet as ft
 from src.ui import theme
 from src.modules.tweaks import (
-    TWEAKS_DISPONIBLES, CategoriaTweak, NivelRiesgo,
-    obtener_tweaks_por_categoria
+    TWEAKS_DISPONIBLES, CategoriaTweak, NivelRiesgo, EstadoTweak,
+    obtener_tweaks_por_categoria, aplicar_tweaks_en_lote, detectar_estados_tweaks,
+    revertir_tweaks
 )
 import threading
 
@@ -15,6 +16,17 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
     tweaks_seleccionados = set()
     contenedor_tweaks = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO, expand=True)
     estado_texto = ft.Text("", size=14, visible=False)
+    estados: dict[str, EstadoTweak] = {}  # Estado actual de cada tweak en el sistema
+
+    def detectar_estados():
+        """Lee en segundo plano qué tweaks ya están aplicados y refresca la lista."""
+        def detectar():
+            estados.update(detectar_estados_tweaks())
+            actualizar_lista_tweaks()
+            if page:
+                page.update()
+
+        threading.Thread(target=detectar, daemon=True).start()
 
     def actualizar_lista_tweaks():
         """Actualiza la lista de tweaks mostrados."""
@@ -27,6 +39,11 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
                 NivelRiesgo.MEDIO: theme.COLORS["warning"],
                 NivelRiesgo.ALTO: theme.COLORS["error"],
             }.get(tweak.riesgo, theme.COLORS["text_secondary"])
+            estado = estados.get(tweak.id, EstadoTweak.DESCONOCIDO)
+            color_estado = {
+                EstadoTweak.APLICADO: theme.COLORS["success"],
+                EstadoTweak.PARCIAL: theme.COLORS["warning"],
+            }.get(estado, theme.COLORS["text_muted"])
 
             checkbox = ft.Checkbox(
                 value=tweak.id in tweaks_seleccionados,
@@ -65,6 +82,17 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
                                             border_radius=12,
                                             bgcolor=color_riesgo,
                                         ),
+                                        ft.Container(
+                                            content=ft.Text(
+                                                estado.value,
+                                                size=10,
+                                                weight=ft.FontWeight.W_500,
+                                                color=color_estado
+                                            ),
+                                            padding=ft.padding.symmetric(horizontal=10, vertical=4),
+                                            border_radius=12,
+                                            border=ft.border.all(1, color_estado),
+                                        ) if estado != EstadoTweak.DESCONOCIDO else ft.Container(),
                                     ],
                                     spacing=10,
                                 ),
@@ -117,23 +145,46 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
             page.update()
 
         def ejecutar():
-            exitosos = 0
-            for tweak_id in tweaks_seleccionados:
-                for tweak in TWEAKS_DISPONIBLES:
-                    if tweak.id == tweak_id:
-                        try:
-                            exito, _ = tweak.aplicar()
-                            if exito:
-                                exitosos += 1
-                        except:
-                            pass
-                        break
+            seleccion = [t for t in TWEAKS_DISPONIBLES if t.id in tweaks_seleccionados]
+            try:
+                resultados = aplicar_tweaks_en_lote(seleccion)
+            except Exception:
+                resultados = {}
+            exitosos = sum(1 for exito, _ in resultados.values() if exito)
             estado_texto.value = f"Completado: {exitosos} tweaks aplicados"
             estado_texto.color = theme.COLORS["success"]
             tweaks_seleccionados.clear()
             actualizar_lista_tweaks()
             if page:
                 page.update()
+            detectar_estados()
+
+        threading.Thread(target=ejecutar).start()
+
+    def revertir_seleccionados(e):
+        if not tweaks_seleccionados:
+            return
+        estado_texto.visible = True
+        estado_texto.value = "Revirtiendo tweaks..."
+        estado_texto.color = theme.COLORS["info"]
+        if page:
+            page.update()
+
+        def ejecutar():
+            seleccion = [t.id for t in TWEAKS_DISPONIBLES if t.id in tweaks_seleccionados]
+            try:
+                resultados = revertir_tweaks(seleccion)
+            except Exception:
+                resultados = {}
+            exitosos = sum(1 for exito, _ in resultados.values() if exito)
+            fallidos = len(resultados) - exitosos
+            estado_texto.value = f"Revertidos: {exitosos}" + (f", {fallidos} sin valores previos o con error" if fallidos else "")
+            estado_texto.color = theme.COLORS["success"] if not fallidos else theme.COLORS["warning"]
+            tweaks_seleccionados.clear()
+            actualizar_lista_tweaks()
+            if page:
+                page.update()
+            detectar_estados()
 
         threading.Thread(target=ejecutar).start()
 
@@ -187,7 +238,24 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
         ),
     )
 
+    btn_revertir = ft.Container(
+        content=ft.Row(
+            controls=[
+                ft.Icon(ft.Icons.UNDO_ROUNDED, size=20, color=theme.COLORS["text"]),
+                ft.Text("Revertir", size=14, weight=ft.FontWeight.W_600, color=theme.COLORS["text"]),
+            ],
+            spacing=10,
+            alignment=ft.MainAxisAlignment.CENTER,
+        ),
+        padding=ft.padding.symmetric(horizontal=22, vertical=14),
+        border_radius=theme.BORDER_RADIUS_SM,
+        bgcolor=theme.COLORS["surface_light"],
+        on_click=revertir_seleccionados,
+        ink=True,
+    )
+
     actualizar_lista_tweaks()
+    detectar_estados()
 
     return ft.Column(
         controls=[
@@ -254,6 +322,7 @@ def crear_pagina_tweaks(page: ft.Page = None) -> ft.Column:
                     controls=[
                         estado_texto,
                         ft.Container(expand=True),
+                        btn_revertir,
                         btn_aplicar,
                     ],
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
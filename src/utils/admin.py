@@ -3,6 +3,9 @@ import ctypes
 import sys
 import os
 import subprocess
+import threading
+from typing import Generator
+from src.utils.sesion_powershell import SesionPowerShell, HostNoDisponibleError
 
 # Constantes para ocultar ventanas
 CREATE_NO_WINDOW = 0x08000000
@@ -47,8 +50,8 @@ def _crear_startupinfo():
     return startupinfo
 
 
-def ejecutar_powershell(comando: str, como_admin: bool = True) -> tuple[bool, str]:
-    """Ejecuta un comando de PowerShell sin mostrar ventana y retorna el resultado."""
+def _ejecutar_powershell_proceso(comando: str) -> tuple[bool, str]:
+    """Ejecuta un comando en un proceso de PowerShell nuevo."""
     try:
         # Configurar output como UTF-8
         comando_utf8 = f"[Console]::OutputEncoding = [System.Text.Encoding]::UTF8; {comando}"
@@ -91,6 +94,60 @@ def ejecutar_powershell(comando: str, como_admin: bool = True) -> tuple[bool, st
         return False, str(e)
 
 
+# Sesión compartida de PowerShell (se crea en el primer uso)
+_sesion: SesionPowerShell | None = None
+_sesion_disponible = True
+_sesion_lock = threading.Lock()
+
+
+def obtener_sesion() -> SesionPowerShell:
+    """Retorna la sesión persistente de PowerShell compartida."""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            _sesion = SesionPowerShell()
+        return _sesion
+
+
+def ejecutar_powershell(comando: str, como_admin: bool = True) -> tuple[bool, str]:
+    """Ejecuta un comando de PowerShell sin mostrar ventana y retorna el resultado.
+
+    Los comandos se envían a una sesión persistente para evitar el coste de
+    arranque de powershell.exe en cada llamada. Si el host no puede iniciarse
+    se usa un proceso nuevo por comando.
+    """
+    global _sesion_disponible
+    if _sesion_disponible:
+        try:
+            return obtener_sesion().ejecutar(comando)
+        except HostNoDisponibleError:
+            _sesion_disponible = False
+    return _ejecutar_powershell_proceso(comando)
+
+
+def iterar_powershell(comando: str) -> Generator[str, None, bool]:
+    """Ejecuta un comando de PowerShell entregando cada línea de salida en cuanto llega.
+
+    Usa la sesión persistente, igual que ejecutar_powershell. Al agotarse, el
+    generador retorna si el comando terminó con éxito; si falla o excede el
+    tiempo límite deja de entregar líneas y retorna False. Sin sesión
+    disponible la salida llega toda junta al terminar el proceso.
+    """
+    global _sesion_disponible
+    if _sesion_disponible:
+        try:
+            codigo, _ = yield from obtener_sesion().iterar_crudo(comando)
+            return codigo == 0
+        except HostNoDisponibleError:
+            _sesion_disponible = False
+        except Exception:
+            return False
+    exito, salida = _ejecutar_powershell_proceso(comando)
+    if exito:
+        yield from salida.splitlines()
+    return exito
+
+
 def ejecutar_cmd(comando: str) -> tuple[bool, str]:
     """Ejecuta un comando de CMD sin mostrar ventana y retorna el resultado."""
     try:
@@ -0,0 +1,218 @@
+"""Catálogo local de las versiones de drivers más recientes conocidas.
+
+El catálogo es un archivo de texto (ver src/data/catalogo_drivers.tsv) con
+una fila hardware_id/versión por dispositivo. Para consultarlo rápido se
+compila a un índice binario ordenado en el directorio de datos, que se abre
+con mmap en la primera consulta y se busca por bisección sin cargarlo en
+memoria. El índice se vuelve a compilar cuando cambia el catálogo.
+
+Formato del índice: una cabecera de 32 bytes (firma, mtime y tamaño del
+catálogo de origen, cantidad de registros) seguida de registros de 16 bytes
+(hash de 64 bits del hardware id y cuatro componentes de versión de 16 bits)
+ordenados por hash.
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+
+from src.utils.datos import obtener_directorio_datos
+
+_NOMBRE_CATALOGO = "catalogo_drivers.tsv"
+_NOMBRE_INDICE = "catalogo_drivers.idx"
+CATALOGO_INCLUIDO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", _NOMBRE_CATALOGO
+)
+
+_FIRMA = b"TDCAT1\0\0"
+_CABECERA = struct.Struct("<8sqqI4x")
+_REGISTRO = struct.Struct("<Q4H")
+_HASH = struct.Struct("<Q")
+
+Version = tuple[int, int, int, int]
+
+
+_PATRON_VERSION = re.compile(r"\s*(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?")
+
+
+def parsear_version(texto: str) -> Version | None:
+    """Convierte "31.0.101.4502" en (31, 0, 101, 4502); None si no es una versión."""
+    coincidencia = _PATRON_VERSION.match(texto or "")
+    if not coincidencia:
+        return None
+    return tuple(min(int(parte), 0xFFFF) if parte else 0 for parte in coincidencia.groups())
+
+
+def formatear_version(version: Version) -> str:
+    return ".".join(str(p) for p in version)
+
+
+def claves_hardware(hardware_id: str) -> list[str]:
+    """
+    Claves de búsqueda de un hardware id, de la más específica a la más general.
+
+    PCI\\VEN_8086&DEV_9A49&SUBSYS_3FC817AA&REV_01 se busca también como
+    PCI\\VEN_8086&DEV_9A49&SUBSYS_3FC817AA y PCI\\VEN_8086&DEV_9A49; nunca
+    solo por fabricante.
+    """
+    partes = (hardware_id or "").strip().upper().split("&")
+    if not partes[0]:
+        return []
+    return ["&".join(partes[:n]) for n in range(len(partes), min(len(partes), 2) - 1, -1)]
+
+
+def _hash(clave: str) -> int:
+    return _HASH.unpack(hashlib.blake2b(clave.encode("utf-8"), digest_size=8).digest())[0]
+
+
+def leer_catalogo(ruta: str) -> dict[str, Version]:
+    """Lee un catálogo de texto. Si un hardware id se repite, queda la versión mayor."""
+    entradas: dict[str, Version] = {}
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            if not linea.strip() or linea.startswith("#"):
+                continue
+            columnas = linea.rstrip("\r\n").split("\t")
+            version = parsear_version(columnas[1]) if len(columnas) > 1 else None
+            if version is None:
+                continue  # Cabecera o fila inválida
+            clave = columnas[0].strip().upper()
+            if clave and version > entradas.get(clave, (0, 0, 0, 0)):
+                entradas[clave] = version
+    return entradas
+
+
+def compilar_indice(ruta_catalogo: str, ruta_indice: str) -> int:
+    """Compila un catálogo de texto al índice binario. Retorna la cantidad de registros."""
+    info = os.stat(ruta_catalogo)
+    registros = sorted((_hash(clave), version) for clave, version in leer_catalogo(ruta_catalogo).items())
+    temporal = ruta_indice + ".tmp"
+    with open(temporal, "wb") as f:
+        f.write(_CABECERA.pack(_FIRMA, info.st_mtime_ns, info.st_size, len(registros)))
+        for hash_clave, version in registros:
+            f.write(_REGISTRO.pack(hash_clave, *version))
+    os.replace(temporal, ruta_indice)
+    return len(registros)
+
+
+class CatalogoDrivers:
+    """Consulta de versiones sobre el índice compilado, abierto con mmap.
+
+    El índice se abre (y si hace falta se compila) en la primera consulta.
+    """
+
+    def __init__(self, ruta_catalogo: str | None = None, ruta_indice: str | None = None):
+        self._ruta_catalogo = ruta_catalogo
+        self.ruta_indice = ruta_indice or os.path.join(obtener_directorio_datos(), _NOMBRE_INDICE)
+        self._mapa: mmap.mmap | None = None
+        self._hashes: memoryview | None = None  # Vista de los hashes dentro del mapeo
+        self._cantidad = 0
+        self._abierto = False
+        self._lock = threading.Lock()
+
+    @property
+    def ruta_catalogo(self) -> str:
+        """El catálogo importado en el directorio de datos o, si no hay, el incluido."""
+        if self._ruta_catalogo:
+            return self._ruta_catalogo
+        importado = os.path.join(obtener_directorio_datos(), _NOMBRE_CATALOGO)
+        return importado if os.path.exists(importado) else CATALOGO_INCLUIDO
+
+    def _indice_vigente(self, info: os.stat_result) -> bool:
+        try:
+            with open(self.ruta_indice, "rb") as f:
+                firma, mtime, tamano, cantidad = _CABECERA.unpack(f.read(_CABECERA.size))
+            vigente = (firma, mtime, tamano) == (_FIRMA, info.st_mtime_ns, info.st_size)
+            return vigente and os.path.getsize(self.ruta_indice) == _CABECERA.size + cantidad * _REGISTRO.size
+        except (OSError, struct.error):
+            return False
+
+    def _abrir(self):
+        """
+        Abre el índice, compilándolo antes si el catálogo cambió.
+
+        Si el catálogo o el índice no se pueden leer, el catálogo queda vacío:
+        un catálogo dañado no debe impedir el escaneo de drivers.
+        """
+        self._abierto = True
+        self._cantidad = 0
+        try:
+            info = os.stat(self.ruta_catalogo)
+            if not self._indice_vigente(info):
+                compilar_indice(self.ruta_catalogo, self.ruta_indice)
+            with open(self.ruta_indice, "rb") as f:
+                cantidad = _CABECERA.unpack(f.read(_CABECERA.size))[3]
+                if cantidad:
+                    self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    # Un registro son dos enteros de 64 bits: el hash es el primero
+                    self._hashes = memoryview(self._mapa)[_CABECERA.size:].cast("Q")[::2]
+                self._cantidad = cantidad
+        except (OSError, UnicodeDecodeError, ValueError, struct.error):
+            self._cantidad = 0
+
+    def cerrar(self):
+        """Libera el mapeo; la próxima consulta vuelve a abrir el índice."""
+        with self._lock:
+            if self._hashes is not None:
+                self._hashes.release()
+            if self._mapa is not None:
+                self._mapa.close()
+            self._hashes = None
+            self._mapa = None
+            self._cantidad = 0
+            self._abierto = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self._abierto:
+                self._abrir()
+            return self._cantidad
+
+    def _buscar(self, hash_clave: int) -> Version | None:
+        # Llamar con self._lock tomado: cerrar() libera el mapeo
+        posicion = bisect.bisect_left(self._hashes, hash_clave)
+        if posicion < self._cantidad and self._hashes[posicion] == hash_clave:
+            return _REGISTRO.unpack_from(self._mapa, _CABECERA.size + posicion * _REGISTRO.size)[1:]
+        return None
+
+    def version_mas_reciente(self, hardware_id: str) -> Version | None:
+        """Última versión conocida para un hardware id, o None si no está en el catálogo."""
+        with self._lock:
+            if not self._abierto:
+                self._abrir()
+            if not self._cantidad:
+                return None
+            for clave in claves_hardware(hardware_id):
+                version = self._buscar(_hash(clave))
+                if version is not None:
+                    return version
+            return None
+
+
+_catalogo: CatalogoDrivers | None = None
+_catalogo_lock = threading.Lock()
+
+
+def obtener_catalogo() -> CatalogoDrivers:
+    """Retorna el catálogo de drivers compartido."""
+    global _catalogo
+    with _catalogo_lock:
+        if _catalogo is None:
+            _catalogo = CatalogoDrivers()
+        return _catalogo
+
+
+def actualizar_catalogo(ruta: str) -> tuple[bool, str]:
+    """Importa un catálogo de texto al directorio de datos y recompila el índice."""
+    try:
+        entradas = len(leer_catalogo(ruta))
+        catalogo = obtener_catalogo()
+        catalogo.cerrar()
+        shutil.copyfile(ruta, os.path.join(obtener_directorio_datos(), _NOMBRE_CATALOGO))
+        return True, f"Catálogo actualizado: {entradas} dispositivos"
+    except (OSError, UnicodeDecodeError) as e:
+        return False, str(e)
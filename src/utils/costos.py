@@ -0,0 +1,76 @@
+"""Costo en tiempo de cada paso, aprendido de ejecuciones anteriores.
+
+Cada vez que termina un paso se guarda cuánto tardó por unidad (un tweak,
+un servicio, un paquete...) como un promedio móvil en el directorio de
+datos. Mientras un paso no tenga mediciones se usa la tabla
+COSTOS_PREDETERMINADOS.
+"""
+import threading
+
+from src.utils.datos import escribir_json, leer_json
+
+_ARCHIVO_COSTOS = "costos_pasos.json"
+
+# Segundos por unidad de cada paso en un equipo típico
+COSTOS_PREDETERMINADOS: dict[str, float] = {
+    "tweaks": 0.4,       # Por tweak, dentro de un mismo lote
+    "servicios": 1.5,    # Por servicio detenido y deshabilitado
+    "bloatware": 6.0,    # Por paquete Appx (incluye el provisionado)
+    "limpieza": 25.0,    # Limpieza completa
+}
+COSTO_DESCONOCIDO = 1.0
+
+_PESO_NUEVA_MUESTRA = 0.3  # Del promedio móvil exponencial
+_lock = threading.Lock()
+
+
+def _leer_costos() -> dict:
+    costos = leer_json(_ARCHIVO_COSTOS, {})
+    return costos if isinstance(costos, dict) else {}
+
+
+def _medicion(costos: dict, id_paso: str) -> tuple[float, int] | None:
+    """(segundos por unidad, muestras) guardados de un paso, o None si no hay o están dañados."""
+    guardado = costos.get(id_paso)
+    if not isinstance(guardado, dict):
+        return None
+    segundos = guardado.get("segundos")
+    muestras = guardado.get("muestras")
+    if not isinstance(segundos, (int, float)) or segundos < 0:
+        return None
+    return float(segundos), muestras if isinstance(muestras, int) else 1
+
+
+def estimar_costo(id_paso: str, unidades: int = 1) -> float:
+    """Segundos estimados para un paso de ``unidades`` unidades."""
+    medicion = _medicion(_leer_costos(), id_paso)
+    if medicion:
+        por_unidad = medicion[0]
+    else:
+        por_unidad = COSTOS_PREDETERMINADOS.get(id_paso, COSTO_DESCONOCIDO)
+    return por_unidad * max(unidades, 1)
+
+
+def registrar_duracion(id_paso: str, segundos: float, unidades: int = 1) -> None:
+    """Agrega una medición de un paso al promedio guardado."""
+    por_unidad = segundos / max(unidades, 1)
+    with _lock:
+        costos = _leer_costos()
+        previo = _medicion(costos, id_paso)
+        if previo:
+            segundos, muestras = previo
+            por_unidad = segundos + _PESO_NUEVA_MUESTRA * (por_unidad - segundos)
+            muestras += 1
+        else:
+            muestras = 1
+        costos[id_paso] = {"segundos": round(por_unidad, 4), "muestras": muestras}
+        escribir_json(_ARCHIVO_COSTOS, costos)
+
+
+def formatear_eta(segundos: float | None) -> str:
+    """Texto corto para el tiempo restante, p. ej. "~45 s" o "~3 min"."""
+    if segundos is None:
+        return ""
+    if segundos < 60:
+        return f"~{max(int(round(segundos)), 1)} s"
+    return f"~{int(round(segundos / 60))} min"
@@ -0,0 +1,32 @@
+"""Ubicación de los datos persistentes de la aplicación."""
+import json
+import os
+
+NOMBRE_APP = "TecnodespegueOptimizer"
+
+
+def obtener_directorio_datos() -> str:
+    """Retorna %LOCALAPPDATA%\\TecnodespegueOptimizer, creándolo si no existe."""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    ruta = os.path.join(base, NOMBRE_APP)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def leer_json(nombre: str, defecto=None):
+    """Lee un archivo JSON del directorio de datos; retorna ``defecto`` si no existe o está dañado."""
+    ruta = os.path.join(obtener_directorio_datos(), nombre)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return defecto
+
+
+def escribir_json(nombre: str, datos) -> None:
+    """Escribe un archivo JSON en el directorio de datos de forma atómica."""
+    ruta = os.path.join(obtener_directorio_datos(), nombre)
+    temporal = ruta + ".tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
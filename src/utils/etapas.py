@@ -0,0 +1,208 @@
+"""Ejecución de etapas con dependencias en un pool de hilos acotado.
+
+Cada etapa declara de qué etapas depende; las que no dependen entre sí se
+ejecutan a la vez. El progreso se reporta como un único porcentaje: cada
+etapa aporta su peso (los segundos que se estima que tarda) multiplicado por
+la fracción que lleva hecha. Mientras una etapa no reporta avance propio, su
+fracción se estima por el tiempo transcurrido frente a su peso.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from src.utils import costos
+from src.utils.sesion_powershell import espera_acumulada
+
+INTERVALO_ESTIMACION = 1.0  # Segundos entre actualizaciones por tiempo transcurrido
+_TOPE_ESTIMADO = 0.95  # Una etapa no pasa de aquí solo por tiempo transcurrido
+
+
+@dataclass
+class Etapa:
+    """Una etapa del grafo.
+
+    ``funcion`` recibe ``avance(fraccion, mensaje=None)`` para reportar su
+    progreso interno (0.0 a 1.0) y retorna el resultado de la etapa.
+    """
+    id: str
+    funcion: Callable[[Callable[..., None]], Any]
+    mensaje: str  # Se reporta cuando la etapa empieza
+    peso: float = 1.0  # Segundos estimados
+    depende_de: tuple[str, ...] = ()
+    unidades: int = 1  # Para registrar el costo por unidad
+
+
+class EtapaOmitidaError(Exception):
+    """Una etapa no se ejecutó porque falló una de las que dependía."""
+
+
+def ordenar_etapas(etapas: list[Etapa]) -> list[str]:
+    """
+    Retorna los ids en un orden topológico (estable respecto a la lista).
+
+    Raises:
+        ValueError: Si hay ids repetidos, dependencias desconocidas o ciclos.
+    """
+    ids = [etapa.id for etapa in etapas]
+    conocidos = set(ids)
+    if len(conocidos) != len(ids):
+        raise ValueError("Hay etapas con el mismo id")
+    pendientes = {}
+    for etapa in etapas:
+        desconocidas = [d for d in etapa.depende_de if d not in conocidos]
+        if desconocidas:
+            raise ValueError(f"La etapa {etapa.id!r} depende de etapas desconocidas: {desconocidas}")
+        pendientes[etapa.id] = set(etapa.depende_de)
+
+    orden = []
+    while pendientes:
+        listas = [id_etapa for id_etapa in ids if id_etapa in pendientes and not pendientes[id_etapa]]
+        if not listas:
+            raise ValueError(f"Las etapas forman un ciclo: {sorted(pendientes)}")
+        for id_etapa in listas:
+            del pendientes[id_etapa]
+        for dependencias in pendientes.values():
+            dependencias.difference_update(listas)
+        orden.extend(listas)
+    return orden
+
+
+class _Progreso:
+    """Combina el avance de todas las etapas en un porcentaje que no retrocede."""
+
+    def __init__(self, etapas: list[Etapa], callback: Callable[[str, int], None] | None,
+                 al_estimar: Callable[[float | None], None] | None):
+        self.callback = callback
+        self.al_estimar = al_estimar
+        self.pesos = {etapa.id: max(etapa.peso, 0.0) for etapa in etapas}
+        self.total = sum(self.pesos.values()) or 1.0
+        self.fracciones = {etapa.id: 0.0 for etapa in etapas}
+        self.inicios: dict[str, float] = {}
+        self.terminadas: set[str] = set()
+        self.inicio = time.monotonic()
+        self.ultimo = 0
+        self.mensaje = ""
+        self._lock = threading.Lock()
+
+    def _fraccion(self, id_etapa: str, ahora: float) -> float:
+        fraccion = self.fracciones[id_etapa]
+        if id_etapa in self.inicios and id_etapa not in self.terminadas and self.pesos[id_etapa]:
+            transcurrido = ahora - self.inicios[id_etapa]
+            fraccion = max(fraccion, min(transcurrido / self.pesos[id_etapa], _TOPE_ESTIMADO))
+        return fraccion
+
+    def _reportar(self, mensaje: str | None):
+        ahora = time.monotonic()
+        hecho = sum(self.pesos[i] * self._fraccion(i, ahora) for i in self.pesos)
+        # 100 queda reservado para el final del grafo completo
+        porcentaje = max(self.ultimo, min(int(hecho / self.total * 100), 99))
+        self.ultimo = porcentaje
+        if mensaje is not None:
+            self.mensaje = mensaje
+        if self.al_estimar:
+            restante = self.total - hecho
+            transcurrido = ahora - self.inicio
+            if hecho > 0 and transcurrido >= INTERVALO_ESTIMACION:
+                # El ritmo real ya incluye lo que las etapas se solapan
+                restante *= transcurrido / hecho
+            self.al_estimar(max(restante, 0.0))
+        if self.callback and self.mensaje:
+            self.callback(self.mensaje, porcentaje)
+
+    def empezar(self, id_etapa: str, mensaje: str):
+        with self._lock:
+            self.inicios[id_etapa] = time.monotonic()
+            self._reportar(mensaje)
+
+    def avanzar(self, id_etapa: str, fraccion: float, mensaje: str | None = None):
+        with self._lock:
+            self.fracciones[id_etapa] = max(self.fracciones[id_etapa], min(max(fraccion, 0.0), 1.0))
+            self._reportar(mensaje)
+
+    def terminar(self, id_etapa: str):
+        with self._lock:
+            self.fracciones[id_etapa] = 1.0
+            self.terminadas.add(id_etapa)
+            self._reportar(None)
+
+    def actualizar(self):
+        with self._lock:
+            self._reportar(None)
+
+
+def ejecutar_etapas(
+    etapas: list[Etapa],
+    max_hilos: int = 3,
+    callback: Callable[[str, int], None] | None = None,
+    al_estimar: Callable[[float | None], None] | None = None,
+    registrar_costos: bool = False
+) -> dict[str, Any]:
+    """
+    Ejecuta las etapas respetando sus dependencias.
+
+    Una etapa empieza en cuanto terminaron todas aquellas de las que depende,
+    con como mucho ``max_hilos`` etapas en curso. Si una etapa lanza una
+    excepción, las que dependen de ella no se ejecutan y el resto sigue; al
+    terminar se relanza la primera excepción.
+
+    Args:
+        etapas: Etapas a ejecutar
+        max_hilos: Etapas concurrentes como máximo
+        callback: Recibe (mensaje, porcentaje) desde los hilos del pool; también
+            se llama cada INTERVALO_ESTIMACION segundos con el último mensaje
+        al_estimar: Recibe los segundos que se estima que faltan
+        registrar_costos: Guardar la duración de cada etapa terminada con
+            éxito (ver src/utils/costos.py), con el id de la etapa como clave.
+            No cuenta el tiempo esperando turno en la sesión de PowerShell
+
+    Returns:
+        Diccionario id -> resultado de cada etapa
+    """
+    orden = ordenar_etapas(etapas)
+    por_id = {etapa.id: etapa for etapa in etapas}
+    progreso = _Progreso(etapas, callback, al_estimar)
+    resultados: dict[str, Any] = {}
+    errores: dict[str, BaseException] = {}
+
+    def correr(etapa: Etapa):
+        progreso.empezar(etapa.id, etapa.mensaje)
+        inicio = time.monotonic()
+        espera = espera_acumulada()
+        resultado = etapa.funcion(lambda fraccion, mensaje=None: progreso.avanzar(etapa.id, fraccion, mensaje))
+        if registrar_costos:
+            # Sin el tiempo que pasó en cola detrás de otras etapas por la sesión de PowerShell
+            duracion = time.monotonic() - inicio - (espera_acumulada() - espera)
+            costos.registrar_duracion(etapa.id, max(duracion, 0.0), etapa.unidades)
+        progreso.terminar(etapa.id)
+        return resultado
+
+    restantes = list(orden)
+    with ThreadPoolExecutor(max_workers=max(1, max_hilos)) as pool:
+        en_curso = {}
+        while restantes or en_curso:
+            for id_etapa in list(restantes):
+                dependencias = por_id[id_etapa].depende_de
+                if any(d in errores for d in dependencias):
+                    restantes.remove(id_etapa)
+                    errores[id_etapa] = EtapaOmitidaError(f"No se ejecutó {id_etapa!r}: falló una dependencia")
+                elif all(d in resultados for d in dependencias) and len(en_curso) < max(1, max_hilos):
+                    restantes.remove(id_etapa)
+                    en_curso[pool.submit(correr, por_id[id_etapa])] = id_etapa
+            if not en_curso:
+                continue
+            hechos, _ = wait(en_curso, timeout=INTERVALO_ESTIMACION, return_when=FIRST_COMPLETED)
+            if not hechos:
+                progreso.actualizar()
+            for futuro in hechos:
+                id_etapa = en_curso.pop(futuro)
+                try:
+                    resultados[id_etapa] = futuro.result()
+                except Exception as e:
+                    errores[id_etapa] = e
+
+    for id_etapa in orden:
+        if id_etapa in errores and not isinstance(errores[id_etapa], EtapaOmitidaError):
+            raise errores[id_etapa]
+    return resultados
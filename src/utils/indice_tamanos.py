@@ -0,0 +1,203 @@
+"""Índice persistente de tamaños de directorio.
+
+Guarda en SQLite, por directorio, su mtime, el tamaño y la cantidad de sus
+archivos propios, sus subdirectorios y el total acumulado del subárbol. Al
+medir un árbol solo se listan los directorios cuyo mtime cambió; el resto se
+resuelve con un stat.
+
+El mtime de un directorio cambia al crear, borrar o renombrar entradas, no
+cuando un archivo existente cambia de tamaño: ese crecimiento se refleja la
+próxima vez que cambie el directorio que lo contiene.
+"""
+import json
+import os
+import sqlite3
+import stat
+import threading
+from contextlib import closing
+
+from src.utils.datos import obtener_directorio_datos
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS directorios (
+    ruta TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    bytes_propios INTEGER NOT NULL,
+    archivos_propios INTEGER NOT NULL,
+    hijos TEXT NOT NULL,
+    bytes_total INTEGER,
+    archivos_total INTEGER
+)
+'''
+
+
+def es_enlace(entrada: os.DirEntry) -> bool:
+    """Indica si la entrada es un enlace simbólico o una unión (junction)."""
+    if entrada.is_symlink():
+        return True
+    try:
+        atributos = getattr(entrada.stat(follow_symlinks=False), 'st_file_attributes', 0)
+    except OSError:
+        return False
+    return bool(atributos & getattr(stat, 'FILE_ATTRIBUTE_REPARSE_POINT', 0))
+
+
+def _clave(ruta: str) -> str:
+    """Clave de un directorio en el índice (sin distinguir mayúsculas en Windows)."""
+    return os.path.normcase(ruta)
+
+
+def _listar(directorio: str) -> tuple[int, int, list[str]]:
+    """Lista un directorio. Retorna (bytes_propios, archivos_propios, subdirectorios)."""
+    total = 0
+    archivos = 0
+    hijos = []
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            try:
+                if entrada.is_dir(follow_symlinks=False) and not es_enlace(entrada):
+                    hijos.append(entrada.name)
+                else:
+                    total += entrada.stat(follow_symlinks=False).st_size
+                    archivos += 1
+            except OSError:
+                pass
+    return total, archivos, hijos
+
+
+class IndiceTamanos:
+    """Índice de tamaños de directorio guardado en una base SQLite.
+
+    Cada medición abre su propia conexión, así que el índice se puede usar
+    desde varios hilos a la vez.
+    """
+
+    def __init__(self, ruta_bd: str | None = None):
+        self.ruta_bd = ruta_bd or os.path.join(obtener_directorio_datos(), "indice_tamanos.db")
+        self._inicializado = False
+        self._lock = threading.Lock()
+
+    def _conectar(self) -> sqlite3.Connection:
+        conexion = sqlite3.connect(self.ruta_bd, timeout=10)
+        with self._lock:
+            if not self._inicializado:
+                conexion.execute(_ESQUEMA)
+                conexion.commit()
+                self._inicializado = True
+        return conexion
+
+    def medir(self, ruta: str, limite: int | None = None) -> tuple[int, int, bool]:
+        """
+        Mide un árbol listando solo los directorios que cambiaron.
+
+        Args:
+            ruta: Directorio raíz
+            limite: Máximo de archivos a listar en directorios cambiados antes
+                de cortar. Lo ya listado queda guardado, así que la próxima
+                medición continúa desde ahí.
+
+        Returns:
+            (bytes, archivos, truncado). Si se truncó, los valores son un mínimo.
+        """
+        raiz = os.path.abspath(ruta)
+        clave_raiz = _clave(raiz)
+        prefijo = clave_raiz.rstrip(os.sep) + os.sep
+
+        with closing(self._conectar()) as conexion:
+            guardados = {
+                fila[0]: fila[1:]
+                for fila in conexion.execute(
+                    "SELECT ruta, mtime, bytes_propios, archivos_propios, hijos, bytes_total, archivos_total "
+                    "FROM directorios WHERE ruta = ? OR substr(ruta, 1, ?) = ?",
+                    (clave_raiz, len(prefijo), prefijo)
+                )
+            }
+
+            propios: dict[str, tuple[int, int, list[str]]] = {}  # clave -> (bytes, archivos, claves hijas)
+            orden = []  # Claves en orden de visita: los padres antes que los hijos
+            nuevos = []
+            listados = 0
+            truncado = False
+
+            pila = [raiz]
+            while pila:
+                directorio = pila.pop()
+                clave = _clave(directorio)
+                try:
+                    mtime = os.stat(directorio).st_mtime_ns
+                except OSError:
+                    continue
+
+                fila = guardados.get(clave)
+                if fila is not None and fila[0] == mtime:
+                    total, archivos, hijos = fila[1], fila[2], json.loads(fila[3])
+                else:
+                    if limite is not None and listados >= limite:
+                        truncado = True
+                        break
+                    try:
+                        total, archivos, hijos = _listar(directorio)
+                    except OSError:
+                        continue
+                    listados += archivos
+                    nuevos.append((clave, mtime, total, archivos, json.dumps(hijos)))
+
+                rutas_hijas = [os.path.join(directorio, hijo) for hijo in hijos]
+                propios[clave] = (total, archivos, [_clave(r) for r in rutas_hijas])
+                orden.append(clave)
+                pila.extend(rutas_hijas)
+
+            conexion.executemany(
+                "INSERT OR REPLACE INTO directorios "
+                "(ruta, mtime, bytes_propios, archivos_propios, hijos) VALUES (?, ?, ?, ?, ?)",
+                nuevos
+            )
+
+            if truncado:
+                conexion.commit()
+                return (
+                    sum(p[0] for p in propios.values()),
+                    sum(p[1] for p in propios.values()),
+                    True
+                )
+
+            # Totales del subárbol de abajo hacia arriba
+            totales: dict[str, tuple[int, int]] = {}
+            for clave in reversed(orden):
+                total, archivos, hijos = propios[clave]
+                for hija in hijos:
+                    if hija in totales:
+                        total += totales[hija][0]
+                        archivos += totales[hija][1]
+                totales[clave] = (total, archivos)
+
+            conexion.executemany(
+                "UPDATE directorios SET bytes_total = ?, archivos_total = ? WHERE ruta = ?",
+                [
+                    (total, archivos, clave)
+                    for clave, (total, archivos) in totales.items()
+                    if clave not in guardados or tuple(guardados[clave][4:6]) != (total, archivos)
+                ]
+            )
+            # Directorios que ya no existen
+            conexion.executemany(
+                "DELETE FROM directorios WHERE ruta = ?",
+                [(clave,) for clave in guardados if clave not in propios]
+            )
+            conexion.commit()
+
+        total, archivos = totales.get(clave_raiz, (0, 0))
+        return total, archivos, False
+
+
+_indice: IndiceTamanos | None = None
+_indice_lock = threading.Lock()
+
+
+def obtener_indice() -> IndiceTamanos:
+    """Retorna el índice de tamaños compartido."""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceTamanos()
+        return _indice
@@ -0,0 +1,88 @@
+"""Ejecución de varios scripts de PowerShell en una sola invocación.
+
+Cada paso se envuelve en try/catch y termina con una línea marcadora
+``##STEP <id> OK`` o ``##STEP <id> FAIL <mensaje>``. Un paso falla si lanza
+un error terminante, si deja LASTEXITCODE distinto de cero o si escribe
+errores no terminantes. La salida de un paso son las líneas escritas entre
+el marcador anterior y el suyo.
+"""
+from src.utils.admin import ejecutar_powershell
+
+MARCADOR = "##STEP"
+
+_PLANTILLA_PASO = '''
+try {{
+    $global:LASTEXITCODE = 0
+    $__err = @()
+    $__out = @()
+    $__out = @(& {{
+{script}
+    }} 2>&1 | ForEach-Object {{
+        if ($_ -is [System.Management.Automation.ErrorRecord]) {{ $__err += $_.ToString() }} else {{ $_ }}
+    }})
+    $__codigo = [int]$global:LASTEXITCODE
+    if (-not $__codigo -and $__err.Count -gt 0) {{ $__codigo = 1 }}  # Errores no terminantes
+}} catch {{
+    $__err += $_.ToString()
+    $__codigo = 1
+}}
+$__texto = ($__out | Out-String).Trim()
+$__errtxt = ($__err -join ' ').Trim()
+if ($__codigo -eq 0 -or ($__texto -and -not $__errtxt)) {{
+    if ($__texto) {{ Write-Output $__texto }}
+    Write-Output "{marcador} {id} OK"
+}} else {{
+    $__msg = if ($__errtxt) {{ $__errtxt }} elseif ($__texto) {{ $__texto }} else {{ 'Error desconocido' }}
+    Write-Output ("{marcador} {id} FAIL " + ($__msg -replace '\\s+', ' '))
+}}
+'''
+
+
+def compilar_lote(pasos: list[tuple[str, str]]) -> str:
+    """Combina pasos (id, script) en un único script con marcadores por paso."""
+    partes = []
+    for id_paso, script in pasos:
+        if not id_paso or any(c.isspace() for c in id_paso):
+            raise ValueError(f"ID de paso inválido: {id_paso!r}")
+        partes.append(_PLANTILLA_PASO.format(script=script, id=id_paso, marcador=MARCADOR))
+    partes.append("$global:LASTEXITCODE = 0")
+    return "\n".join(partes)
+
+
+def parsear_lote(salida: str, ids: list[str], error_lote: str = "") -> dict[str, tuple[bool, str]]:
+    """Separa la salida de un lote en resultados (exito, mensaje) por paso."""
+    resultados: dict[str, tuple[bool, str]] = {}
+    bloque = []
+
+    for linea in salida.splitlines():
+        if linea.startswith(MARCADOR + " "):
+            partes = linea.split(' ', 3)
+            if len(partes) >= 3:
+                id_paso, estado = partes[1], partes[2]
+                if estado == "OK":
+                    resultados[id_paso] = (True, "\n".join(bloque).strip())
+                else:
+                    mensaje = partes[3].strip() if len(partes) > 3 else ""
+                    resultados[id_paso] = (False, mensaje or "Error desconocido")
+                bloque = []
+                continue
+        bloque.append(linea)
+
+    # Pasos sin marcador: el lote se interrumpió antes de llegar a ellos
+    for id_paso in ids:
+        if id_paso not in resultados:
+            resultados[id_paso] = (False, error_lote or "El paso no se ejecutó")
+
+    return resultados
+
+
+def ejecutar_lote(pasos: list[tuple[str, str]]) -> dict[str, tuple[bool, str]]:
+    """Ejecuta todos los pasos en una sola invocación de PowerShell.
+
+    Retorna un diccionario id -> (exito, mensaje) con una entrada por paso.
+    """
+    if not pasos:
+        return {}
+    ids = [id_paso for id_paso, _ in pasos]
+    exito, salida = ejecutar_powershell(compilar_lote(pasos))
+    return parsear_lote(salida, ids, "" if exito else salida)
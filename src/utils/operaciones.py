@@ -0,0 +1,566 @@
+"""Operaciones tipadas de los tweaks y su compilación a PowerShell.
+
+Un tweak describe lo que hace como una lista de operaciones (valores de
+registro, tipos de inicio de servicios, powercfg, paquetes Appx). El
+compilador convierte cualquier conjunto de operaciones en un único script y
+crea cada clave de registro una sola vez. ``compilar_sondeo`` lee en una sola
+consulta el estado que esas operaciones modificarían, para saber si ya están
+aplicadas o, antes de aplicarlas, para capturar los valores previos y
+construir las operaciones inversas. ``SistemaFalso`` interpreta las mismas operaciones en memoria para
+probarlas sin Windows.
+"""
+import fnmatch
+import json
+import re
+from dataclasses import dataclass, field, fields, replace
+
+
+@dataclass(frozen=True)
+class Operacion:
+    """Base de las operaciones de un tweak."""
+
+
+@dataclass(frozen=True)
+class EstablecerRegistro(Operacion):
+    """Escribe un valor de registro, creando la clave si no existe."""
+    ruta: str  # Formato de PowerShell, por ejemplo "HKCU:\\Software\\..."
+    nombre: str
+    valor: int | str | bytes
+    tipo: str = ""  # DWord, QWord, String o Binary; vacío: según el tipo de valor
+
+    @property
+    def tipo_registro(self) -> str:
+        if self.tipo:
+            return self.tipo
+        if isinstance(self.valor, bytes):
+            return "Binary"
+        if isinstance(self.valor, str):
+            return "String"
+        return "DWord"
+
+
+@dataclass(frozen=True)
+class EliminarRegistro(Operacion):
+    """Elimina un valor de registro o, sin nombre, la clave completa con sus subclaves."""
+    ruta: str
+    nombre: str | None = None
+
+
+@dataclass(frozen=True)
+class ConfigurarServicio(Operacion):
+    """Cambia el tipo de inicio de un servicio y opcionalmente lo detiene o inicia."""
+    nombre: str
+    tipo_inicio: str  # Automatic, Manual o Disabled
+    detener: bool = False
+    iniciar: bool = False
+
+
+@dataclass(frozen=True)
+class Powercfg(Operacion):
+    """Ejecuta powercfg con los argumentos dados."""
+    argumentos: str
+
+
+@dataclass(frozen=True)
+class EliminarAppx(Operacion):
+    """Desinstala los paquetes Appx cuyo nombre coincide con el patrón."""
+    patron: str
+
+
+@dataclass(frozen=True)
+class ScriptOpaco(Operacion):
+    """Script de PowerShell que no se puede describir con las demás operaciones."""
+    script: str
+
+
+def _literal(texto: str) -> str:
+    """Cadena literal de PowerShell entre comillas simples."""
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def _valor_powershell(operacion: EstablecerRegistro) -> str:
+    if isinstance(operacion.valor, bytes):
+        return "([byte[]](" + ",".join(f"0x{b:02x}" for b in operacion.valor) + "))"
+    if isinstance(operacion.valor, str):
+        return _literal(operacion.valor)
+    return str(int(operacion.valor))
+
+
+def _clave(ruta: str) -> str:
+    """Clave de registro normalizada (el registro no distingue mayúsculas)."""
+    return ruta.rstrip('\\').lower()
+
+
+def _contiene(padre: str, hija: str) -> bool:
+    """Indica si la clave ``hija`` es ``padre`` o una de sus subclaves."""
+    return hija == padre or hija.startswith(padre + '\\')
+
+
+def compilar_operaciones(operaciones: list[Operacion]) -> str:
+    """
+    Compila operaciones a un único script de PowerShell.
+
+    Cada clave de registro se crea una sola vez (con Test-Path delante) antes
+    de su primera escritura, salvo que una eliminación posterior la borre.
+    """
+    lineas = []
+    creadas: set[str] = set()
+
+    for operacion in operaciones:
+        if isinstance(operacion, EstablecerRegistro):
+            ruta = _literal(operacion.ruta)
+            clave = _clave(operacion.ruta)
+            if clave not in creadas:
+                lineas.append(f"if (-not (Test-Path -Path {ruta})) {{ New-Item -Path {ruta} -Force | Out-Null }}")
+                creadas.add(clave)
+            lineas.append(
+                f"Set-ItemProperty -Path {ruta} -Name {_literal(operacion.nombre)} "
+                f"-Value {_valor_powershell(operacion)} -Type {operacion.tipo_registro} -Force"
+            )
+        elif isinstance(operacion, EliminarRegistro):
+            ruta = _literal(operacion.ruta)
+            if operacion.nombre is None:
+                clave = _clave(operacion.ruta)
+                creadas = {c for c in creadas if not _contiene(clave, c)}
+                lineas.append(f"Remove-Item -Path {ruta} -Recurse -Force -ErrorAction SilentlyContinue")
+            else:
+                lineas.append(
+                    f"Remove-ItemProperty -Path {ruta} -Name {_literal(operacion.nombre)} "
+                    f"-Force -ErrorAction SilentlyContinue"
+                )
+        elif isinstance(operacion, ConfigurarServicio):
+            nombre = _literal(operacion.nombre)
+            if operacion.detener:
+                lineas.append(f"Stop-Service -Name {nombre} -Force -ErrorAction SilentlyContinue")
+            lineas.append(
+                f"Set-Service -Name {nombre} -StartupType {operacion.tipo_inicio} -ErrorAction SilentlyContinue"
+            )
+            if operacion.iniciar:
+                lineas.append(f"Start-Service -Name {nombre} -ErrorAction SilentlyContinue")
+        elif isinstance(operacion, Powercfg):
+            lineas.append(f"powercfg {operacion.argumentos}")
+        elif isinstance(operacion, EliminarAppx):
+            lineas.append(
+                f"Get-AppxPackage {_literal(operacion.patron)} | Remove-AppxPackage -ErrorAction SilentlyContinue"
+            )
+        elif isinstance(operacion, ScriptOpaco):
+            lineas.append(operacion.script.strip('\n'))
+        else:
+            raise TypeError(f"Operación no soportada: {operacion!r}")
+
+    return "\n".join(lineas)
+
+
+# Powercfg /hibernate se refleja en este valor del registro
+_CLAVE_ENERGIA = "HKLM:\\SYSTEM\\CurrentControlSet\\Control\\Power"
+_VALOR_HIBERNACION = "HibernateEnabled"
+
+
+def _id_registro(ruta: str, nombre: str) -> str:
+    return f"r|{_clave(ruta)}|{nombre.lower()}"
+
+
+def _id_clave(ruta: str) -> str:
+    return f"k|{_clave(ruta)}"
+
+
+def _id_servicio(nombre: str) -> str:
+    return f"s|{nombre.lower()}"
+
+
+def _id_tipo(ruta: str, nombre: str) -> str:
+    return f"t|{_clave(ruta)}|{nombre.lower()}"
+
+
+def _id_estado_servicio(nombre: str) -> str:
+    return f"e|{nombre.lower()}"
+
+
+def _argumentos_powercfg(operacion: Powercfg) -> list[str]:
+    return operacion.argumentos.lower().split()
+
+
+def _ids_sondeo(operacion: Operacion) -> list[str]:
+    """Entradas del sondeo (con captura) que describen lo que toca la operación."""
+    if isinstance(operacion, (EstablecerRegistro, EliminarRegistro)):
+        if operacion.nombre is None:
+            return [_id_clave(operacion.ruta)]
+        return [_id_registro(operacion.ruta, operacion.nombre), _id_tipo(operacion.ruta, operacion.nombre)]
+    if isinstance(operacion, ConfigurarServicio):
+        return [_id_servicio(operacion.nombre), _id_estado_servicio(operacion.nombre)]
+    if isinstance(operacion, EliminarAppx):
+        return ["appx"]
+    if isinstance(operacion, Powercfg):
+        argumentos = _argumentos_powercfg(operacion)
+        if argumentos[:1] == ["/hibernate"]:
+            return [_id_registro(_CLAVE_ENERGIA, _VALOR_HIBERNACION), _id_tipo(_CLAVE_ENERGIA, _VALOR_HIBERNACION)]
+        if argumentos[:1] == ["/setactive"]:
+            return ["plan"]
+    return []
+
+
+def compilar_sondeo(operaciones: list[Operacion], capturar: bool = False) -> str:
+    """
+    Compila un script que lee el estado actual de todo lo que tocan las operaciones.
+
+    Cada clave de registro se lee una sola vez, los servicios con un solo
+    Get-Service y los paquetes Appx con un solo Get-AppxPackage. La salida es
+    un objeto JSON que interpreta ``parsear_sondeo``.
+
+    Con ``capturar`` también se leen el tipo de cada valor de registro y el
+    estado de cada servicio, necesarios para ``operaciones_inversas``.
+    """
+    valores: dict[str, tuple[str, set[str]]] = {}  # clave -> (ruta, nombres)
+    claves: dict[str, str] = {}  # Claves cuya existencia se consulta
+    servicios: dict[str, str] = {}
+    appx = False
+    plan = False
+
+    for operacion in operaciones:
+        if isinstance(operacion, EstablecerRegistro) or (
+                isinstance(operacion, EliminarRegistro) and operacion.nombre is not None):
+            valores.setdefault(_clave(operacion.ruta), (operacion.ruta, set()))[1].add(operacion.nombre)
+        elif isinstance(operacion, EliminarRegistro):
+            claves.setdefault(_clave(operacion.ruta), operacion.ruta)
+        elif isinstance(operacion, ConfigurarServicio):
+            servicios.setdefault(operacion.nombre.lower(), operacion.nombre)
+        elif isinstance(operacion, EliminarAppx):
+            appx = True
+        elif isinstance(operacion, Powercfg):
+            argumentos = _argumentos_powercfg(operacion)
+            if argumentos[:1] == ["/hibernate"]:
+                valores.setdefault(_clave(_CLAVE_ENERGIA), (_CLAVE_ENERGIA, set()))[1].add(_VALOR_HIBERNACION)
+            elif argumentos[:1] == ["/setactive"]:
+                plan = True
+
+    lineas = ["$__r = @{}"]
+    for ruta, nombres in valores.values():
+        lineas.append(f"$__v = Get-ItemProperty -Path {_literal(ruta)} -ErrorAction SilentlyContinue")
+        if capturar:
+            lineas.append(f"$__k = Get-Item -Path {_literal(ruta)} -ErrorAction SilentlyContinue")
+        for nombre in sorted(nombres):
+            lineas.append(
+                f"$__r[{_literal(_id_registro(ruta, nombre))}] = "
+                f"if ($__v) {{ $__v.{_literal(nombre)} }} else {{ $null }}"
+            )
+            if capturar:
+                # El valor predeterminado de una clave se llama '' en la API de .NET
+                nombre_api = _literal("" if nombre.lower() == "(default)" else nombre)
+                lineas.append(
+                    f"if ($__k -and $null -ne $__k.GetValue({nombre_api})) {{ "
+                    f"$__r[{_literal(_id_tipo(ruta, nombre))}] = [string]$__k.GetValueKind({nombre_api}) }}"
+                )
+    for ruta in claves.values():
+        lineas.append(f"$__r[{_literal(_id_clave(ruta))}] = Test-Path -Path {_literal(ruta)}")
+    if servicios:
+        nombres = ",".join(_literal(n) for n in servicios.values())
+        lineas.append(
+            f"Get-Service -Name {nombres} -ErrorAction SilentlyContinue | "
+            f"ForEach-Object {{ $__r['s|' + $_.Name.ToLower()] = [string]$_.StartType"
+            + ("; $__r['e|' + $_.Name.ToLower()] = [string]$_.Status" if capturar else "")
+            + " }"
+        )
+    if appx:
+        lineas.append("$__r['appx'] = @(Get-AppxPackage -ErrorAction SilentlyContinue | ForEach-Object { $_.Name })")
+    if plan:
+        lineas.append("$__r['plan'] = [string](powercfg /getactivescheme)")
+    lineas.append("$__r | ConvertTo-Json -Compress -Depth 3")
+    return "\n".join(lineas)
+
+
+def parsear_sondeo(salida: str) -> dict | None:
+    """Convierte la salida de un sondeo en el diccionario de valores leídos (None si falló)."""
+    try:
+        datos = json.loads(salida)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+def _valor_igual(operacion: EstablecerRegistro, actual) -> bool:
+    if actual is None:
+        return False
+    if isinstance(operacion.valor, bytes):
+        return isinstance(actual, list) and bytes(b & 0xFF for b in actual if isinstance(b, int)) == operacion.valor
+    if isinstance(operacion.valor, str):
+        return str(actual) == operacion.valor
+    return isinstance(actual, int) and not isinstance(actual, bool) and actual == operacion.valor
+
+
+def operacion_aplicada(operacion: Operacion, observado: dict) -> bool | None:
+    """
+    Indica si el sistema observado ya está en el estado que deja la operación.
+
+    Returns:
+        True o False, o None si la operación no se puede verificar (scripts
+        opacos o datos que el sondeo no incluyó).
+    """
+    if isinstance(operacion, (EstablecerRegistro, EliminarRegistro)):
+        if operacion.nombre is None:
+            id_clave = _id_clave(operacion.ruta)
+            return not observado[id_clave] if id_clave in observado else None
+        id_valor = _id_registro(operacion.ruta, operacion.nombre)
+        if id_valor not in observado:
+            return None
+        if isinstance(operacion, EliminarRegistro):
+            return observado[id_valor] is None
+        return _valor_igual(operacion, observado[id_valor])
+    if isinstance(operacion, ConfigurarServicio):
+        tipo = observado.get(_id_servicio(operacion.nombre))
+        if tipo is None:
+            # El servicio no existe: deshabilitarlo no tiene efecto
+            return operacion.tipo_inicio == "Disabled"
+        return tipo.lower() == operacion.tipo_inicio.lower()
+    if isinstance(operacion, EliminarAppx):
+        if "appx" not in observado:
+            return None
+        instalados = observado["appx"] or []
+        if isinstance(instalados, str):
+            instalados = [instalados]
+        patron = operacion.patron.lower()
+        return not any(fnmatch.fnmatchcase(str(p).lower(), patron) for p in instalados)
+    if isinstance(operacion, Powercfg):
+        argumentos = _argumentos_powercfg(operacion)
+        if argumentos[:1] == ["/hibernate"] and len(argumentos) > 1:
+            actual = observado.get(_id_registro(_CLAVE_ENERGIA, _VALOR_HIBERNACION))
+            return None if actual is None else bool(actual) == (argumentos[1] == "on")
+        if argumentos[:1] == ["/setactive"] and len(argumentos) > 1 and "plan" in observado:
+            return argumentos[1] in str(observado["plan"]).lower()
+    return None
+
+
+def _destino(operacion: Operacion) -> tuple[tuple | None, frozenset]:
+    """Qué modifica una operación y qué aspectos de ese destino fija."""
+    if isinstance(operacion, (EstablecerRegistro, EliminarRegistro)):
+        if operacion.nombre is None:
+            return ("clave", _clave(operacion.ruta)), frozenset({"valor"})
+        return ("registro", _clave(operacion.ruta), operacion.nombre.lower()), frozenset({"valor"})
+    if isinstance(operacion, ConfigurarServicio):
+        aspectos = {"tipo"}
+        if operacion.detener or operacion.iniciar:
+            aspectos.add("ejecucion")
+        return ("servicio", operacion.nombre.lower()), frozenset(aspectos)
+    if isinstance(operacion, Powercfg):
+        argumentos = _argumentos_powercfg(operacion)
+        if argumentos[:1] in (["/hibernate"], ["/setactive"]):
+            return ("powercfg", argumentos[0]), frozenset({"valor"})
+    if isinstance(operacion, EliminarAppx):
+        return ("appx", operacion.patron.lower()), frozenset({"valor"})
+    return None, frozenset()
+
+
+# Campos que Windows compara sin distinguir mayúsculas
+_CAMPOS_SIN_MAYUSCULAS = ("ruta", "nombre", "patron", "argumentos")
+
+
+def _normalizada(operacion: Operacion) -> Operacion:
+    """La operación con rutas y nombres en minúsculas, para detectar repetidas."""
+    cambios = {
+        f.name: _clave(valor) if f.name == "ruta" else valor.lower()
+        for f in fields(operacion)
+        if f.name in _CAMPOS_SIN_MAYUSCULAS and isinstance(valor := getattr(operacion, f.name), str)
+    }
+    return replace(operacion, **cambios) if cambios else operacion
+
+
+def depurar_operaciones(operaciones: list[Operacion]) -> list[bool]:
+    """
+    Marca qué operaciones hay que ejecutar en una secuencia.
+
+    Sobra una operación idéntica a otra anterior, y también la que una
+    operación posterior reemplaza: otro valor en el mismo destino, o la
+    eliminación de la clave que la contiene. Los scripts opacos nunca sobran.
+
+    Returns:
+        Una lista paralela a ``operaciones``: True si se conserva.
+    """
+    conservar = [True] * len(operaciones)
+
+    vistas = set()
+    for i, operacion in enumerate(operaciones):
+        if isinstance(operacion, ScriptOpaco):
+            continue
+        normalizada = _normalizada(operacion)
+        if normalizada in vistas:
+            conservar[i] = False
+        vistas.add(normalizada)
+
+    # De atrás hacia adelante: lo que fija una operación posterior ya no hace falta antes
+    fijados: dict[tuple, set[str]] = {}
+    claves_eliminadas: list[str] = []
+    for i in range(len(operaciones) - 1, -1, -1):
+        if not conservar[i]:
+            continue
+        destino, aspectos = _destino(operaciones[i])
+        if destino is None:
+            continue
+        if destino[0] in ("registro", "clave") and any(_contiene(c, destino[1]) for c in claves_eliminadas):
+            conservar[i] = False
+        elif aspectos <= fijados.get(destino, set()):
+            conservar[i] = False
+        else:
+            fijados.setdefault(destino, set()).update(aspectos)
+            if destino[0] == "clave":
+                claves_eliminadas.append(destino[1])
+    return conservar
+
+
+def extraer_sondeo(operaciones: list[Operacion], observado: dict) -> dict:
+    """Retorna solo las entradas del sondeo que corresponden a las operaciones."""
+    return {
+        id_sondeo: observado[id_sondeo]
+        for operacion in operaciones
+        for id_sondeo in _ids_sondeo(operacion)
+        if id_sondeo in observado
+    }
+
+
+def operaciones_inversas(operaciones: list[Operacion], previo: dict) -> list[Operacion]:
+    """
+    Construye las operaciones que devuelven el sistema al estado capturado.
+
+    ``previo`` es la salida de un sondeo con captura tomado antes de aplicar
+    las operaciones. Se recorren en orden inverso y cada destino se restaura
+    una sola vez. No tienen inversa la eliminación de claves completas, la
+    desinstalación de paquetes Appx ni los scripts opacos.
+    """
+    inversas = []
+    vistos = set()
+    for operacion in reversed(operaciones):
+        if isinstance(operacion, (EstablecerRegistro, EliminarRegistro)) and operacion.nombre is not None:
+            destino = _id_registro(operacion.ruta, operacion.nombre)
+            if destino in vistos or destino not in previo:
+                continue
+            vistos.add(destino)
+            valor = previo[destino]
+            tipo = previo.get(_id_tipo(operacion.ruta, operacion.nombre)) or ""
+            if valor is None:
+                if isinstance(operacion, EstablecerRegistro):
+                    inversas.append(EliminarRegistro(operacion.ruta, operacion.nombre))
+            elif isinstance(valor, list):
+                if tipo in ("", "Binary") and all(isinstance(b, int) for b in valor):
+                    inversas.append(EstablecerRegistro(operacion.ruta, operacion.nombre, bytes(b & 0xFF for b in valor), "Binary"))
+            elif isinstance(valor, (int, str)) and not isinstance(valor, bool):
+                inversas.append(EstablecerRegistro(operacion.ruta, operacion.nombre, valor, tipo))
+        elif isinstance(operacion, ConfigurarServicio):
+            destino = _id_servicio(operacion.nombre)
+            if destino in vistos or destino not in previo:
+                continue  # El servicio no existía
+            vistos.add(destino)
+            estado = previo.get(_id_estado_servicio(operacion.nombre))
+            inversas.append(ConfigurarServicio(
+                operacion.nombre,
+                previo[destino],
+                detener=estado == "Stopped" and operacion.iniciar,
+                iniciar=estado == "Running"
+            ))
+        elif isinstance(operacion, Powercfg):
+            argumentos = _argumentos_powercfg(operacion)
+            if argumentos[:1] == ["/hibernate"]:
+                destino = _id_registro(_CLAVE_ENERGIA, _VALOR_HIBERNACION)
+                if destino not in vistos and previo.get(destino) is not None:
+                    vistos.add(destino)
+                    inversas.append(Powercfg("/hibernate on" if previo[destino] else "/hibernate off"))
+            elif argumentos[:1] == ["/setactive"] and "plan" not in vistos:
+                guid = re.search(r"[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}", str(previo.get("plan", "")).lower())
+                if guid:
+                    vistos.add("plan")
+                    inversas.append(Powercfg(f"/setactive {guid.group(0)}"))
+    return inversas
+
+
+@dataclass
+class SistemaFalso:
+    """Registro, servicios, energía y paquetes simulados en memoria.
+
+    Interpreta operaciones con la misma semántica que su script compilado,
+    para probar y medir el catálogo de tweaks fuera de Windows.
+    """
+    registro: dict[str, dict[str, tuple[int | str | bytes, str]]] = field(default_factory=dict)
+    servicios: dict[str, tuple[str, str]] = field(default_factory=dict)  # Nombre en minúsculas -> (tipo_inicio, estado)
+    paquetes_appx: set[str] = field(default_factory=set)
+    plan_energia: str = ""
+    hibernacion: bool = True
+    scripts_opacos: list[str] = field(default_factory=list)
+
+    def leer_registro(self, ruta: str, nombre: str):
+        """Retorna el valor guardado o None si la clave o el valor no existen."""
+        valores = self.registro.get(_clave(ruta))
+        if valores is None or nombre.lower() not in valores:
+            return None
+        return valores[nombre.lower()][0]
+
+    def existe_clave(self, ruta: str) -> bool:
+        return _clave(ruta) in self.registro
+
+    def servicio(self, nombre: str) -> tuple[str, str] | None:
+        """Retorna (tipo_inicio, estado) de un servicio, o None si no existe."""
+        return self.servicios.get(nombre.lower())
+
+    def sondear(self, operaciones: list[Operacion], capturar: bool = False) -> dict:
+        """Retorna lo que devolvería ``compilar_sondeo`` ejecutado sobre este sistema."""
+        observado = {}
+        for operacion in operaciones:
+            if isinstance(operacion, (EstablecerRegistro, EliminarRegistro)):
+                if operacion.nombre is None:
+                    observado[_id_clave(operacion.ruta)] = self.existe_clave(operacion.ruta)
+                else:
+                    valor = self.leer_registro(operacion.ruta, operacion.nombre)
+                    observado[_id_registro(operacion.ruta, operacion.nombre)] = (
+                        list(valor) if isinstance(valor, bytes) else valor
+                    )
+                    if capturar and valor is not None:
+                        tipo = self.registro[_clave(operacion.ruta)][operacion.nombre.lower()][1]
+                        observado[_id_tipo(operacion.ruta, operacion.nombre)] = tipo
+            elif isinstance(operacion, ConfigurarServicio):
+                servicio = self.servicio(operacion.nombre)
+                if servicio is not None:
+                    observado[_id_servicio(operacion.nombre)] = servicio[0]
+                    if capturar:
+                        observado[_id_estado_servicio(operacion.nombre)] = servicio[1]
+            elif isinstance(operacion, EliminarAppx):
+                observado["appx"] = sorted(self.paquetes_appx)
+            elif isinstance(operacion, Powercfg):
+                argumentos = _argumentos_powercfg(operacion)
+                if argumentos[:1] == ["/hibernate"]:
+                    observado[_id_registro(_CLAVE_ENERGIA, _VALOR_HIBERNACION)] = int(self.hibernacion)
+                elif argumentos[:1] == ["/setactive"]:
+                    observado["plan"] = f"GUID del plan de energía: {self.plan_energia}"
+        return observado
+
+    def aplicar(self, operaciones: list[Operacion]):
+        """Interpreta las operaciones en orden."""
+        for operacion in operaciones:
+            if isinstance(operacion, EstablecerRegistro):
+                valores = self.registro.setdefault(_clave(operacion.ruta), {})
+                valores[operacion.nombre.lower()] = (operacion.valor, operacion.tipo_registro)
+            elif isinstance(operacion, EliminarRegistro):
+                clave = _clave(operacion.ruta)
+                if operacion.nombre is None:
+                    for existente in [c for c in self.registro if _contiene(clave, c)]:
+                        del self.registro[existente]
+                elif clave in self.registro:
+                    self.registro[clave].pop(operacion.nombre.lower(), None)
+            elif isinstance(operacion, ConfigurarServicio):
+                clave = operacion.nombre.lower()
+                if clave not in self.servicios:
+                    continue  # -ErrorAction SilentlyContinue: el servicio no existe
+                _, estado = self.servicios[clave]
+                if operacion.detener:
+                    estado = "Stopped"
+                if operacion.iniciar and operacion.tipo_inicio != "Disabled":
+                    estado = "Running"
+                self.servicios[clave] = (operacion.tipo_inicio, estado)
+            elif isinstance(operacion, Powercfg):
+                partes = operacion.argumentos.lower().split()
+                if partes[:1] == ["/hibernate"] and len(partes) > 1:
+                    self.hibernacion = partes[1] == "on"
+                elif partes[:1] == ["/setactive"] and len(partes) > 1:
+                    self.plan_energia = partes[1]
+            elif isinstance(operacion, EliminarAppx):
+                patron = operacion.patron.lower()
+                self.paquetes_appx = {p for p in self.paquetes_appx if not fnmatch.fnmatchcase(p.lower(), patron)}
+            elif isinstance(operacion, ScriptOpaco):
+                self.scripts_opacos.append(operacion.script)
+            else:
+                raise TypeError(f"Operación no soportada: {operacion!r}")
@@ -0,0 +1,278 @@
+"""Sesión persistente de PowerShell que recibe comandos por stdin.
+
+Cada comando viaja en una sola línea ``<token> <script en base64>``. El host
+ejecuta el script, escribe su salida línea a línea y termina la respuesta con
+el centinela ``##FIN <token> <codigo> <errores en base64>``.
+"""
+import base64
+import os
+import queue
+import subprocess
+import threading
+import time
+import uuid
+from typing import Callable, Generator
+
+# Constantes para ocultar ventanas (ver src.utils.admin)
+CREATE_NO_WINDOW = 0x08000000
+STARTF_USESHOWWINDOW = 0x00000001
+SW_HIDE = 0
+
+CENTINELA = "##FIN"
+
+# Segundos que cada hilo lleva esperando turno en alguna sesión
+_esperas = threading.local()
+
+
+def espera_acumulada() -> float:
+    """Segundos que el hilo actual pasó esperando a que una sesión se liberara."""
+    return getattr(_esperas, "segundos", 0.0)
+
+# Bucle del host: lee un comando por línea, lo ejecuta en un ámbito hijo y
+# responde con la salida seguida del centinela.
+SCRIPT_HOST = r'''
+$ProgressPreference = 'SilentlyContinue'
+$__utf8 = New-Object System.Text.UTF8Encoding $false
+[Console]::OutputEncoding = $__utf8
+while ($true) {
+    $__linea = [Console]::In.ReadLine()
+    if ($null -eq $__linea) { break }
+    $__partes = $__linea.Split(' ')
+    $__token = $__partes[0]
+    $__errores = New-Object System.Collections.Generic.List[string]
+    $__codigo = 0
+    try {
+        $__script = $__utf8.GetString([Convert]::FromBase64String($__partes[1]))
+        $global:LASTEXITCODE = 0
+        & ([scriptblock]::Create($__script)) 2>&1 | ForEach-Object {
+            if ($_ -is [System.Management.Automation.ErrorRecord]) {
+                $__errores.Add($_.ToString())
+            } else {
+                $_ | Out-String -Stream -Width 4096 | ForEach-Object { [Console]::Out.WriteLine($_) }
+            }
+        }
+        if ($global:LASTEXITCODE) { $__codigo = $global:LASTEXITCODE }
+        elseif ($__errores.Count -gt 0) { $__codigo = 1 }
+    } catch {
+        $__errores.Add($_.ToString())
+        $__codigo = 1
+    }
+    $__b64 = [Convert]::ToBase64String($__utf8.GetBytes(($__errores -join "`n")))
+    [Console]::Out.WriteLine("##FIN $__token $__codigo $__b64")
+    [Console]::Out.Flush()
+}
+'''
+
+
+def _argumentos_powershell() -> list[str]:
+    """Construye la línea de comandos del host de PowerShell."""
+    codificado = base64.b64encode(SCRIPT_HOST.encode('utf-16-le')).decode('ascii')
+    return [
+        "powershell.exe",
+        "-NoProfile",
+        "-NonInteractive",
+        "-WindowStyle", "Hidden",
+        "-ExecutionPolicy", "Bypass",
+        "-EncodedCommand", codificado
+    ]
+
+
+def _opciones_ventana_oculta() -> dict:
+    """Opciones de subprocess para no mostrar ventana (solo Windows)."""
+    if os.name != 'nt':
+        return {}
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= STARTF_USESHOWWINDOW
+    startupinfo.wShowWindow = SW_HIDE
+    return {"creationflags": CREATE_NO_WINDOW, "startupinfo": startupinfo}
+
+
+class HostNoDisponibleError(Exception):
+    """No se pudo lanzar el proceso host."""
+
+
+class HostCaidoError(Exception):
+    """El proceso host terminó antes de completar la respuesta."""
+
+
+class SesionPowerShell:
+    """Proceso de PowerShell de larga duración que ejecuta comandos en serie.
+
+    El host se inicia en el primer comando y se reinicia automáticamente si
+    muere. Es seguro usar la misma sesión desde varios hilos: los comandos
+    se serializan.
+    """
+
+    def __init__(self, argumentos: list[str] | None = None, timeout: float = 300):
+        self.argumentos = argumentos or _argumentos_powershell()
+        self.timeout = timeout
+        self._proceso: subprocess.Popen | None = None
+        self._lineas: queue.Queue | None = None
+        self._lock = threading.Lock()
+        self._prefijo = uuid.uuid4().hex[:12]
+        self._contador = 0
+
+    @property
+    def activa(self) -> bool:
+        """Indica si el proceso host está vivo."""
+        return self._proceso is not None and self._proceso.poll() is None
+
+    def _iniciar(self):
+        """Lanza el proceso host y el hilo lector de su salida."""
+        try:
+            self._proceso = subprocess.Popen(
+                self.argumentos,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                bufsize=1,
+                **_opciones_ventana_oculta()
+            )
+        except OSError as e:
+            self._proceso = None
+            raise HostNoDisponibleError(str(e)) from e
+        self._lineas = queue.Queue()
+        threading.Thread(
+            target=self._leer_salida,
+            args=(self._proceso, self._lineas),
+            daemon=True
+        ).start()
+
+    @staticmethod
+    def _leer_salida(proceso: subprocess.Popen, lineas: queue.Queue):
+        """Copia la salida del host a la cola; None indica fin del proceso."""
+        try:
+            for linea in proceso.stdout:
+                lineas.put(linea.rstrip('\r\n').lstrip('\ufeff'))
+        except Exception:
+            pass
+        lineas.put(None)
+
+    def cerrar(self):
+        """Termina el proceso host si está activo."""
+        proceso, self._proceso = self._proceso, None
+        if proceso is None:
+            return
+        try:
+            proceso.stdin.close()
+        except Exception:
+            pass
+        try:
+            proceso.wait(timeout=2)
+        except Exception:
+            proceso.kill()
+
+    def _enviar(self, comando: str) -> str:
+        """Envía un comando al host (reiniciándolo si hace falta) y retorna su token."""
+        self._contador += 1
+        token = f"{self._prefijo}-{self._contador}"
+        datos = base64.b64encode(comando.encode('utf-8')).decode('ascii')
+        for intento in range(2):
+            if not self.activa:
+                self.cerrar()
+                self._iniciar()
+            try:
+                self._proceso.stdin.write(f"{token} {datos}\n")
+                self._proceso.stdin.flush()
+                return token
+            except OSError:
+                # El host murió entre comandos: reiniciar una vez
+                self.cerrar()
+                if intento:
+                    raise
+
+    def _esperar_linea(self, fin: float) -> str | None:
+        """Espera la siguiente línea del host hasta el instante límite."""
+        try:
+            return self._lineas.get(timeout=max(0.0, fin - time.monotonic()))
+        except queue.Empty:
+            # El host está bloqueado: se descarta y se reiniciará
+            if self._proceso is not None:
+                self._proceso.kill()
+            self._proceso = None
+            raise subprocess.TimeoutExpired(self.argumentos, self.timeout)
+
+    def _ejecutar(self, comando: str, timeout: float | None,
+                  al_recibir: Callable[[str], None]) -> tuple[int, str]:
+        """Ejecuta un comando pasando cada línea de salida a al_recibir. Retorna (codigo, errores)."""
+        inicio = time.monotonic()
+        with self._lock:
+            _esperas.segundos = espera_acumulada() + time.monotonic() - inicio
+            token = self._enviar(comando)
+            fin = time.monotonic() + (timeout if timeout is not None else self.timeout)
+            while True:
+                linea = self._esperar_linea(fin)
+                if linea is None:
+                    self._proceso = None
+                    raise HostCaidoError("El proceso de PowerShell terminó inesperadamente")
+                if linea.startswith(CENTINELA):
+                    partes = linea.split(' ')
+                    if len(partes) >= 3 and partes[1] == token:
+                        codigo = int(partes[2]) if partes[2].lstrip('-').isdigit() else 1
+                        errores = partes[3] if len(partes) > 3 else ""
+                        return codigo, base64.b64decode(errores).decode('utf-8', errors='replace')
+                al_recibir(linea)
+
+    def ejecutar_crudo(self, comando: str, timeout: float | None = None) -> tuple[int, str, str]:
+        """Ejecuta un comando y retorna (codigo, salida, errores) sin interpretar."""
+        salida = []
+        codigo, errores = self._ejecutar(comando, timeout, salida.append)
+        return codigo, "\n".join(salida), errores
+
+    def iterar_crudo(self, comando: str, timeout: float | None = None) -> Generator[str, None, tuple[int, str]]:
+        """
+        Ejecuta un comando entregando cada línea de salida en cuanto llega.
+
+        El comando corre en un hilo propio que toma la sesión y deja las líneas
+        en una cola; el generador las entrega sin tener la sesión tomada, de
+        modo que quien lo consume puede tardar o usar la sesión entre línea y
+        línea sin bloquear a nadie. Si se abandona antes del final, el comando
+        termina igual y su salida se descarta.
+
+        Al agotarse, el generador retorna (codigo, errores). Los errores de la
+        sesión (timeout, caída del host) se relanzan al consumirlo.
+        """
+        salida: queue.Queue = queue.Queue()
+
+        def ejecutar():
+            try:
+                salida.put(self._ejecutar(comando, timeout, salida.put))
+            except Exception as e:
+                salida.put(e)
+
+        threading.Thread(target=ejecutar, daemon=True).start()
+        while True:
+            elemento = salida.get()
+            if isinstance(elemento, str):
+                yield elemento
+            elif isinstance(elemento, Exception):
+                raise elemento
+            else:
+                return elemento
+
+    def ejecutar(self, comando: str, timeout: float | None = None) -> tuple[bool, str]:
+        """Ejecuta un comando con el mismo contrato que ejecutar_powershell.
+
+        Lanza HostNoDisponibleError si el host no puede iniciarse.
+        """
+        try:
+            codigo, salida, error = self.ejecutar_crudo(comando, timeout)
+        except subprocess.TimeoutExpired:
+            return False, "El comando excedió el tiempo límite"
+        except HostNoDisponibleError:
+            raise
+        except Exception as e:
+            return False, str(e)
+
+        salida = salida.strip()
+        error = error.strip()
+
+        if codigo == 0:
+            return True, salida
+        elif salida and not error:
+            return True, salida
+        else:
+            return False, error or salida or "Error desconocido"
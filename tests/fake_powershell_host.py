@@ -0,0 +1,78 @@
+"""Host falso que habla el protocolo de src.utils.sesion_powershell.
+
+Permite probar y medir la sesión persistente sin Windows. Interpreta un
+subconjunto mínimo de PowerShell, una instrucción por línea:
+
+    Write-Output <texto>          escribe <texto> en la salida
+    Write-Error <texto>           agrega <texto> a los errores (código 1)
+    throw <texto>                 error terminante (código 1)
+    Start-Sleep -Milliseconds <n> espera n milisegundos
+    exit                          termina el host sin responder
+
+Uso: python fake_powershell_host.py [--retardo-inicio SEGUNDOS]
+"""
+import base64
+import sys
+import time
+from typing import Callable
+
+CENTINELA = "##FIN"
+
+
+def _texto(argumento: str) -> str:
+    """Quita las comillas que rodean un argumento."""
+    argumento = argumento.strip()
+    if len(argumento) >= 2 and argumento[0] == argumento[-1] and argumento[0] in "'\"":
+        return argumento[1:-1]
+    return argumento
+
+
+def ejecutar_script(script: str, escribir: Callable[[str], None] | None = None) -> tuple[int, list[str], list[str]]:
+    """Interpreta un script y retorna (codigo, salida, errores).
+
+    Si se indica ``escribir``, cada línea de salida se le pasa en cuanto se
+    produce, como hace el host real.
+    """
+    salida = []
+    errores = []
+    for linea in script.splitlines():
+        instruccion, _, argumento = linea.strip().partition(' ')
+        if instruccion == "Write-Output":
+            salida.append(_texto(argumento))
+            if escribir:
+                escribir(salida[-1])
+        elif instruccion == "Write-Error":
+            errores.append(_texto(argumento))
+        elif instruccion == "throw":
+            errores.append(_texto(argumento))
+            return 1, salida, errores
+        elif instruccion == "Start-Sleep":
+            partes = argumento.split()
+            if len(partes) == 2 and partes[0] == "-Milliseconds":
+                time.sleep(int(partes[1]) / 1000)
+        elif instruccion == "exit":
+            sys.exit(0)
+    # Como el host real: los errores no terminantes también dan código 1
+    return (1 if errores else 0), salida, errores
+
+
+def _escribir(texto: str):
+    sys.stdout.write(texto + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    if "--retardo-inicio" in sys.argv:
+        time.sleep(float(sys.argv[sys.argv.index("--retardo-inicio") + 1]))
+
+    for linea in sys.stdin:
+        token, _, datos = linea.strip().partition(' ')
+        script = base64.b64decode(datos).decode('utf-8')
+        codigo, _, errores = ejecutar_script(script, _escribir)
+        b64 = base64.b64encode("\n".join(errores).encode('utf-8')).decode('ascii')
+        sys.stdout.write(f"{CENTINELA} {token} {codigo} {b64}\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
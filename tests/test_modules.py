@@ -103,6 +103,47 @@ class TestBloatware(unittest.TestCase):
         from src.modules.bloatware import BLOATWARE_APPS
         self.assertGreater(len(BLOATWARE_APPS), 0)
 
+    def test_comparador_patrones(self):
+        """Verifica la comparación con comodines sin distinguir mayúsculas."""
+        from src.modules.bloatware import ComparadorPatrones
+        comparador = ComparadorPatrones(["*Facebook*", "*Messenger*", "Microsoft.Bing*"])
+        self.assertEqual(comparador.coincidencias("facebook.messenger"), ["*Facebook*", "*Messenger*"])
+        self.assertEqual(comparador.coincidencias("Microsoft.BingNews"), ["Microsoft.Bing*"])
+        self.assertEqual(comparador.coincidencias("Contoso.MicrosoftBing"), [])
+
+    def test_consultas_usan_inventario(self):
+        """Verifica que las consultas se respondan desde la instantánea."""
+        from src.modules import bloatware
+        inventario = bloatware.InventarioAppx([
+            bloatware.PaqueteAppx("Microsoft.BingNews", "Microsoft.BingNews_1.0_x64__8wekyb3d8bbwe"),
+            bloatware.PaqueteAppx("king.com.CandyCrushSaga", "king.com.CandyCrushSaga_1.0_x86__kgqvnymyfvs32", True),
+        ])
+        bloatware._inventario = inventario
+        try:
+            nombres = [app.nombre for app in bloatware.obtener_bloatware_instalado()]
+            self.assertEqual(nombres, ["Microsoft News", "Candy Crush"])
+            juegos = bloatware.obtener_apps_instaladas_por_categoria(bloatware.CategoriaBloat.JUEGOS)
+            self.assertEqual([app.nombre for app in juegos], ["Candy Crush"])
+            self.assertTrue(bloatware.verificar_app_instalada("*Microsoft.BingNews*"))
+            self.assertFalse(bloatware.verificar_app_instalada("*Microsoft.BingWeather*"))
+        finally:
+            bloatware.invalidar_inventario()
+
+    def test_desinstalar_multiples_apps_un_solo_script(self):
+        """Verifica que la eliminación masiva use una invocación y separe resultados."""
+        from unittest import mock
+        from src.modules import bloatware
+        salida = "##APP 0 SUCCESS\n##APP 1 PARTIAL"
+        with mock.patch.object(bloatware, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = bloatware.desinstalar_multiples_apps(["*Microsoft.BingNews*", "*TikTok*", "*Netflix*"])
+        self.assertEqual(ps.call_count, 1)
+        script = ps.call_args[0][0]
+        self.assertEqual(script.count("Get-AppxProvisionedPackage -Online"), 1)
+        self.assertIn("'*Microsoft.BingNews*', '*TikTok*', '*Netflix*'", script)
+        self.assertEqual(resultados["*Microsoft.BingNews*"], (True, "Aplicación eliminada correctamente"))
+        self.assertEqual(resultados["*TikTok*"], (True, "Aplicación eliminada parcialmente"))
+        self.assertEqual(resultados["*Netflix*"], (True, salida))
+
     def test_bloatware_has_required_fields(self):
         """Verifica que cada app tenga los campos requeridos."""
         from src.modules.bloatware import BLOATWARE_APPS
@@ -116,6 +157,18 @@ class TestBloatware(unittest.TestCase):
 class TestTweaks(unittest.TestCase):
     """Tests del módulo de tweaks."""
 
+    def setUp(self):
+        """Aísla el registro de reversión en un directorio temporal."""
+        import tempfile
+        from unittest import mock
+        self._datos = tempfile.TemporaryDirectory()
+        self._entorno = mock.patch.dict(os.environ, {"LOCALAPPDATA": self._datos.name})
+        self._entorno.start()
+
+    def tearDown(self):
+        self._entorno.stop()
+        self._datos.cleanup()
+
     def test_tweaks_list_not_empty(self):
         """Verifica que la lista de tweaks no esté vacía."""
         from src.modules.tweaks import TWEAKS_DISPONIBLES
@@ -130,10 +183,157 @@ class TestTweaks(unittest.TestCase):
             self.assertIsNotNone(tweak.categoria)
             self.assertIsNotNone(tweak.riesgo)
 
+    def test_compilar_operaciones_crea_cada_clave_una_vez(self):
+        """Verifica que el compilador una los New-Item repetidos sobre la misma clave."""
+        from src.modules.tweaks import TWEAKS_DISPONIBLES
+        from src.utils.operaciones import EstablecerRegistro, compilar_operaciones
+        operaciones = [op for t in TWEAKS_DISPONIBLES for op in t.operaciones]
+        script = compilar_operaciones(operaciones)
+        claves = {op.ruta.lower() for op in operaciones if isinstance(op, EstablecerRegistro)}
+        self.assertEqual(script.count("New-Item"), len(claves))
+        self.assertEqual(
+            script.count("Set-ItemProperty"),
+            sum(isinstance(op, EstablecerRegistro) for op in operaciones)
+        )
+        self.assertIn("-Value ([byte[]](0x90,0x12,0x03,0x80,0x10,0x00,0x00,0x00)) -Type Binary", script)
+
+    def test_catalogo_en_sistema_falso(self):
+        """Verifica el catálogo completo sobre el registro y los servicios simulados."""
+        from src.modules.tweaks import TWEAKS_DISPONIBLES, _OPS_MENU_NUEVO_CLICK_DERECHO
+        from src.utils.operaciones import SistemaFalso
+        sistema = SistemaFalso(
+            servicios={"sysmain": ("Automatic", "Running"), "diagtrack": ("Automatic", "Running")},
+            paquetes_appx={"Microsoft.YourPhone", "MicrosoftWindows.Client.WebExperience", "Microsoft.WindowsCalculator"},
+        )
+        for tweak in TWEAKS_DISPONIBLES:
+            self.assertTrue(tweak.operaciones, tweak.id)
+            self.assertTrue(tweak.script, tweak.id)
+            sistema.aplicar(tweak.operaciones)
+
+        self.assertEqual(sistema.servicio("SysMain"), ("Disabled", "Stopped"))
+        self.assertIsNone(sistema.servicio("Spooler"))  # No existe: se ignora como en PowerShell
+        self.assertEqual(sistema.leer_registro(
+            "HKLM:\\SOFTWARE\\Policies\\Microsoft\\Windows\\DataCollection", "AllowTelemetry"), 0)
+        self.assertFalse(sistema.hibernacion)
+        self.assertEqual(sistema.paquetes_appx, {"Microsoft.WindowsCalculator"})
+        self.assertEqual(len(sistema.scripts_opacos), 1)
+
+        clsid = "HKCU:\\Software\\Classes\\CLSID\\{86ca1aa0-34aa-4e8b-a509-50c905bae2a2}"
+        self.assertTrue(sistema.existe_clave(clsid + "\\InprocServer32"))
+        sistema.aplicar(_OPS_MENU_NUEVO_CLICK_DERECHO)
+        self.assertFalse(sistema.existe_clave(clsid + "\\InprocServer32"))
+
+    def test_detectar_estados_en_una_consulta(self):
+        """Verifica el sondeo único y los estados aplicado / no aplicado / parcial."""
+        import json
+        from unittest import mock
+        from src.modules import tweaks
+        from src.modules.tweaks import TWEAKS_DISPONIBLES, EstadoTweak, estado_tweak, obtener_tweak_por_id
+        from src.utils.operaciones import SistemaFalso, compilar_sondeo
+        operaciones = [op for t in TWEAKS_DISPONIBLES for op in t.operaciones]
+        script = compilar_sondeo(operaciones)
+        self.assertEqual(script.count("Get-Service"), 1)
+        self.assertEqual(script.count("Get-AppxPackage"), 1)
+        self.assertEqual(script.count("Get-ItemProperty -Path 'HKCU:\\Control Panel\\Desktop'"), 1)
+
+        sistema = SistemaFalso(servicios={"sysmain": ("Automatic", "Running")},
+                               paquetes_appx={"Microsoft.YourPhone"})
+        superfetch = obtener_tweak_por_id("deshabilitar_superfetch")
+        visual = obtener_tweak_por_id("optimizar_visual")
+        self.assertEqual(estado_tweak(superfetch, sistema.sondear(operaciones)), EstadoTweak.NO_APLICADO)
+        sistema.aplicar(visual.operaciones[:2])
+        self.assertEqual(estado_tweak(visual, sistema.sondear(operaciones)), EstadoTweak.PARCIAL)
+
+        for tweak in TWEAKS_DISPONIBLES:
+            sistema.aplicar(tweak.operaciones)
+        observado = sistema.sondear(operaciones)
+        with mock.patch.object(tweaks, "ejecutar_powershell", return_value=(True, json.dumps(observado))) as ps:
+            estados = tweaks.detectar_estados_tweaks()
+        self.assertEqual(ps.call_count, 1)
+        self.assertEqual(estados["plan_ultimate"], EstadoTweak.DESCONOCIDO)  # Script opaco
+        self.assertEqual(
+            {i for i, e in estados.items() if e != EstadoTweak.APLICADO},
+            {"plan_ultimate"}
+        )
+
+    def test_operaciones_inversas_restauran_valores_exactos(self):
+        """Verifica que capturar, aplicar e invertir deje el sistema como estaba."""
+        import copy
+        from src.modules.tweaks import TWEAKS_DISPONIBLES
+        from src.utils.operaciones import SistemaFalso, operaciones_inversas
+        escritorio = "HKCU:\\Control Panel\\Desktop"
+        sistema = SistemaFalso(
+            registro={escritorio.lower(): {
+                "userpreferencesmask": (bytes([0x9e, 0x1e, 0x07, 0x80, 0x12, 0x00, 0x00, 0x00]), "Binary"),
+                "menushowdelay": ("400", "String"),
+            }},
+            servicios={"sysmain": ("Automatic", "Running"), "diagtrack": ("Manual", "Stopped")},
+        )
+        original = copy.deepcopy(sistema)
+        operaciones = [op for t in TWEAKS_DISPONIBLES for op in t.operaciones]
+
+        previo = sistema.sondear(operaciones, capturar=True)
+        sistema.aplicar(operaciones)
+        self.assertFalse(sistema.hibernacion)
+        sistema.aplicar(operaciones_inversas(operaciones, previo))
+
+        self.assertEqual({c: v for c, v in sistema.registro.items() if v}, original.registro)
+        self.assertEqual(sistema.servicios, original.servicios)
+        self.assertTrue(sistema.hibernacion)
+
+    def test_aplicar_captura_y_revierte_ejecucion_en_lote(self):
+        """Verifica la captura en el mismo lote y la reversión de una ejecución completa."""
+        import json
+        from unittest import mock
+        from src.modules import tweaks
+        from src.utils import lote
+        ids = ["deshabilitar_ads", "barra_izquierda"]
+        lista = [tweaks.obtener_tweak_por_id(i) for i in ids]
+        clave_ads = "HKCU:\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\AdvertisingInfo"
+        clave_barra = "HKCU:\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\Advanced"
+        captura = {
+            f"r|{clave_ads.lower()}|enabled": None,
+            f"r|{clave_barra.lower()}|taskbaral": 1,
+            f"t|{clave_barra.lower()}|taskbaral": "DWord",
+        }
+        salida = json.dumps(captura) + "\n##STEP __captura OK\n##STEP deshabilitar_ads OK\n##STEP barra_izquierda OK\n"
+        with mock.patch.object(lote, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = tweaks.aplicar_tweaks_en_lote(lista, ejecucion="Perfil de prueba")
+        self.assertEqual(ps.call_count, 1)
+        script = ps.call_args[0][0]
+        self.assertLess(script.index("GetValueKind"), script.index("Set-ItemProperty"))
+        self.assertEqual(set(resultados), set(ids))
+        self.assertEqual(set(tweaks.obtener_tweaks_revertibles()), set(ids))
+        ejecucion = tweaks.obtener_ejecuciones()[-1]
+        self.assertEqual((ejecucion.nombre, ejecucion.tweaks), ("Perfil de prueba", ids))
+
+        salida = "##STEP barra_izquierda OK\n##STEP deshabilitar_ads OK\n"
+        with mock.patch.object(lote, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = tweaks.revertir_ejecucion(ejecucion.id)
+        self.assertEqual(ps.call_count, 1)
+        script = ps.call_args[0][0]
+        self.assertIn("Remove-ItemProperty -Path '" + clave_ads + "' -Name 'Enabled'", script)
+        self.assertIn("-Name 'TaskbarAl' -Value 1 -Type DWord", script)
+        self.assertTrue(all(exito for exito, _ in resultados.values()))
+        self.assertEqual(tweaks.obtener_tweaks_revertibles(), [])
+        self.assertEqual(tweaks.obtener_ejecuciones(), [])
+
 
 class TestServicios(unittest.TestCase):
     """Tests del módulo de servicios."""
 
+    def setUp(self):
+        """Aísla el registro de estados originales en un directorio temporal."""
+        import tempfile
+        from unittest import mock
+        self._datos = tempfile.TemporaryDirectory()
+        self._entorno = mock.patch.dict(os.environ, {"LOCALAPPDATA": self._datos.name})
+        self._entorno.start()
+
+    def tearDown(self):
+        self._entorno.stop()
+        self._datos.cleanup()
+
     def test_servicios_list_not_empty(self):
         """Verifica que la lista de servicios no esté vacía."""
         from src.modules.servicios import SERVICIOS_DESHABILITABLES
@@ -148,6 +348,264 @@ class TestServicios(unittest.TestCase):
             self.assertIsInstance(datos, tuple)
             self.assertEqual(len(datos), 2)  # (descripcion, recomendacion)
 
+    def test_parsear_instantanea(self):
+        """Verifica el parseo de Win32_Service a servicios indexados por nombre."""
+        import json
+        from src.modules.servicios import _parsear_instantanea, EstadoServicio, TipoInicio
+        salida = json.dumps([
+            {"N": "DiagTrack", "D": "Connected User Experiences", "X": "Telemetry", "E": "Running",
+             "I": "Auto", "R": True, "P": 4321, "A": ["RpcSs"], "B": []},
+            {"N": "RpcSs", "D": "RPC", "X": "Llamada a procedimiento remoto", "E": "Running",
+             "I": "Auto", "R": False, "P": 900, "A": "RpcEptMapper", "B": ["DiagTrack", "WSearch"]},
+            {"N": "Fax", "D": "Fax", "X": None, "E": "Stopped", "I": "Disabled", "R": False, "P": 0,
+             "A": None, "B": None},
+        ])
+        servicios = _parsear_instantanea(salida)
+        self.assertEqual(set(servicios), {"diagtrack", "rpcss", "fax"})
+        diag = servicios["diagtrack"]
+        self.assertEqual(diag.tipo_inicio, TipoInicio.AUTOMATICO_RETRASADO)
+        self.assertTrue(diag.inicio_retrasado and diag.seguro_deshabilitar)
+        self.assertEqual((diag.pid, diag.dependencias), (4321, ["RpcSs"]))
+        rpc = servicios["rpcss"]
+        self.assertEqual(rpc.descripcion, "Llamada a procedimiento remoto")
+        self.assertEqual((rpc.dependencias, rpc.dependientes), (["RpcEptMapper"], ["DiagTrack", "WSearch"]))
+        fax = servicios["fax"]
+        self.assertEqual((fax.estado, fax.tipo_inicio), (EstadoServicio.DETENIDO, TipoInicio.DESHABILITADO))
+        self.assertEqual(fax.dependientes, [])
+        self.assertEqual(_parsear_instantanea("null"), {})
+
+    def test_consultas_usan_instantanea(self):
+        """Verifica que las búsquedas salgan de una sola consulta."""
+        import json
+        from unittest import mock
+        from src.modules import servicios
+        salida = json.dumps([
+            {"N": "WSearch", "D": "Windows Search", "E": "Running", "I": "Auto", "P": 10},
+            {"N": "Spooler", "D": "Print Spooler", "E": "Running", "I": "Auto", "P": 11},
+        ])
+        servicios.invalidar_instantanea()
+        with mock.patch.object(servicios, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            self.assertEqual([s.nombre for s in servicios.obtener_servicios_deshabilitables()], ["WSearch"])
+            self.assertEqual(servicios.obtener_servicio("spooler").pid, 11)
+            self.assertEqual(len(servicios.obtener_servicios()), 2)
+            self.assertEqual(ps.call_count, 1)
+        servicios.invalidar_instantanea()
+
+    def test_cambios_servicios_en_una_invocacion(self):
+        """Verifica que los cambios en bloque usen una sola llamada con resultado por servicio."""
+        from unittest import mock
+        from src.modules import servicios
+        from src.utils import lote
+        salida = (
+            "OK\n##STEP svc0 OK\n"
+            "##STEP svc1 FAIL El servicio no existe en este equipo\n"
+            "OK\n##STEP svc2 OK\n"
+        )
+        with mock.patch.object(lote, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = servicios.aplicar_cambios_servicios([
+                servicios.CambioServicio(nombre, servicios.AccionServicio.DETENER,
+                                         servicios.TipoInicio.DESHABILITADO)
+                for nombre in ["DiagTrack", "NoExiste", "WerSvc"]
+            ])
+            self.assertEqual([r[0] for r in resultados.values()], [True, False, True])
+            self.assertEqual(ps.call_count, 1)
+            script = ps.call_args[0][0]
+            self.assertIn("Get-Service -Name 'NoExiste'", script)
+            self.assertIn("-StartupType Disabled", script)
+
+            resultados = servicios.aplicar_cambios_servicios([
+                servicios.CambioServicio("DiagTrack", servicios.AccionServicio.INICIAR,
+                                         servicios.TipoInicio.AUTOMATICO_RETRASADO),
+                servicios.CambioServicio("NoExiste"),
+            ])
+            self.assertEqual(resultados["DiagTrack"], (True, ""))
+            self.assertEqual(resultados["NoExiste"], (False, "El servicio no existe en este equipo"))
+            self.assertIn("start= delayed-auto", ps.call_args[0][0])
+
+    def _instantanea_rdp(self):
+        """Instantánea sintética con las cadenas de dependencias de RDP y Hyper-V."""
+        from src.modules.servicios import Servicio, InstantaneaServicios, EstadoServicio, TipoInicio
+
+        def svc(nombre, dependencias=(), dependientes=()):
+            return Servicio(nombre, nombre, "", EstadoServicio.EJECUTANDO, TipoInicio.MANUAL,
+                            dependencias=list(dependencias), dependientes=list(dependientes))
+
+        servicios = [
+            svc("TermService", dependientes=["UmRdpService"]),
+            svc("UmRdpService", dependencias=["TermService"]),
+            svc("SessionEnv", dependencias=["TermService"]),
+            svc("HvHost"),
+            svc("vmicvss", dependencias=["HvHost"]),
+            svc("Fax"),
+        ]
+        return InstantaneaServicios({s.nombre.lower(): s for s in servicios})
+
+    def test_planificar_detencion_en_olas(self):
+        """Verifica que los dependientes se detengan antes y en paralelo entre ramas."""
+        from src.modules.servicios import planificar_detencion
+        instantanea = self._instantanea_rdp()
+        olas = planificar_detencion(
+            ["TermService", "SessionEnv", "UmRdpService", "HvHost", "vmicvss", "Fax", "NoExiste"],
+            instantanea
+        )
+        self.assertEqual(olas, [
+            ["SessionEnv", "UmRdpService", "vmicvss", "Fax", "NoExiste"],
+            ["TermService", "HvHost"],
+        ])
+        # Sin sus dependientes en la lista, un servicio va en la primera ola
+        self.assertEqual(planificar_detencion(["TermService"], instantanea), [["TermService"]])
+
+    def test_detener_servicios_una_invocacion(self):
+        """Verifica que la detención ordenada use una llamada y mapee cada resultado."""
+        from unittest import mock
+        from src.modules import servicios
+        salida = (
+            "##STEP svc0 FAIL El servicio no existe en este equipo\n##STEP svc1 OK\n"
+            "##STEP svc2 OK\n"
+        )
+        with mock.patch.object(servicios, "obtener_instantanea", return_value=self._instantanea_rdp()), \
+                mock.patch.object(servicios, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = servicios.detener_servicios(["TermService", "NoExiste", "UmRdpService"])
+            exitosos, fallidos = servicios._deshabilitar_grupo(["TermService", "NoExiste", "UmRdpService"])
+        self.assertEqual(ps.call_count, 2)
+        script = ps.call_args[0][0]
+        # NoExiste (svc0) y UmRdpService (svc1) en la primera ola, TermService (svc2) después
+        self.assertLess(script.index("'UmRdpService'"), script.index("'TermService'"))
+        self.assertIn("WaitForStatus('Stopped'", script)
+        self.assertEqual(resultados, {
+            "UmRdpService": (True, ""),
+            "NoExiste": (False, "El servicio no existe en este equipo"),
+            "TermService": (True, ""),
+        })
+        self.assertEqual((exitosos, fallidos), (2, 1))
+
+    def test_registro_y_restauracion_de_originales(self):
+        """Verifica que se guarde el primer estado y se restaure en una sola llamada."""
+        from unittest import mock
+        from src.modules import servicios
+        from src.modules.servicios import TipoInicio, EstadoServicio
+        instantanea = self._instantanea_rdp()
+        instantanea.obtener("TermService").tipo_inicio = TipoInicio.AUTOMATICO_RETRASADO
+        instantanea.obtener("UmRdpService").estado = EstadoServicio.DETENIDO
+
+        with mock.patch.object(servicios, "obtener_instantanea", return_value=instantanea), \
+                mock.patch.object(servicios, "ejecutar_powershell", return_value=(True, "")):
+            servicios.detener_servicios(["TermService", "UmRdpService"])
+            # Un segundo cambio no pisa el estado original
+            instantanea.obtener("TermService").tipo_inicio = TipoInicio.DESHABILITADO
+            servicios.detener_servicios(["TermService"])
+
+        originales = servicios.obtener_estados_originales()
+        self.assertEqual(set(originales), {"termservice", "umrdpservice"})
+        self.assertEqual(originales["termservice"].tipo_inicio, TipoInicio.AUTOMATICO_RETRASADO)
+        self.assertTrue(originales["termservice"].fecha)
+
+        salida = "##STEP svc0 OK\n##STEP svc1 FAIL Acceso denegado\n"
+        from src.utils import lote
+        with mock.patch.object(servicios, "obtener_instantanea", return_value=instantanea), \
+                mock.patch.object(lote, "ejecutar_powershell", return_value=(True, salida)) as ps:
+            resultados = servicios.restaurar_servicios()
+        self.assertEqual(ps.call_count, 1)
+        script = ps.call_args[0][0]
+        # TermService (dependencia) se restaura antes que UmRdpService
+        self.assertLess(script.index("'TermService'"), script.index("'UmRdpService'"))
+        self.assertIn("start= delayed-auto", script)
+        self.assertEqual(resultados["TermService"], (True, ""))
+        self.assertFalse(resultados["UmRdpService"][0])
+        # Solo lo restaurado con éxito sale del registro
+        self.assertEqual(set(servicios.obtener_estados_originales()), {"umrdpservice"})
+
+    def test_vigilante_publica_solo_cambios(self):
+        """Verifica que el vigilante compare sondeos y publique solo lo que cambió."""
+        import json
+        from src.modules.servicios import VigilanteServicios, EstadoServicio, TipoInicio, _SCRIPT_SONDEO
+        completa = json.dumps([
+            {"N": "DiagTrack", "D": "Telemetría", "X": "", "E": "Stopped", "I": "Disabled", "R": False, "P": 0},
+            {"N": "Fax", "D": "Fax", "X": "", "E": "Stopped", "I": "Manual", "R": False, "P": 0},
+        ])
+        sondeos = [
+            "DiagTrack\tStopped\tDisabled\t0\t0\nFax\tStopped\tManual\t0\t0",
+            # Windows Update volvió a activar la telemetría
+            "DiagTrack\tRunning\tAuto\t1\t4321\nFax\tStopped\tManual\t0\t0",
+            "DiagTrack\tRunning\tAuto\t1\t4321",
+        ]
+        scripts = []
+
+        def ejecutar(script):
+            scripts.append(script)
+            return True, sondeos.pop(0) if script == _SCRIPT_SONDEO else completa
+
+        vigilante = VigilanteServicios(ejecutar=ejecutar)
+        self.assertIsNone(vigilante.sondear())  # Instantánea base
+        self.assertIsNone(vigilante.sondear())  # Sin cambios
+
+        cambios = vigilante.sondear()
+        self.assertEqual([s.nombre for s in cambios.modificados], ["DiagTrack"])
+        diagtrack = cambios.modificados[0]
+        self.assertEqual(diagtrack.estado, EstadoServicio.EJECUTANDO)
+        self.assertEqual(diagtrack.tipo_inicio, TipoInicio.AUTOMATICO_RETRASADO)
+        self.assertEqual(diagtrack.pid, 4321)
+        self.assertEqual(diagtrack.nombre_display, "Telemetría")
+        self.assertEqual(cambios.eliminados, [])
+
+        cambios = vigilante.sondear()
+        self.assertEqual((cambios.modificados, cambios.eliminados), ([], ["Fax"]))
+        # Solo la primera pasada consulta la instantánea completa
+        self.assertEqual(scripts.count(_SCRIPT_SONDEO), 3)
+        self.assertEqual(len(scripts), 4)
+
+    def test_vigilante_parte_de_la_instantanea_mostrada(self):
+        """Verifica que un cambio ya presente al suscribirse se publique si la página no lo muestra."""
+        import json
+        import queue
+        from src.modules.servicios import (
+            VigilanteServicios, InstantaneaServicios, EstadoServicio, _SCRIPT_SONDEO, _parsear_instantanea
+        )
+
+        def instantanea(estado, inicio):
+            return json.dumps([{"N": "DiagTrack", "D": "Telemetría", "X": "", "E": estado, "I": inicio,
+                                "R": False, "P": 0}])
+
+        # La página muestra DiagTrack detenido; la acción ya lo inició antes del primer sondeo
+        mostrada = InstantaneaServicios(_parsear_instantanea(instantanea("Stopped", "Disabled")))
+        scripts = []
+
+        def ejecutar(script):
+            scripts.append(script)
+            if script == _SCRIPT_SONDEO:
+                return True, "DiagTrack\tRunning\tAuto\t0\t4321"
+            return True, instantanea("Running", "Auto")
+
+        recibidos = queue.Queue()
+        vigilante = VigilanteServicios(intervalo=0.01, ejecutar=ejecutar)
+        cancelar = vigilante.suscribir(recibidos.put, base=mostrada)
+        try:
+            cambios = recibidos.get(timeout=5)
+        finally:
+            cancelar()
+        self.assertEqual([(s.nombre, s.estado) for s in cambios.modificados],
+                         [("DiagTrack", EstadoServicio.EJECUTANDO)])
+        self.assertTrue(all(script == _SCRIPT_SONDEO for script in scripts))
+
+    def test_vigilante_se_detiene_sin_suscriptores(self):
+        """Verifica que el hilo de sondeo termine al cancelar la última suscripción."""
+        import threading
+        from src.modules.servicios import VigilanteServicios
+        sondeos = threading.Semaphore(0)
+
+        def ejecutar(script):
+            sondeos.release()
+            return False, ""
+
+        vigilante = VigilanteServicios(intervalo=0.01, ejecutar=ejecutar)
+        cancelar = vigilante.suscribir(lambda cambios: None)
+        self.assertTrue(sondeos.acquire(timeout=5))
+        hilo = vigilante._hilo
+        cancelar()
+        hilo.join(timeout=5)
+        self.assertFalse(hilo.is_alive())
+        self.assertIsNone(vigilante._hilo)
+
 
 class TestLimpieza(unittest.TestCase):
     """Tests del módulo de limpieza."""
@@ -162,10 +620,208 @@ class TestLimpieza(unittest.TestCase):
         self.assertTrue(callable(limpiar_temp_usuario))
         self.assertTrue(callable(ejecutar_limpieza_completa))
 
+    def _crear_arbol(self, raiz: str) -> int:
+        """Crea un árbol de prueba y retorna el total de bytes creados."""
+        total = 0
+        for i, sub in enumerate(["", "a", os.path.join("a", "b"), "c"]):
+            os.makedirs(os.path.join(raiz, sub), exist_ok=True)
+            for j in range(3):
+                datos = b"x" * (100 * (i + 1) + j)
+                with open(os.path.join(raiz, sub, f"f{j}.tmp"), "wb") as f:
+                    f.write(datos)
+                total += len(datos)
+        return total
+
+    def test_limpiar_arbol_cuenta_exacto(self):
+        """Verifica que el motor cuente y elimine todo en una pasada."""
+        import tempfile
+        from src.modules.limpieza import _limpiar_arbol, _medir_arbol
+        with tempfile.TemporaryDirectory() as raiz:
+            total = self._crear_arbol(raiz)
+            self.assertEqual(_medir_arbol(raiz), (total, 12))
+            self.assertEqual(_limpiar_arbol(raiz), (total, 12, 0))
+            self.assertTrue(os.path.isdir(raiz))
+            self.assertEqual(os.listdir(raiz), [])
+
+    @unittest.skipIf(os.name == "nt", "Los enlaces simbólicos requieren privilegios en Windows")
+    def test_limpiar_arbol_no_sigue_enlaces(self):
+        """Verifica que los enlaces se eliminen sin borrar su destino."""
+        import tempfile
+        from src.modules.limpieza import _limpiar_arbol
+        with tempfile.TemporaryDirectory() as raiz, tempfile.TemporaryDirectory() as destino:
+            with open(os.path.join(destino, "conservar.txt"), "w") as f:
+                f.write("datos")
+            os.symlink(destino, os.path.join(raiz, "enlace"))
+            _, archivos, errores = _limpiar_arbol(raiz)
+            self.assertEqual((archivos, errores), (1, 0))
+            self.assertTrue(os.path.exists(os.path.join(destino, "conservar.txt")))
+
+    def test_limpieza_paralela_limita_por_volumen(self):
+        """Verifica el límite por volumen y el orden determinista del resultado."""
+        import threading
+        import time
+        from unittest import mock
+        from src.modules import limpieza
+        raiz = os.path.abspath(os.sep)
+        activos = [0, 0]  # (en curso sobre raiz, máximo observado)
+        lock = threading.Lock()
+
+        def crear(nombre, espera, en_raiz=True):
+            def funcion():
+                with lock:
+                    activos[0] += en_raiz
+                    activos[1] = max(activos[1], activos[0])
+                time.sleep(espera)
+                with lock:
+                    activos[0] -= en_raiz
+                return limpieza.ResultadoLimpieza(nombre, 1.0, 1, True)
+            return limpieza.Limpiador(nombre, nombre, funcion, (lambda: [raiz]) if en_raiz else None)
+
+        def falla():
+            raise OSError("sin acceso")
+
+        tabla = [
+            crear("lento", 0.2),
+            crear("medio", 0.05),
+            crear("rapido", 0.01, en_raiz=False),
+            limpieza.Limpiador("roto", "Roto", falla),
+        ]
+
+        ids = [id_ for id_, _ in limpieza.limpiar_en_paralelo(tabla, max_hilos=4, max_por_volumen=1)]
+        self.assertEqual(sorted(ids), ["lento", "medio", "rapido", "roto"])
+        self.assertEqual(activos[1], 1)
+
+        vistos = []
+        with mock.patch.object(limpieza, "LIMPIADORES", tabla):
+            resultados = limpieza.ejecutar_limpieza_completa(
+                paralelo=True, al_terminar=lambda r: vistos.append(r.nombre))
+        self.assertEqual([r.nombre for r in resultados], ["lento", "medio", "rapido", "Roto"])
+        self.assertEqual(vistos[-1], "lento")
+        self.assertFalse(resultados[3].exito)
+    def test_analizar_limpiador_no_elimina(self):
+        """Verifica el análisis sin borrar, el corte temprano y el filtro por patrón."""
+        import tempfile
+        from src.modules import limpieza
+        with tempfile.TemporaryDirectory() as raiz:
+            total = self._crear_arbol(raiz)
+            open(os.path.join(raiz, "thumbcache_96.db"), "wb").close()
+            limpiador = limpieza.Limpiador("prueba", "Prueba", lambda: None, lambda: [raiz])
+
+            truncado = limpieza.analizar_limpiador(limpiador, limite=5, listar=True)
+            self.assertEqual((truncado.archivos, truncado.truncado), (5, True))
+
+            analisis = limpieza.analizar_limpiador(limpiador, listar=True)
+            self.assertEqual(analisis.archivos, 13)
+            self.assertEqual(analisis.espacio_recuperable_mb, round(total / (1024 * 1024), 2))
+            self.assertFalse(analisis.truncado)
+            self.assertEqual(limpieza._medir_arbol(raiz), (total, 13))
+
+            miniaturas = limpieza.Limpiador("mini", "Mini", lambda: None, lambda: [raiz],
+                                            patron="thumbcache_*.db", recursivo=False)
+            self.assertEqual(limpieza.analizar_limpiador(miniaturas).archivos, 1)
+
+    def test_limpieza_reutiliza_analisis_vigente(self):
+        """Verifica que la limpieza use la lista del análisis mientras los mtime no cambien."""
+        import tempfile
+        from unittest import mock
+        from src.modules import limpieza
+        with tempfile.TemporaryDirectory() as raiz:
+            total = self._crear_arbol(raiz)
+            limpiador = limpieza.Limpiador("prueba", "Prueba", lambda: None, lambda: [raiz])
+            limpieza.analizar_limpiador(limpiador, listar=True)
+            with mock.patch.object(limpieza, "_limpiar_arbol") as arbol:
+                self.assertEqual(limpieza._limpiar_ruta(raiz), (total, 12, 0))
+                arbol.assert_not_called()
+            self.assertEqual(os.listdir(raiz), [])
+
+            # Un archivo nuevo cambia el mtime del directorio e invalida la caché
+            self._crear_arbol(raiz)
+            limpieza.analizar_limpiador(limpiador, listar=True)
+            with open(os.path.join(raiz, "a", "nuevo.tmp"), "wb") as f:
+                f.write(b"x" * 10)
+            os.utime(os.path.join(raiz, "a"), ns=(0, 0))
+            self.assertIsNone(limpieza._escaneo_vigente((raiz, None, True)))
+            self.assertEqual(limpieza._limpiar_ruta(raiz), (total + 10, 13, 0))
+
+    def test_limpieza_con_progreso_limitada(self):
+        """Verifica los eventos de progreso, su límite de frecuencia y el evento final."""
+        import tempfile
+        from unittest import mock
+        from src.modules import limpieza
+        with tempfile.TemporaryDirectory() as raiz:
+            total = self._crear_arbol(raiz)
+            limpiador = limpieza.Limpiador(
+                "temp_usuario", "Temp Usuario", limpieza.limpiar_temp_usuario,
+                flujo=limpieza.limpiar_temp_usuario_con_progreso
+            )
+            with mock.patch.dict(os.environ, {"TEMP": raiz}):
+                eventos = list(limpieza.limpiar_con_progreso(limpiador, limpieza.LimitadorEventos(0)))
+            self.assertGreater(len(eventos), 2)
+            archivos = [e.archivos_eliminados for e in eventos]
+            self.assertEqual(archivos, sorted(archivos))
+            self.assertEqual(eventos[-1].resultado.archivos_eliminados, 12)
+            self.assertEqual(eventos[-1].resultado.espacio_liberado_mb, round(total / (1024 * 1024), 2))
+
+            self._crear_arbol(raiz)
+            with mock.patch.dict(os.environ, {"TEMP": raiz}):
+                eventos = list(limpieza.limpiar_con_progreso(limpiador, limpieza.LimitadorEventos(3600)))
+                self.assertEqual(len(eventos), 2)
+                self.assertIsNotNone(eventos[-1].resultado)
+                # La función original consume el mismo flujo
+                self.assertEqual(limpieza.limpiar_temp_usuario().archivos_eliminados, 0)
+
+    def test_indice_tamanos_lista_solo_cambios(self):
+        """Verifica que el índice persistente solo vuelva a listar directorios cambiados."""
+        import shutil
+        import tempfile
+        from contextlib import closing
+        from unittest import mock
+        from src.utils import indice_tamanos
+        with tempfile.TemporaryDirectory() as raiz, tempfile.TemporaryDirectory() as datos:
+            total = self._crear_arbol(raiz)
+            indice = indice_tamanos.IndiceTamanos(os.path.join(datos, "indice.db"))
+            self.assertEqual(indice.medir(raiz), (total, 12, False))
+
+            listar = indice_tamanos._listar
+            with mock.patch.object(indice_tamanos, "_listar", side_effect=listar) as espia:
+                self.assertEqual(indice.medir(raiz), (total, 12, False))
+                espia.assert_not_called()
+
+                with open(os.path.join(raiz, "a", "b", "nuevo.tmp"), "wb") as f:
+                    f.write(b"x" * 50)
+                os.utime(os.path.join(raiz, "a", "b"), ns=(0, 0))
+                shutil.rmtree(os.path.join(raiz, "c"))
+                os.utime(raiz, ns=(0, 0))
+                esperado = total + 50 - (400 * 3 + 3)
+                self.assertEqual(indice.medir(raiz), (esperado, 10, False))
+                self.assertEqual(
+                    sorted(os.path.basename(c.args[0]) for c in espia.call_args_list),
+                    sorted([os.path.basename(raiz), "b"])
+                )
+            # Los directorios borrados salen del índice
+            with closing(indice._conectar()) as conexion:
+                fila = conexion.execute(
+                    "SELECT 1 FROM directorios WHERE ruta = ?",
+                    (indice_tamanos._clave(os.path.join(raiz, "c")),)
+                ).fetchone()
+            self.assertIsNone(fila)
+
 
 class TestPerfiles(unittest.TestCase):
     """Tests del módulo de perfiles."""
 
+    def setUp(self):
+        """Aísla los registros de reversión y de costos en un directorio temporal."""
+        import tempfile
+        from unittest import mock
+        self._datos = tempfile.TemporaryDirectory()
+        self._entorno = mock.patch.dict(os.environ, {"LOCALAPPDATA": self._datos.name})
+        self._entorno.start()
+
+    def tearDown(self):
+        self._entorno.stop()
+        self._datos.cleanup()
+
     def test_perfiles_exist(self):
         """Verifica que los perfiles existan."""
         from src.modules.perfiles import PERFILES, NivelPerfil
@@ -181,16 +837,480 @@ class TestPerfiles(unittest.TestCase):
             self.assertIsNotNone(perfil.nombre)
             self.assertIsNotNone(perfil.descripcion)
 
+    def test_perfil_omite_tweaks_aplicados(self):
+        """Verifica que los tweaks ya aplicados no se vuelvan a ejecutar."""
+        from unittest import mock
+        from src.modules import perfiles, tweaks, limpieza
+        from src.modules.perfiles import NivelPerfil, PERFILES
+        from src.modules.tweaks import EstadoTweak
+        ids = PERFILES[NivelPerfil.MINIMO].tweaks
+        estados = {i: EstadoTweak.APLICADO for i in ids}
+        estados[ids[0]] = EstadoTweak.PARCIAL
+
+        with mock.patch.object(tweaks, "detectar_estados_tweaks", return_value=estados), \
+                mock.patch.object(tweaks, "ejecutar_lote", return_value={ids[0]: (True, "")}) as lote, \
+                mock.patch.object(limpieza, "ejecutar_limpieza_completa", return_value=[]):
+            resultado = perfiles.aplicar_perfil(NivelPerfil.MINIMO)
+        pasos = [p[0] for p in lote.call_args[0][0]]
+        self.assertEqual(pasos, [tweaks._PASO_CAPTURA, ids[0]])
+        self.assertEqual((resultado.tweaks_aplicados, resultado.tweaks_omitidos), (1, len(ids) - 1))
+
+        estados[ids[0]] = EstadoTweak.APLICADO
+        with mock.patch.object(tweaks, "detectar_estados_tweaks", return_value=estados), \
+                mock.patch("src.utils.lote.ejecutar_powershell") as ps, \
+                mock.patch.object(limpieza, "ejecutar_limpieza_completa", return_value=[]):
+            resultado = perfiles.aplicar_perfil(NivelPerfil.MINIMO)
+        ps.assert_not_called()
+        self.assertEqual(resultado.tweaks_omitidos, len(ids))
+
+    def test_perfil_registra_servicios_cubiertos_por_tweaks(self):
+        """Verifica que restaurar_servicios devuelva también los servicios que deshabilitó un tweak."""
+        from unittest import mock
+        from src.modules import perfiles, tweaks, servicios, bloatware, limpieza
+        from src.modules.perfiles import NivelPerfil
+        from src.modules.servicios import Servicio, InstantaneaServicios, EstadoServicio, TipoInicio
+        from src.utils import lote
+        instantanea = InstantaneaServicios({
+            nombre.lower(): Servicio(nombre, nombre, "", EstadoServicio.EJECUTANDO, TipoInicio.AUTOMATICO)
+            for nombre in servicios.SERVICIOS_PERFIL_RECOMENDADO
+        })
+
+        with mock.patch.object(tweaks, "detectar_estados_tweaks",
+                               side_effect=lambda lista: {t.id: tweaks.EstadoTweak.NO_APLICADO for t in lista}), \
+                mock.patch.object(tweaks, "ejecutar_lote",
+                                  side_effect=lambda pasos: {i: (True, "") for i, _ in pasos}), \
+                mock.patch.object(servicios, "obtener_instantanea", return_value=instantanea), \
+                mock.patch.object(servicios, "ejecutar_powershell", return_value=(True, "")), \
+                mock.patch.object(bloatware, "obtener_paquetes_recomendados", return_value=[]), \
+                mock.patch.object(limpieza, "ejecutar_limpieza_completa", return_value=[]):
+            plan = perfiles.planificar_perfil(NivelPerfil.RECOMENDADO)
+            perfiles.aplicar_perfil(NivelPerfil.RECOMENDADO)
+        self.assertIn("DiagTrack", plan.servicios_cubiertos)  # Lo deshabilita deshabilitar_telemetria
+        self.assertNotIn("DiagTrack", plan.servicios)
+        self.assertEqual(set(servicios.obtener_estados_originales()),
+                         {nombre.lower() for nombre in servicios.SERVICIOS_PERFIL_RECOMENDADO})
+
+        with mock.patch.object(servicios, "obtener_instantanea", return_value=instantanea), \
+                mock.patch.object(lote, "ejecutar_powershell", return_value=(True, "")) as ps:
+            servicios.restaurar_servicios()
+        self.assertIn("'DiagTrack'", ps.call_args[0][0])
+
+    def test_costos_registrados_ponderan_el_progreso(self):
+        """Verifica que las duraciones guardadas pesen en el progreso y la estimación."""
+        from src.utils import costos
+        from src.utils.etapas import Etapa, ejecutar_etapas
+        self.assertEqual(costos.estimar_costo("bloatware", 3), costos.COSTOS_PREDETERMINADOS["bloatware"] * 3)
+        costos.registrar_duracion("lento", 90.0)
+        costos.registrar_duracion("rapido", 10.0, unidades=10)
+        self.assertEqual(costos.estimar_costo("rapido", 10), 10.0)
+
+        eventos = []
+        estimaciones = []
+        ejecutar_etapas([
+            Etapa("rapido", lambda avance: None, "Rápido", peso=costos.estimar_costo("rapido", 10), unidades=10),
+            Etapa("lento", lambda avance: None, "Lento", peso=costos.estimar_costo("lento"),
+                  depende_de=("rapido",)),
+        ], callback=lambda msg, pct: eventos.append((msg, pct)), al_estimar=estimaciones.append,
+            registrar_costos=True)
+        # Terminado el paso de 10 s, falta el de 90 s: 10% del total
+        lento = [msg for msg, _ in eventos].index("Lento")
+        self.assertEqual(eventos[lento], ("Lento", 10))
+        self.assertAlmostEqual(estimaciones[lento], 90.0, delta=1.0)
+        self.assertLess(costos.estimar_costo("lento"), 90.0)
+        self.assertEqual(costos.formatear_eta(150), "~2 min")
+
+    def test_costos_sin_espera_de_sesion_ni_datos_danados(self):
+        """Verifica que no se cuente la espera por la sesión y que un archivo dañado no rompa nada."""
+        import json
+        import time
+        from src.utils import costos
+        from src.utils.datos import obtener_directorio_datos
+        from src.utils.etapas import Etapa, ejecutar_etapas
+        from src.utils.sesion_powershell import SesionPowerShell
+        host = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_powershell_host.py")
+        sesion = SesionPowerShell([sys.executable, host], timeout=5)
+        try:
+            sesion.ejecutar("Write-Output 'arranque'")
+            ejecutar_etapas([
+                Etapa("larga", lambda avance: sesion.ejecutar("Start-Sleep -Milliseconds 600"), "Larga"),
+                # Pide la sesión mientras la larga la tiene y espera a que la libere
+                Etapa("corta", lambda avance: (time.sleep(0.1), sesion.ejecutar("Write-Output 'ok'")), "Corta"),
+            ], registrar_costos=True)
+        finally:
+            sesion.cerrar()
+        self.assertGreater(costos.estimar_costo("larga"), 0.5)
+        self.assertLess(costos.estimar_costo("corta"), 0.3)
+
+        with open(os.path.join(obtener_directorio_datos(), costos._ARCHIVO_COSTOS), "w", encoding="utf-8") as f:
+            json.dump({"tweaks": {"muestras": 3}, "servicios": 5, "bloatware": {"segundos": "x"}}, f)
+        self.assertEqual(costos.estimar_costo("tweaks", 2), costos.COSTOS_PREDETERMINADOS["tweaks"] * 2)
+        self.assertEqual(costos.estimar_costo("servicios"), costos.COSTOS_PREDETERMINADOS["servicios"])
+        costos.registrar_duracion("bloatware", 12.0, unidades=2)
+        self.assertEqual(costos.estimar_costo("bloatware"), 6.0)
+
+    def test_depurar_operaciones(self):
+        """Verifica que se quiten operaciones repetidas y reemplazadas."""
+        from src.utils.operaciones import (
+            EstablecerRegistro, EliminarRegistro, ConfigurarServicio, ScriptOpaco, depurar_operaciones
+        )
+        clave = "HKCU:\\Software\\Prueba"
+        operaciones = [
+            ConfigurarServicio("DiagTrack", "Disabled", detener=True),
+            EstablecerRegistro(clave, "A", 1),
+            EstablecerRegistro(clave + "\\Sub", "B", 1),
+            ConfigurarServicio("diagtrack", "Disabled", detener=True),  # Repetida
+            EstablecerRegistro(clave.upper(), "a", 2),  # Reemplaza a la segunda
+            ConfigurarServicio("DiagTrack", "Manual"),  # Solo reemplaza el tipo de inicio
+            ScriptOpaco("Write-Output 1"),
+            ScriptOpaco("Write-Output 1"),
+            EliminarRegistro(clave + "\\Sub"),  # Reemplaza a la tercera
+        ]
+        self.assertEqual(
+            depurar_operaciones(operaciones),
+            [True, False, False, False, True, True, True, True, True]
+        )
+
+    def test_planificar_perfil_quita_solapamientos(self):
+        """Verifica que los servicios ya cubiertos por tweaks no se repitan en el plan."""
+        from unittest import mock
+        from src.modules import perfiles, tweaks
+        from src.modules.perfiles import NivelPerfil, PERFILES
+        from src.modules.tweaks import EstadoTweak
+        estados = {i: EstadoTweak.NO_APLICADO for i in PERFILES[NivelPerfil.MAXIMO].tweaks}
+        with mock.patch.object(tweaks, "detectar_estados_tweaks", return_value=estados):
+            plan = perfiles.planificar_perfil(NivelPerfil.MAXIMO)
+
+        cubiertos = {"SysMain", "WSearch", "DiagTrack", "dmwappushservice", "lfsvc",
+                     "XblAuthManager", "XblGameSave", "XboxGipSvc", "XboxNetApiSvc"}
+        self.assertFalse(cubiertos & set(plan.servicios))
+        self.assertIn("WerSvc", plan.servicios)
+        self.assertEqual(plan.redundantes, len(cubiertos))
+        self.assertEqual(len(plan.tweaks), len(PERFILES[NivelPerfil.MAXIMO].tweaks))
+        self.assertTrue(plan.paquetes)
+
+
+def _categorizar_driver_referencia(nombre: str, clase: str) -> str:
+    """Copia de la clasificación por categoría anterior al clasificador compilado."""
+    nombre_lower = (nombre or "").lower()
+    clase_lower = (clase or "").lower()
+
+    if any(x in nombre_lower or x in clase_lower for x in ['display', 'graphics', 'gpu', 'nvidia', 'amd', 'intel hd', 'intel uhd', 'intel iris', 'video', 'vga', 'geforce', 'radeon']):
+        return "DISPLAY"
+    elif any(x in nombre_lower or x in clase_lower for x in ['network', 'ethernet', 'wifi', 'wireless', 'lan', 'net', 'wi-fi', '802.11']):
+        return "NETWORK"
+    elif any(x in nombre_lower or x in clase_lower for x in ['audio', 'sound', 'realtek', 'speaker', 'headphone', 'microphone']):
+        return "AUDIO"
+    elif any(x in nombre_lower or x in clase_lower for x in ['usb', 'hub']):
+        return "USB"
+    elif any(x in nombre_lower or x in clase_lower for x in ['storage', 'disk', 'nvme', 'ssd', 'hdd', 'sata', 'raid', 'ahci']):
+        return "STORAGE"
+    elif any(x in nombre_lower or x in clase_lower for x in ['bluetooth', 'bt']):
+        return "BLUETOOTH"
+    elif any(x in nombre_lower or x in clase_lower for x in ['keyboard', 'mouse', 'hid', 'input', 'touchpad', 'trackpad']):
+        return "INPUT"
+    elif any(x in nombre_lower or x in clase_lower for x in ['print', 'scanner']):
+        return "PRINTER"
+    elif any(x in nombre_lower or x in clase_lower for x in ['system', 'processor', 'acpi', 'pci', 'smbus', 'management engine']):
+        return "SYSTEM"
+    else:
+        return "OTHER"
+
+
+def _identificar_fabricante_referencia(nombre: str, hardware_id: str) -> str:
+    """Copia de la identificación de fabricante anterior al clasificador compilado."""
+    texto = f"{nombre} {hardware_id}".lower()
+
+    if 'intel' in texto or 'ven_8086' in texto.replace('&', '_'):
+        return "Intel"
+    elif 'nvidia' in texto or 'ven_10de' in texto.replace('&', '_'):
+        return "NVIDIA"
+    elif 'amd' in texto or 'ati' in texto or 'ven_1002' in texto.replace('&', '_'):
+        return "AMD"
+    elif 'realtek' in texto or 'ven_10ec' in texto.replace('&', '_'):
+        return "Realtek"
+    elif 'qualcomm' in texto or 'atheros' in texto:
+        return "Qualcomm"
+    elif 'broadcom' in texto:
+        return "Broadcom"
+    elif 'microsoft' in texto:
+        return "Microsoft"
+
+    return "Desconocido"
+
+
+def _salida_powershell(lineas: list, exito: bool = True):
+    """Imita a iterar_powershell: entrega las líneas y retorna si el comando terminó bien."""
+    yield from lineas
+    return exito
+
 
 class TestDrivers(unittest.TestCase):
     """Tests del módulo de drivers."""
 
+    def setUp(self):
+        """Aísla el escaneo guardado en un directorio temporal."""
+        import tempfile
+        from unittest import mock
+        self._datos = tempfile.TemporaryDirectory()
+        self._entorno = mock.patch.dict(os.environ, {"LOCALAPPDATA": self._datos.name})
+        self._entorno.start()
+
+    def tearDown(self):
+        self._entorno.stop()
+        self._datos.cleanup()
+
     def test_funciones_drivers_exist(self):
         """Verifica que las funciones de drivers existan."""
         from src.modules.drivers import escanear_drivers, actualizar_todos_drivers
         self.assertTrue(callable(escanear_drivers))
         self.assertTrue(callable(actualizar_todos_drivers))
 
+    def test_escaneo_en_una_consulta(self):
+        """Verifica que drivers y dispositivos con problemas se crucen por device id."""
+        import json
+        from unittest import mock
+        from src.modules import drivers
+        from src.modules.drivers import EstadoDriver
+        salida = [
+            "D " + json.dumps({"DeviceName": "Intel UHD Graphics", "Manufacturer": "Intel", "DriverVersion": "31.0.101",
+                               "DriverDate": "20230115000000.000000+000", "DeviceClass": "Display",
+                               "DeviceID": "PCI\\VEN_8086&DEV_9A49\\3&11583659&0&10", "IsSigned": True,
+                               "HardWareID": ["PCI\\VEN_8086&DEV_9A49"]}),
+            "D " + json.dumps({"DeviceName": None, "DeviceID": "SIN\\NOMBRE"}),
+            "P " + json.dumps({"InstanceId": "pci\\ven_8086&dev_9a49\\3&11583659&0&10", "Problem": 28}),
+        ]
+        with mock.patch.object(drivers, "ejecutar_powershell", return_value=(False, "")) as ps, \
+                mock.patch.object(drivers, "iterar_powershell", return_value=_salida_powershell(salida)) as iterar:
+            resultado = drivers.escanear_drivers()
+        ps.assert_called_once_with(drivers._SCRIPT_HUELLAS)
+        iterar.assert_called_once_with(drivers._SCRIPT_ESCANEO)  # Una sola consulta para drivers y problemas
+        self.assertEqual(resultado.total, 1)
+        self.assertEqual(resultado.drivers[0].estado, EstadoDriver.FALTANTE)
+        self.assertEqual(resultado.drivers[0].fecha, "15/01/2023")
+
+        faltante = drivers._parsear_escaneo({"Problemas": [{"InstanceId": "USB\\X", "FriendlyName": "Cámara",
+                                                             "Problem": 10, "HardwareID": ["USB\\VID_1"]}]})
+        self.assertEqual((faltante[0].estado, faltante[0].hardware_id), (EstadoDriver.PROBLEMA, "USB\\VID_1"))
+
+    def test_escaneo_guardado_y_reescaneo_parcial(self):
+        """Verifica que sin cambios no se consulte WMI y que solo se reescaneen los cambiados."""
+        import json
+        from unittest import mock
+        from src.modules import drivers
+        from src.modules.drivers import EstadoDriver
+
+        def fila(i, version):
+            return {"DeviceName": f"Dispositivo {i}", "DriverVersion": version, "DeviceID": f"PCI\\DEV_{i}"}
+
+        huellas = "PCI\\DEV_1\t1.0\t0\tOK\nPCI\\DEV_2\t2.0\t0\tOK\n"
+        scripts = []
+
+        def ejecutar(script):
+            scripts.append(script)
+            if script == drivers._SCRIPT_HUELLAS:
+                return True, huellas
+            return True, json.dumps({"Drivers": fila(2, "2.1"), "Problemas": []})
+
+        def iterar(script):
+            scripts.append(script)
+            return _salida_powershell(["D " + json.dumps(fila(1, "1.0")), "D " + json.dumps(fila(2, "2.0"))])
+
+        with mock.patch.object(drivers, "ejecutar_powershell", side_effect=ejecutar), \
+                mock.patch.object(drivers, "iterar_powershell", side_effect=iterar):
+            self.assertEqual(drivers.escanear_drivers().total, 2)
+            scripts.clear()
+            resultado = drivers.escanear_drivers()
+            self.assertEqual(scripts, [drivers._SCRIPT_HUELLAS])
+            self.assertEqual(resultado.drivers[0].estado, EstadoDriver.OK)
+
+            huellas = "PCI\\DEV_1\t1.0\t0\tOK\nPCI\\DEV_2\t2.1\t0\tOK\n"
+            scripts.clear()
+            resultado = drivers.escanear_drivers()
+        self.assertEqual(len(scripts), 2)
+        self.assertIn("'PCI\\DEV_2'", scripts[1])
+        self.assertNotIn("DEV_1", scripts[1])
+        self.assertEqual({d.device_id: d.version for d in resultado.drivers},
+                         {"PCI\\DEV_1": "1.0", "PCI\\DEV_2": "2.1"})
+
+    def test_escaneo_fallido_no_se_guarda(self):
+        """Verifica que un escaneo cortado no se guarde y que un reescaneo parcial fallido haga el completo."""
+        import json
+        from unittest import mock
+        from src.modules import drivers
+        filas = ["D " + json.dumps({"DeviceName": f"Dispositivo {i}", "DriverVersion": f"{i}.0",
+                                    "DeviceID": f"PCI\\DEV_{i}"}) for i in (1, 2)]
+        huellas = "PCI\\DEV_1\t1.0\t0\tOK\nPCI\\DEV_2\t2.0\t0\tOK\n"
+        respuestas = {drivers._SCRIPT_HUELLAS: (True, huellas)}
+        completos = []
+
+        def iterar(script):
+            completos.append(script)
+            return _salida_powershell(filas[:len(completos)], exito=len(completos) > 1)
+
+        with mock.patch.object(drivers, "ejecutar_powershell",
+                               side_effect=lambda script: respuestas.get(script, (False, "Error de WMI"))), \
+                mock.patch.object(drivers, "iterar_powershell", side_effect=iterar):
+            self.assertEqual(drivers.escanear_drivers().total, 1)  # Cortado: se muestra pero no se guarda
+            self.assertIsNone(drivers._leer_cache_escaneo())
+            self.assertEqual(drivers.escanear_drivers().total, 2)
+            self.assertEqual(len(completos), 2)
+
+            respuestas[drivers._SCRIPT_HUELLAS] = (True, huellas.replace("2.0", "2.1"))
+            resultado = drivers.escanear_drivers()
+        self.assertEqual(len(completos), 3)  # El reescaneo parcial falló
+        self.assertEqual(resultado.total, 2)
+
+    def test_script_huellas_en_powershell(self):
+        """Ejecuta _SCRIPT_HUELLAS con los cmdlets de PnP simulados (requiere PowerShell)."""
+        import shutil
+        import subprocess
+        from src.modules import drivers
+        ejecutable = shutil.which("pwsh") or shutil.which("powershell")
+        if not ejecutable:
+            self.skipTest("PowerShell no está instalado")
+        # Mismos parámetros obligatorios y de tubería que los cmdlets reales
+        simulacion = """
+function Get-PnpDevice {
+    [pscustomobject]@{ InstanceId = 'PCI\\DEV_1'; Problem = 0; Status = 'OK' }
+    [pscustomobject]@{ InstanceId = 'USB\\SIN_DRIVER'; Problem = 28; Status = 'Error' }
+}
+function Get-PnpDeviceProperty {
+    param(
+        [Parameter(Mandatory = $true, ValueFromPipelineByPropertyName = $true)][string[]]$InstanceId,
+        [string[]]$KeyName
+    )
+    process {
+        if ($InstanceId -contains 'PCI\\DEV_1') { [pscustomobject]@{ InstanceId = 'PCI\\DEV_1'; Data = '1.2.3' } }
+    }
+}
+"""
+        script = os.path.join(self._datos.name, "huellas.ps1")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(simulacion + drivers._SCRIPT_HUELLAS)
+        resultado = subprocess.run([ejecutable, "-NoProfile", "-NonInteractive", "-File", script],
+                                   capture_output=True, text=True, timeout=60)
+        self.assertEqual(resultado.returncode, 0, resultado.stderr)
+        self.assertEqual(drivers._parsear_huellas(resultado.stdout),
+                         {"PCI\\DEV_1": "1.2.3\t0\tOK", "USB\\SIN_DRIVER": "\t28\tError"})
+
+    def test_escaneo_por_lotes(self):
+        """Verifica que los drivers lleguen por lotes y que los problemas corrijan los ya entregados."""
+        import json
+        from unittest import mock
+        from src.modules import drivers
+        from src.modules.drivers import EstadoDriver
+        salida = ["D " + json.dumps({"DeviceName": f"Dispositivo {i}", "DriverVersion": "1.0",
+                                     "DeviceID": f"PCI\\DEV_{i}"}) for i in range(5)]
+        salida += ["basura", "P " + json.dumps({"InstanceId": "pci\\dev_1", "Problem": 10}),
+                   "P " + json.dumps({"InstanceId": "USB\\SIN_DRIVER", "Problem": 28})]
+        with mock.patch.object(drivers, "ejecutar_powershell", return_value=(False, "")), \
+                mock.patch.object(drivers, "iterar_powershell", return_value=_salida_powershell(salida)):
+            lotes = list(drivers.escanear_drivers_por_lotes(tamano_lote=2))
+
+        self.assertEqual([len(lote.drivers) for lote in lotes], [0, 2, 2, 1, 1])
+        self.assertEqual([d.device_id for d in lotes[3].actualizados], ["PCI\\DEV_1"])
+        self.assertIs(lotes[3].actualizados[0], lotes[1].drivers[1])
+        self.assertEqual(lotes[3].actualizados[0].estado, EstadoDriver.PROBLEMA)
+        self.assertTrue(all(lote.resultado is None for lote in lotes[:-1]))
+        resultado = lotes[-1].resultado
+        self.assertEqual((resultado.total, resultado.con_problemas, resultado.faltantes), (6, 1, 1))
+
+    def test_clasificador_igual_al_anterior(self):
+        """Verifica que categoría y fabricante coincidan con la implementación anterior."""
+        import random
+        from src.modules.drivers import _PALABRAS_CATEGORIA, _PALABRAS_FABRICANTE, \
+            _categorizar_driver, _identificar_fabricante
+        palabras = [p for _, lista in _PALABRAS_CATEGORIA + _PALABRAS_FABRICANTE for p in lista]
+        # Fragmentos que se solapan con las palabras clave o las parten
+        fragmentos = palabras + [p[:-1] for p in palabras] + [p[1:] for p in palabras] + [
+            "ven_8086", "VEN_10DE", "ven&1002", "VEN_10EC", "ven_", "ven_ven_10de", "8086", "dev_9a49",
+            "&", "_", " ", "-", "\\", "PCI\\", "Station", "Configuration", "NETWORK", "Intel(R)", "Wi", "Fi",
+        ]
+        azar = random.Random(20241017)
+
+        def texto():
+            return "".join(azar.choice(fragmentos) for _ in range(azar.randint(0, 6)))
+
+        casos = [(texto(), texto()) for _ in range(20_000)] + [(None, None), ("", ""), (None, "Display")]
+        for nombre, otro in casos:
+            self.assertEqual(_categorizar_driver(nombre, otro).name, _categorizar_driver_referencia(nombre, otro),
+                             (nombre, otro))
+            self.assertEqual(_identificar_fabricante(nombre, otro), _identificar_fabricante_referencia(nombre, otro),
+                             (nombre, otro))
+
+    def test_catalogo_marca_desactualizados(self):
+        """Verifica el índice del catálogo y la marca de drivers desactualizados."""
+        import threading
+        from unittest import mock
+        from src.modules import drivers
+        from src.modules.drivers import DriverInfo, EstadoDriver, CategoriaDriver
+        from src.utils.catalogo_drivers import CatalogoDrivers, CATALOGO_INCLUIDO, leer_catalogo
+        self.assertEqual(leer_catalogo(CATALOGO_INCLUIDO), {})  # Se distribuye sin entradas
+
+        ruta = os.path.join(self._datos.name, "catalogo.tsv")
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write("hardware_id\tversion\n"
+                    "PCI\\VEN_8086&DEV_9A49\t31.0.101.5000\n"
+                    "pci\\ven_8086&dev_9a49\t30.0.0.1\n"  # Repetida con versión menor
+                    "USB\\VID_046D&PID_C52B\t1.10\n")
+        catalogo = CatalogoDrivers(ruta, os.path.join(self._datos.name, "catalogo.idx"))
+        self.assertEqual(len(catalogo), 2)
+        self.assertEqual(catalogo.version_mas_reciente("PCI\\VEN_8086&DEV_9A49&SUBSYS_3FC817AA&REV_01"),
+                         (31, 0, 101, 5000))
+        self.assertIsNone(catalogo.version_mas_reciente("PCI\\VEN_8086"))
+
+        def driver(hardware_id, version):
+            return DriverInfo(hardware_id, hardware_id, "Intel", version, "N/A", EstadoDriver.OK,
+                              CategoriaDriver.DISPLAY, hardware_id, hardware_id=hardware_id)
+
+        lista = [driver("PCI\\VEN_8086&DEV_9A49&REV_01", "31.0.101.4502"),
+                 driver("USB\\VID_046D&PID_C52B", "1.10.0.0"),
+                 driver("PCI\\VEN_10DE&DEV_2504", "1.0")]
+        self.assertEqual(drivers._marcar_desactualizados(lista, catalogo), 1)
+        self.assertEqual((lista[0].estado, lista[0].version_disponible),
+                         (EstadoDriver.DESACTUALIZADO, "31.0.101.5000"))
+        self.assertEqual(drivers._resumir_escaneo(lista).desactualizados, 1)
+
+        # Un catálogo nuevo se vuelve a compilar
+        catalogo.cerrar()
+        with open(ruta, "a", encoding="utf-8") as f:
+            f.write("PCI\\VEN_10DE&DEV_2504\t2.0\n")
+        self.assertEqual(len(catalogo), 3)
+
+        # Importar un catálogo (cerrar) durante un escaneo no rompe las consultas en curso
+        errores = []
+        terminado = threading.Event()
+
+        def consultar():
+            try:
+                for _ in range(5000):
+                    catalogo.version_mas_reciente("PCI\\VEN_10DE&DEV_2504")
+            except Exception as e:
+                errores.append(e)
+            finally:
+                terminado.set()
+
+        hilo = threading.Thread(target=consultar)
+        hilo.start()
+        while not terminado.is_set():
+            catalogo.cerrar()
+        hilo.join()
+        self.assertEqual(errores, [])
+        catalogo.cerrar()
+
+        # Un catálogo ilegible queda vacío en lugar de interrumpir el escaneo
+        danado = os.path.join(self._datos.name, "danado.tsv")
+        with open(danado, "wb") as f:
+            f.write(b"hardware_id\tversion\n\xff\xfe\tinv\xe1lido\n")
+        catalogo = CatalogoDrivers(danado, os.path.join(self._datos.name, "danado.idx"))
+        self.assertEqual(len(catalogo), 0)
+        self.assertIsNone(catalogo.version_mas_reciente("PCI\\VEN_8086&DEV_9A49"))
+
+        # Un catálogo vacío pasado explícitamente no cae en el compartido
+        with mock.patch.object(drivers, "obtener_catalogo") as compartido:
+            self.assertEqual(drivers._marcar_desactualizados([driver("PCI\\VEN_10DE&DEV_2504", "1.0")], catalogo), 0)
+            compartido.assert_not_called()
+
 
 class TestAdminUtils(unittest.TestCase):
     """Tests de utilidades de administrador."""
@@ -216,6 +1336,150 @@ class TestAdminUtils(unittest.TestCase):
         self.assertIsInstance(salida, str)
 
 
+class TestSesionPowerShell(unittest.TestCase):
+    """Tests de la sesión persistente usando el host falso."""
+
+    def setUp(self):
+        from src.utils.sesion_powershell import SesionPowerShell
+        host = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_powershell_host.py")
+        self.sesion = SesionPowerShell([sys.executable, host], timeout=5)
+
+    def tearDown(self):
+        self.sesion.cerrar()
+
+    def test_reutiliza_el_mismo_proceso(self):
+        """Verifica que varios comandos usen un único host."""
+        exito, salida = self.sesion.ejecutar("Write-Output 'uno'")
+        pid = self.sesion._proceso.pid
+        exito2, salida2 = self.sesion.ejecutar("Write-Output 'dos'\nWrite-Output 'tres'")
+        self.assertEqual((exito, salida), (True, "uno"))
+        self.assertEqual((exito2, salida2), (True, "dos\ntres"))
+        self.assertEqual(self.sesion._proceso.pid, pid)
+
+    def test_errores_respetan_contrato(self):
+        """Verifica el contrato (bool, str) ante errores."""
+        self.assertEqual(self.sesion.ejecutar("throw 'fallo'"), (False, "fallo"))
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'ok'\nthrow 'x'"), (False, "x"))
+        self.assertEqual(self.sesion.ejecutar("Write-Error 'no terminante'"), (False, "no terminante"))
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'ok'\nWrite-Error 'y'"), (False, "y"))
+
+    def test_reinicia_si_el_host_muere(self):
+        """Verifica que la sesión se recupere tras la caída del host."""
+        exito, _ = self.sesion.ejecutar("exit")
+        self.assertFalse(exito)
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'vivo'"), (True, "vivo"))
+
+    def test_timeout(self):
+        """Verifica que un comando bloqueado no cuelgue la sesión."""
+        exito, salida = self.sesion.ejecutar("Start-Sleep -Milliseconds 2000", timeout=0.2)
+        self.assertFalse(exito)
+        self.assertIn("tiempo límite", salida)
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'ok'"), (True, "ok"))
+
+    def test_iterar_entrega_lineas_al_llegar(self):
+        """Verifica que las líneas lleguen antes del final sin bloquear la sesión ni ensuciarla."""
+        import time
+        self.sesion.ejecutar("Write-Output 'arranque'")
+        lineas = self.sesion.iterar_crudo("Write-Output 'a'\nStart-Sleep -Milliseconds 400\nWrite-Output 'b'")
+        inicio = time.monotonic()
+        self.assertEqual(next(lineas), "a")
+        self.assertLess(time.monotonic() - inicio, 0.3)
+        self.assertEqual(list(lineas), ["b"])
+
+        lineas = self.sesion.iterar_crudo("Write-Output 'x'\nWrite-Output 'y'\nWrite-Error 'z'")
+        self.assertEqual(next(lineas), "x")
+        # Mientras se consume, la sesión no queda tomada por el generador
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'dentro'"), (True, "dentro"))
+        lineas.close()
+        self.assertEqual(self.sesion.ejecutar("Write-Output 'limpio'"), (True, "limpio"))
+
+
+class TestLote(unittest.TestCase):
+    """Tests de la ejecución de scripts en lote."""
+
+    def test_compilar_lote_marca_cada_paso(self):
+        """Verifica que cada paso emita su marcador."""
+        from src.utils.lote import compilar_lote
+        script = compilar_lote([("a", "Write-Output 1"), ("b", "Write-Output 2")])
+        self.assertIn('"##STEP a OK"', script)
+        self.assertIn('"##STEP b FAIL "', script)
+        self.assertIn("$__err.Count -gt 0) { $__codigo = 1 }", script)  # Write-Error también es FAIL
+        with self.assertRaises(ValueError):
+            compilar_lote([("con espacio", "")])
+
+    def test_parsear_lote(self):
+        """Verifica la separación de resultados por paso."""
+        from src.utils.lote import parsear_lote
+        salida = "hola\n##STEP a OK\n##STEP b FAIL Acceso denegado\n"
+        resultados = parsear_lote(salida, ["a", "b", "c"])
+        self.assertEqual(resultados["a"], (True, "hola"))
+        self.assertEqual(resultados["b"], (False, "Acceso denegado"))
+        self.assertFalse(resultados["c"][0])
+
+    def test_tweaks_tienen_script(self):
+        """Verifica que todos los tweaks puedan ejecutarse en lote."""
+        from src.modules.tweaks import TWEAKS_DISPONIBLES
+        for tweak in TWEAKS_DISPONIBLES:
+            self.assertTrue(tweak.script, tweak.id)
+
+
+
+class TestEtapas(unittest.TestCase):
+    """Tests del grafo de etapas."""
+
+    def test_etapas_independientes_corren_a_la_vez(self):
+        """Verifica el orden por dependencias, la concurrencia y el progreso agregado."""
+        import threading
+        from src.utils.etapas import Etapa, ejecutar_etapas
+        limpieza_empezo = threading.Event()
+        orden = []
+
+        def paquetes(avance):
+            # Solo termina si la limpieza arrancó mientras esta etapa corría
+            self.assertTrue(limpieza_empezo.wait(5))
+            orden.append("paquetes")
+            return "p"
+
+        def limpiar(avance):
+            limpieza_empezo.set()
+            avance(0.5, "Mitad")
+            orden.append("limpieza")
+            return "l"
+
+        eventos = []
+        resultados = ejecutar_etapas([
+            Etapa("tweaks", lambda avance: orden.append("tweaks") or "t", "Tweaks", peso=2),
+            Etapa("servicios", lambda avance: orden.append("servicios") or "s", "Servicios",
+                  depende_de=("tweaks",)),
+            Etapa("paquetes", paquetes, "Paquetes"),
+            Etapa("limpieza", limpiar, "Limpieza"),
+        ], max_hilos=2, callback=lambda msg, pct: eventos.append(pct))
+
+        self.assertEqual(resultados, {"tweaks": "t", "servicios": "s", "paquetes": "p", "limpieza": "l"})
+        self.assertLess(orden.index("tweaks"), orden.index("servicios"))
+        self.assertEqual(eventos, sorted(eventos))
+        self.assertLess(max(eventos), 100)
+
+    def test_fallo_omite_dependientes(self):
+        """Verifica que una etapa fallida no detenga a las independientes."""
+        from src.utils.etapas import Etapa, ejecutar_etapas, ordenar_etapas
+        corridas = []
+
+        def fallar(avance):
+            raise RuntimeError("sin acceso")
+
+        with self.assertRaises(RuntimeError):
+            ejecutar_etapas([
+                Etapa("a", fallar, "A"),
+                Etapa("b", lambda avance: corridas.append("b"), "B", depende_de=("a",)),
+                Etapa("c", lambda avance: corridas.append("c"), "C"),
+            ])
+        self.assertEqual(corridas, ["c"])
+        with self.assertRaises(ValueError):
+            ordenar_etapas([Etapa("a", fallar, "A", depende_de=("b",)),
+                            Etapa("b", fallar, "B", depende_de=("a",))])
+
+
 if __name__ == "__main__":
     # Ejecutar tests con verbosidad
     unittest.main(verbosity=2)